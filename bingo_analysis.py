@@ -0,0 +1,168 @@
+"""
+Tag conflict analysis for the objective sheet.
+
+Counts, for every pair of core tags, how many ordered pairs of mutually exclusive
+objectives carry one tag each, and writes tag_conflicts.csv. With C the symmetric
+conflict adjacency from the restriction ids and T the objective x tag incidence
+matrix, the counts are T^T C T, computed over sparse rows so the cost follows the
+number of restrictions rather than the number of objective pairs.
+"""
+import csv
+import os
+import sys
+import time
+from collections import defaultdict
+
+import bingo_cache
+import bingo_generator
+
+TAG_CONFLICTS_FILE = "tag_conflicts.csv"
+
+DEFAULT_WATCH_INTERVAL = 1.0
+
+def conflict_adjacency(index):
+    """
+    Sparse conflict adjacency of an ObjectiveIndex.
+
+    Returns:
+        list: For each dense objective id, the ids it is mutually exclusive with, in
+            either direction of the Restrictions column, itself excluded
+    """
+    adjacency = [set() for _ in range(len(index))]
+    for objective_id, restrictions in enumerate(index.restrictions):
+        for other_id in restrictions:
+            if other_id != objective_id:
+                adjacency[objective_id].add(other_id)
+                adjacency[other_id].add(objective_id)
+    return adjacency
+
+def tag_incidence(index):
+    """
+    Sparse objective x tag incidence matrix of an ObjectiveIndex.
+
+    Returns:
+        list: For each dense objective id, {tag: occurrences in its core tags}
+    """
+    incidence = []
+    for tags in index.tags:
+        row = defaultdict(int)
+        for tag in tags:
+            row[tag] += 1
+        incidence.append(dict(row))
+    return incidence
+
+def tag_conflict_counts(index):
+    """
+    Count conflicting objective pairs per pair of tags.
+
+    Multiplies C T one sparse row at a time, then folds each row into T^T (C T).
+    Pairs of the same tag are left out and (a, b) is merged with (b, a).
+
+    Returns:
+        dict: (tag1, tag2) with tag1 < tag2 -> number of ordered pairs of conflicting
+            objectives where the first has tag1 and the second tag2, or the reverse
+    """
+    adjacency = conflict_adjacency(index)
+    incidence = tag_incidence(index)
+
+    product = defaultdict(int)
+    for objective_id, neighbours in enumerate(adjacency):
+        own_tags = incidence[objective_id]
+        if not own_tags or not neighbours:
+            continue
+        # Row of C T: tag occurrences over everything this objective conflicts with
+        neighbour_tags = defaultdict(int)
+        for other_id in neighbours:
+            for tag, occurrences in incidence[other_id].items():
+                neighbour_tags[tag] += occurrences
+        for tag1, weight in own_tags.items():
+            for tag2, occurrences in neighbour_tags.items():
+                if tag1 != tag2:
+                    product[min(tag1, tag2), max(tag1, tag2)] += weight * occurrences
+    return dict(product)
+
+def write_tag_conflicts_csv(path, counts):
+    """Write tag pair conflict counts in the tag_conflicts.csv layout, most conflicts first."""
+    rows = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['Tag1', 'Tag2', 'Conflict_Count'])
+        for (tag1, tag2), count in rows:
+            writer.writerow([tag1, tag2, count])
+
+def analyze(csv_file_path, output_path=TAG_CONFLICTS_FILE, use_cache=True):
+    """
+    Regenerate the tag conflict file from an objective sheet.
+
+    Returns:
+        dict: The counts written, or None if the sheet couldn't be loaded
+    """
+    _, index = bingo_cache.load_pool(csv_file_path, use_cache=use_cache)
+    if index is None:
+        return None
+    counts = tag_conflict_counts(index)
+    write_tag_conflicts_csv(output_path, counts)
+    return counts
+
+def sheet_signature(csv_file_path):
+    """Modification time and size of the sheet, or None while it doesn't exist."""
+    try:
+        stat = os.stat(csv_file_path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def watch(csv_file_path, output_path=TAG_CONFLICTS_FILE, use_cache=True, interval=DEFAULT_WATCH_INTERVAL,
+          on_update=None):
+    """
+    Rerun analyze every time the sheet changes on disk, until interrupted.
+
+    The sheet is polled every interval seconds, so no file watching library is needed.
+    A sheet that fails to load, for instance halfway through being saved, is retried
+    at the next change.
+
+    Args:
+        on_update: Optional callable(counts, seconds) called after each run; counts is
+            None when the sheet couldn't be loaded
+    """
+    last = object()
+    while True:
+        signature = sheet_signature(csv_file_path)
+        if signature is not None and signature != last:
+            last = signature
+            start = time.perf_counter()
+            counts = analyze(csv_file_path, output_path, use_cache)
+            if on_update:
+                on_update(counts, time.perf_counter() - start)
+        time.sleep(interval)
+
+def add_analyze_arguments(parser):
+    parser.add_argument("--csv", default=bingo_generator.DEFAULT_CSV,
+                        help=f"objective sheet (default: {bingo_generator.DEFAULT_CSV})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse the objective sheet instead of loading the cached snapshot")
+    parser.add_argument("-o", "--output", default=TAG_CONFLICTS_FILE,
+                        help=f"where to write the tag conflicts (default: {TAG_CONFLICTS_FILE})")
+    parser.add_argument("--watch", action="store_true", help="keep running and rewrite the file whenever the sheet changes")
+    parser.add_argument("--interval", type=float, default=DEFAULT_WATCH_INTERVAL,
+                        help=f"seconds between checks of the sheet with --watch (default: {DEFAULT_WATCH_INTERVAL})")
+
+def run_analyze(args):
+    def report(counts, seconds):
+        if counts is None:
+            print(f"Failed to load {args.csv}", file=sys.stderr)
+        else:
+            print(f"Wrote {len(counts)} tag pairs to {args.output} in {seconds * 1000:.1f} ms", file=sys.stderr)
+
+    if not args.watch:
+        start = time.perf_counter()
+        counts = analyze(args.csv, args.output, not args.no_cache)
+        report(counts, time.perf_counter() - start)
+        return 0 if counts is not None else 1
+
+    print(f"Watching {args.csv}; press Ctrl+C to stop", file=sys.stderr)
+    try:
+        watch(args.csv, args.output, not args.no_cache, args.interval, on_update=report)
+    except KeyboardInterrupt:
+        pass
+    return 0
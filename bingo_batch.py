@@ -0,0 +1,227 @@
+"""
+Vectorized batch sampler for bucket mode.
+
+Bucket mode always draws a fixed number of objectives from fixed per-bucket pools,
+so many boards can be drawn at once as NumPy arrays: every board gets a random key
+per candidate, the lowest keys of each bucket fill its quota, and the conflict and
+tag-limit checks run over the whole batch. Boards that fail a check are rebuilt one
+pick at a time over the same random order, with the picks of all of them done
+together as array operations.
+
+Requires NumPy.
+"""
+import random
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import bingo_generator
+
+BUCKETS = "ABCDEF"
+
+DEFAULT_BATCH_SIZE = 4096
+# Boards rebuilt together by repair, which keeps a (boards x objectives) mask of what
+# each one may no longer draw
+REPAIR_BATCH_SIZE = 1024
+
+class BatchSampler:
+    """
+    Draws bucket-mode boards in batches from a compiled ObjectiveIndex.
+
+    Boards follow the bucket-mode rules (bucket quotas, mutual exclusions, no
+    duplicates) and are repaired so they respect the tag limits where the buckets
+    allow it, much like select_random_objectives with an "always" reroll policy.
+    Randomized djinn objectives aren't supported.
+    """
+
+    def __init__(self, index, tag_limits=None, bucket_hard_mode=False, exclude_boss_objectives=False,
+                 bucket_limits=None):
+        if np is None:
+            raise ImportError("The batch sampler requires NumPy (pip install numpy)")
+
+        self.index = index
+        if not isinstance(tag_limits, bingo_generator.TagBudget):
+            tag_limits = bingo_generator.TagBudget(tag_limits)
+        self.tag_budget = tag_limits
+        if bucket_limits is None:
+            bucket_limits = bingo_generator.BUCKET_LIMITS_HARD if bucket_hard_mode else bingo_generator.BUCKET_LIMITS_NORMAL
+        self.bucket_limits = {bucket: bucket_limits.get(bucket, 0) for bucket in BUCKETS}
+        self.board_size = sum(self.bucket_limits.values())
+
+        # Candidate ids per bucket, from the pools cached on the index
+        _, bucket_ids = index.candidate_pools(exclude_boss_objectives)
+        self.pools = {}
+        for bucket in BUCKETS:
+            ids = bucket_ids[bucket]
+            self.pools[bucket] = np.array(ids, dtype=np.int64)
+            if len(ids) < self.bucket_limits[bucket]:
+                raise ValueError(f"Bucket {bucket} has {len(ids)} objectives, fewer than its limit of {self.bucket_limits[bucket]}")
+
+        n = len(index)
+        # The objectives i conflicts with are conflict_ids[conflict_start[i]:conflict_start[i + 1]].
+        # Each objective only lists the others, so a board isn't flagged for containing
+        # each objective once. Memory grows with the conflicts, not with n squared.
+        conflict_ids = []
+        self.conflict_start = np.zeros(n + 1, dtype=np.int64)
+        for i, mask in enumerate(index.conflicts):
+            mask &= ~index.bits[i]
+            while mask:
+                lowest = mask & -mask
+                conflict_ids.append(lowest.bit_length() - 1)
+                mask ^= lowest
+            self.conflict_start[i + 1] = len(conflict_ids)
+        self.conflict_ids = np.array(conflict_ids, dtype=np.int64)
+
+        # Tag-count matrix over the limited tags only
+        budget = self.tag_budget
+        limited = [slot for slot, limit in enumerate(budget.limits) if limit is not None]
+        self.tag_counts = np.zeros((n, len(limited)), dtype=np.int16)
+        column = {slot: k for k, slot in enumerate(limited)}
+        for i, tags in enumerate(index.tags):
+            for tag in tags:
+                slot = budget.slots.get(tag)
+                if slot in column:
+                    self.tag_counts[i, column[slot]] += 1
+        self.tag_limits = np.array([budget.limits[slot] for slot in limited], dtype=np.int16)
+        # has_tag[c - 1][i, k] is 1.0 when objective i has limited tag k at least c times, so
+        # the tag check for a whole pool becomes one matrix product per occurrence count
+        self.has_tag = [(self.tag_counts >= c).astype(np.float32)
+                        for c in range(1, int(self.tag_counts.max(initial=0)) + 1)]
+
+    def sample(self, boards, rng=None):
+        """
+        Draw a batch of boards.
+
+        Args:
+            boards: Number of boards
+            rng: numpy.random.Generator, a seed, or None for fresh entropy
+
+        Returns:
+            tuple: (ids, repaired) where ids is a (boards x board_size) array of dense
+                objective ids, -1 for squares that couldn't be filled, and repaired is the
+                number of boards that needed the pick-by-pick repair
+        """
+        rng = np.random.default_rng(rng)
+        keys = {}
+        columns = []
+        for bucket in BUCKETS:
+            limit = self.bucket_limits[bucket]
+            if not limit:
+                continue
+            pool = self.pools[bucket]
+            keys[bucket] = rng.random((boards, len(pool)))
+            lowest = np.argpartition(keys[bucket], limit - 1, axis=1)[:, :limit]
+            columns.append(pool[lowest])
+        ids = np.concatenate(columns, axis=1)
+
+        # Any conflicting pair on a board, and any tag over its limit
+        conflicted = self.has_conflict(ids)
+        over_limit = (self.tag_counts[ids].sum(axis=1) > self.tag_limits).any(axis=1)
+        needs_repair = np.flatnonzero(conflicted | over_limit)
+        for start in range(0, needs_repair.size, REPAIR_BATCH_SIZE):
+            rows = needs_repair[start:start + REPAIR_BATCH_SIZE]
+            ids[rows] = self.repair(keys, rows, rng)
+
+        # Shuffle each board so squares aren't grouped by bucket
+        ids = np.take_along_axis(ids, np.argsort(rng.random(ids.shape), axis=1), axis=1)
+        return ids, len(needs_repair)
+
+    def has_conflict(self, ids):
+        """Whether each board of a (boards x squares) id array has two objectives that conflict."""
+        boards, squares = ids.shape
+        n = len(self.index)
+        # Every board's ids as board * n + id, sorted, looked up with the conflicts of its squares
+        board_codes = (np.arange(boards)[:, None] * n + np.sort(ids, axis=1)).ravel()
+        positions, conflicting = self.conflicts_of(ids.ravel())
+        queries = positions // squares * n + conflicting
+        found = np.minimum(np.searchsorted(board_codes, queries), board_codes.size - 1)
+        conflicted = np.zeros(boards, dtype=bool)
+        conflicted[positions[board_codes[found] == queries] // squares] = True
+        return conflicted
+
+    def conflicts_of(self, picked):
+        """
+        The objectives that conflict with each of a set of picks.
+
+        Returns:
+            tuple: (positions, ids), the position in picked and the conflicting id of
+                every conflict, to index a (picks x objectives) array with
+        """
+        starts = self.conflict_start[picked]
+        lengths = self.conflict_start[picked + 1] - starts
+        ends = np.cumsum(lengths)
+        positions = np.repeat(np.arange(len(picked)), lengths)
+        # The k-th conflict overall sits at k minus the conflicts of the earlier picks,
+        # plus where its pick's run of conflict_ids starts
+        shift = starts - (ends - lengths)
+        return positions, self.conflict_ids[np.arange(ends[-1] if ends.size else 0) + shift[positions]]
+
+    def repair(self, keys, rows, rng):
+        """
+        Rebuild the given boards one pick at a time, all of them in step.
+
+        Each board fills its bucket quotas in its own random order. Every pick is the
+        candidate with the lowest key that conflicts with nothing on the board and fits
+        the tag limits; when no candidate fits the tag limits, the lowest conflict-free
+        one is used instead, the same way a failed reroll leaves the board over the
+        limit. The keys are the ones drawn for the first pass, so this is the same
+        random order walked with the checks applied.
+        """
+        boards = len(rows)
+        forbidden = np.zeros((boards, len(self.index)), dtype=bool)
+        counts = np.zeros((boards, len(self.tag_limits)), dtype=np.int16)
+        result = np.full((boards, self.board_size), -1, dtype=np.int64)
+
+        buckets = [bucket for bucket in BUCKETS if self.bucket_limits[bucket]]
+        slots = np.array([b for b, bucket in enumerate(buckets) for _ in range(self.bucket_limits[bucket])])
+        bucket_order = slots[np.argsort(rng.random((boards, len(slots))), axis=1)]
+
+        for step in range(self.board_size):
+            for b, bucket in enumerate(buckets):
+                picking = np.flatnonzero(bucket_order[:, step] == b)
+                if not picking.size:
+                    continue
+                pool = self.pools[bucket]
+                bucket_keys = keys[bucket][rows[picking]]
+                free = ~forbidden[picking][:, pool]
+                headroom = self.tag_limits - counts[picking]
+                fits = np.ones(free.shape, dtype=bool)
+                for occurrences, has_tag in enumerate(self.has_tag, 1):
+                    fits &= (headroom < occurrences).astype(np.float32) @ has_tag[pool].T == 0
+
+                preferred = np.where(free & fits, bucket_keys, np.inf)
+                fallback = np.where(free, bucket_keys, np.inf)
+                choice = preferred.argmin(axis=1)
+                rows_in_pick = np.arange(picking.size)
+                use_fallback = np.isinf(preferred[rows_in_pick, choice])
+                choice[use_fallback] = fallback[use_fallback].argmin(axis=1)
+                found = ~np.isinf(fallback[rows_in_pick, choice])
+
+                picked = pool[choice[found]]
+                picking = picking[found]
+                result[picking, step] = picked
+                positions, conflicting = self.conflicts_of(picked)
+                forbidden[picking[positions], conflicting] = True
+                forbidden[picking, picked] = True
+                counts[picking] += self.tag_counts[picked]
+
+        return result
+
+    def iter_boards(self, boards, seed=None, batch_size=DEFAULT_BATCH_SIZE):
+        """
+        Yield boards as lists of Objective records, drawn batch_size at a time.
+
+        The lucky medal and equipment objectives are randomized from a random.Random
+        seeded the same way, so the loaded pool isn't touched.
+        """
+        rng = np.random.default_rng(seed)
+        text_rng = random.Random(seed)
+        for start in range(0, boards, batch_size):
+            ids, _ = self.sample(min(batch_size, boards - start), rng)
+            for row in ids.tolist():
+                board = [self.index.objectives[i] for i in row if i >= 0]
+                board = bingo_generator.modify_lucky_medal_objectives(board, verbose=False, rng=text_rng)
+                board = bingo_generator.modify_equipment_objectives(board, verbose=False, rng=text_rng)
+                yield board
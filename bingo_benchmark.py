@@ -0,0 +1,286 @@
+"""
+Benchmark harness for the bingo generator.
+
+Times loading the objective sheet, compiling it, selecting boards in each generation
+mode (with and without the tag reroll path, and with the backtracking solver) and the
+lucky medal/equipment post-processing. It runs on Bingo Eval.csv and on synthetic
+copies of it scaled to larger pools. Results are written as JSON with percentiles,
+and a stored baseline can be checked for regressions.
+"""
+import csv
+import fnmatch
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+
+import bingo_generator
+
+BENCHMARK_FORMAT_VERSION = 1
+
+# Generation modes timed for every pool, as DEFAULT_CONFIG overrides
+BENCHMARK_MODES = {
+    "normal": {},
+    "race": {"race_mode": True},
+    "race-harder": {"race_mode": True, "remove_easy": True, "harder_board": True},
+    "bucket-normal": {"bucket_mode": True},
+    "bucket-hard": {"bucket_mode": True, "bucket_hard_mode": True},
+    "randomize-djinn": {"randomize_djinn": True},
+    "bucket-hard-djinn": {"bucket_mode": True, "bucket_hard_mode": True, "randomize_djinn": True},
+    "exclude-boss": {"bucket_mode": True, "exclude_boss_objectives": True}
+}
+
+# How each selection benchmark treats tag limit violations
+BENCHMARK_PATHS = {
+    # Selection only: violations are accepted as they are
+    "select": {"reroll": "never"},
+    # The reroll path, with a policy that accepts every reroll
+    "reroll": {"reroll": "always"},
+    "solve": {"solver": "backtrack"}
+}
+
+DEFAULT_SIZES = (5000, 50000)
+DEFAULT_REPEAT = 100
+DEFAULT_LOAD_REPEAT = 10
+DEFAULT_THRESHOLD = 0.2
+
+CSV_FIELDS = ['ID', 'Objective', 'Classification', 'Requirements', 'Core Tags',
+              'Supplementary Tags', 'Mutually Exclusive With', 'Rules', 'Notes']
+
+def synthetic_bingo_list(bingo_list, size):
+    """
+    Scale a bingo list to size objectives by stamping out renamed copies of it.
+
+    Copy k of an objective gets its id plus k times a stride past the largest id, and
+    " (k)" after its name. Its restrictions point at the same copy, so every copy has
+    the conflict structure of the real sheet and copies don't conflict with each other.
+    """
+    objectives = [(classification, obj) for classification, objs in bingo_list.items() for obj in objs]
+    stride = max(obj.id for _, obj in objectives) + 1
+    scaled = {classification: [] for classification in bingo_list}
+    for n in range(size):
+        copy_number, i = divmod(n, len(objectives))
+        classification, obj = objectives[i]
+        offset = copy_number * stride
+        scaled[classification].append(obj.replace(
+            name=obj.name if copy_number == 0 else f"{obj.name} ({copy_number})",
+            id=obj.id + offset,
+            restrictions=[r + offset for r in obj.restrictions]
+        ))
+    return {classification: objs for classification, objs in scaled.items() if objs}
+
+def write_bingo_csv(bingo_list, path):
+    """Write a bingo list back out in the Bingo Eval.csv layout."""
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        for classification, objectives in bingo_list.items():
+            for obj in objectives:
+                writer.writerow({
+                    'ID': obj.id,
+                    'Objective': obj.name,
+                    'Classification': classification,
+                    'Core Tags': ', '.join(obj.types),
+                    'Supplementary Tags': ', '.join(obj.supp_tags),
+                    'Mutually Exclusive With': ', '.join(map(str, obj.restrictions))
+                })
+
+def percentile(sorted_samples, q):
+    """Linearly interpolated percentile of an already sorted list, q in [0, 100]."""
+    position = (len(sorted_samples) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_samples) - 1)
+    return sorted_samples[lower] + (sorted_samples[upper] - sorted_samples[lower]) * (position - lower)
+
+def summarize(samples):
+    """Summary statistics in milliseconds for a list of timings in seconds."""
+    samples = sorted(sample * 1000 for sample in samples)
+    return {
+        "runs": len(samples),
+        "mean_ms": sum(samples) / len(samples),
+        "min_ms": samples[0],
+        "p50_ms": percentile(samples, 50),
+        "p90_ms": percentile(samples, 90),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": samples[-1]
+    }
+
+def time_case(func, repeat, warmup=1):
+    """Call func warmup times untimed, then repeat times timed, and summarize the timings."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def modify_board(index):
+    """A board holding every objective the lucky medal and equipment rewrites apply to."""
+    targets = set(bingo_generator.weapon_objectives_to_replace) | set(bingo_generator.armor_objectives_to_replace)
+    board = [obj for obj in index.objectives
+             if obj.name in targets or obj.name.lower().startswith("collect a lucky medal from")]
+    others = [obj for obj in index.objectives if obj not in board]
+    return board + others[:max(0, 25 - len(board))]
+
+def case_names(pool):
+    """Names of the cases pool_cases builds for a pool."""
+    names = [f"{pool}/load", f"{pool}/index"]
+    for path in BENCHMARK_PATHS:
+        names.extend(f"{pool}/{path}/{mode}" for mode in BENCHMARK_MODES)
+    return names
+
+def pool_cases(pool, csv_file_path, repeat, load_repeat, seed):
+    """
+    Build the benchmark cases for one pool.
+
+    Yields:
+        tuple: (name, func, repeat)
+    """
+    bingo_list = bingo_generator.csv_to_bingo_json(csv_file_path)
+    if bingo_list is None:
+        raise ValueError(f"Failed to load {csv_file_path}")
+    index = bingo_generator.ObjectiveIndex(bingo_list)
+
+    yield f"{pool}/load", lambda: bingo_generator.csv_to_bingo_json(csv_file_path), load_repeat
+    yield f"{pool}/index", lambda: bingo_generator.ObjectiveIndex(bingo_list), load_repeat
+
+    for path, path_options in BENCHMARK_PATHS.items():
+        for mode, mode_options in BENCHMARK_MODES.items():
+            config = dict(mode_options)
+            config.update(path_options)
+            generator = bingo_generator.BoardGenerator(bingo_list, config, f"{seed}:{pool}:{path}:{mode}", index)
+            yield f"{pool}/{path}/{mode}", generator.generate, repeat
+
+def run_benchmarks(csv_file_path=bingo_generator.DEFAULT_CSV, sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT,
+                   load_repeat=DEFAULT_LOAD_REPEAT, seed=0, patterns=None, progress=None):
+    """
+    Run every benchmark case whose name matches one of the patterns.
+
+    Args:
+        csv_file_path: Objective sheet, also the source of the synthetic pools
+        sizes: Objective counts of the synthetic pools
+        repeat: Timed runs per selection case
+        load_repeat: Timed runs per load and compile case
+        seed: Seed for the boards; each case derives its own stream from it
+        patterns: fnmatch patterns for the case names, all cases if None
+        progress: Optional callable(name, summary) called after each case
+
+    Returns:
+        dict: The results document, as written by run_benchmark
+    """
+    with open(csv_file_path, 'rb') as f:
+        csv_sha256 = hashlib.sha256(f.read()).hexdigest()
+    results = {
+        "version": BENCHMARK_FORMAT_VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "csv": os.path.basename(csv_file_path),
+        "csv_sha256": csv_sha256,
+        "seed": seed,
+        "cases": {}
+    }
+
+    def selected(name):
+        return patterns is None or any(fnmatch.fnmatchcase(name, pattern) for pattern in patterns)
+
+    def run(cases):
+        for name, func, runs in cases:
+            if not selected(name):
+                continue
+            summary = time_case(func, runs)
+            results["cases"][name] = summary
+            if progress:
+                progress(name, summary)
+
+    run(pool_cases("sheet", csv_file_path, repeat, load_repeat, seed))
+
+    sheet = bingo_generator.csv_to_bingo_json(csv_file_path)
+    index = bingo_generator.ObjectiveIndex(sheet)
+    board = modify_board(index)
+    rng = random.Random(f"{seed}:modify")
+
+    def modify():
+        objectives = bingo_generator.modify_lucky_medal_objectives(list(board), False, rng)
+        return bingo_generator.modify_equipment_objectives(objectives, False, rng)
+    run([("sheet/modify", modify, repeat)])
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for size in sizes:
+            pool = f"synthetic-{size}"
+            if not any(selected(name) for name in case_names(pool)):
+                continue
+            path = os.path.join(temp_dir, f"{pool}.csv")
+            write_bingo_csv(synthetic_bingo_list(sheet, size), path)
+            run(pool_cases(pool, path, repeat, load_repeat, seed))
+
+    return results
+
+def find_regressions(results, baseline, threshold=DEFAULT_THRESHOLD, metric="p50_ms"):
+    """
+    Compare results against a baseline document.
+
+    Returns:
+        list: (case, baseline value, current value) for every case present in both that
+            got slower than the baseline by more than threshold (0.2 = 20%)
+    """
+    regressions = []
+    for name, summary in results["cases"].items():
+        old = baseline.get("cases", {}).get(name)
+        if old and old.get(metric) and summary[metric] > old[metric] * (1 + threshold):
+            regressions.append((name, old[metric], summary[metric]))
+    return regressions
+
+def print_case(name, summary):
+    print(f"{name}: p50 {summary['p50_ms']:.3f} ms, p90 {summary['p90_ms']:.3f} ms, "
+          f"p99 {summary['p99_ms']:.3f} ms ({summary['runs']} runs)", file=sys.stderr)
+
+def add_benchmark_arguments(parser):
+    parser.add_argument("--csv", default=bingo_generator.DEFAULT_CSV,
+                        help=f"objective sheet (default: {bingo_generator.DEFAULT_CSV})")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(DEFAULT_SIZES),
+                        help="objective counts of the synthetic pools (default: 5000 50000)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT,
+                        help=f"timed runs per selection case (default: {DEFAULT_REPEAT})")
+    parser.add_argument("--load-repeat", type=int, default=DEFAULT_LOAD_REPEAT,
+                        help=f"timed runs per load and compile case (default: {DEFAULT_LOAD_REPEAT})")
+    parser.add_argument("--seed", type=int, default=0, help="base seed (default: 0)")
+    parser.add_argument("-k", "--cases", nargs="+", metavar="PATTERN",
+                        help="only run cases matching these patterns, e.g. 'sheet/select/*'")
+    parser.add_argument("-o", "--output", default="-", help="JSON results file, '-' for stdout (default)")
+    parser.add_argument("--baseline", help="results file to compare against; exit 1 on regressions")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"allowed slowdown against the baseline (default: {DEFAULT_THRESHOLD} = 20%%)")
+    parser.add_argument("--metric", choices=["p50_ms", "p90_ms", "p99_ms", "mean_ms"], default="p50_ms",
+                        help="statistic compared against the baseline (default: p50_ms)")
+
+def run_benchmark(args):
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = run_benchmarks(args.csv, args.sizes, args.repeat, args.load_repeat, args.seed,
+                             args.cases, progress=print_case)
+
+    text = json.dumps(results, indent=2) + "\n"
+    if args.output == '-':
+        sys.stdout.write(text)
+    else:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    if baseline is None:
+        return 0
+    regressions = find_regressions(results, baseline, args.threshold, args.metric)
+    for name, old, new in regressions:
+        print(f"Regression: {name} {args.metric} {old:.3f} ms -> {new:.3f} ms (+{new / old - 1:.0%})", file=sys.stderr)
+    if regressions:
+        return 1
+    print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}", file=sys.stderr)
+    return 0
@@ -0,0 +1,324 @@
+"""
+Snapshot cache for the parsed objective sheet, and a cache of generated boards.
+
+Most of a cold start goes into parsing Bingo Eval.csv and compiling its
+ObjectiveIndex. load_pool stores both in a pickle keyed by the SHA-256 of the CSV and
+CACHE_SCHEMA_VERSION, so a warm start is a single file read. bingo_list.js is only
+rewritten when the sheet has changed.
+
+BoardCache memoizes seeded boards for a service that is asked for the same board
+again and again, keyed by the pool's content, the normalized options and the seed.
+"""
+import collections
+import hashlib
+import json
+import os
+import pickle
+import sys
+import threading
+
+import bingo_generator
+
+# Bump whenever the layout of the bingo list or ObjectiveIndex changes
+CACHE_SCHEMA_VERSION = 3
+
+CACHE_DIR = ".bingo_cache"
+
+# Bump whenever the boards generated for a seed change, so stored boards are not reused
+BOARD_CACHE_VERSION = 1
+DEFAULT_CACHED_BOARDS = 1024
+
+def csv_hash(csv_file_path):
+    """Return the SHA-256 hex digest of a file's contents."""
+    with open(csv_file_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def snapshot_path(csv_file_path, cache_dir=None):
+    """Return where the snapshot of a CSV file is kept, by default .bingo_cache next to it."""
+    if cache_dir is None:
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_file_path)), CACHE_DIR)
+    name = os.path.splitext(os.path.basename(csv_file_path))[0]
+    return os.path.join(cache_dir, f"{name}.pickle")
+
+def read_snapshot(path, digest):
+    """Load a snapshot, or return None if it is missing, unreadable or stale."""
+    try:
+        with open(path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+        return None
+    if (not isinstance(snapshot, dict) or snapshot.get("schema") != CACHE_SCHEMA_VERSION
+            or snapshot.get("csv_sha256") != digest):
+        return None
+    return snapshot
+
+def write_snapshot(path, snapshot, description="pool cache"):
+    """Write a snapshot atomically; a cache that can't be written is only a warning."""
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(temp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Warning: could not write the {description} {path}: {e}", file=sys.stderr)
+
+def load_pool(csv_file_path, js_output_path=None, cache_dir=None, use_cache=True):
+    """
+    Load a bingo list and its ObjectiveIndex, from the snapshot when the CSV is unchanged.
+
+    Args:
+        csv_file_path: Path to the CSV file
+        js_output_path: Optional bingo_list.js to keep in step with the CSV; it is only
+            written when the CSV changed or the file is missing
+        cache_dir: Directory for the snapshot, .bingo_cache next to the CSV if None
+        use_cache: False to always parse the CSV and leave the snapshot alone
+
+    Returns:
+        tuple: (bingo_list, index), or (None, None) if the CSV couldn't be loaded
+    """
+    try:
+        digest = csv_hash(csv_file_path)
+    except FileNotFoundError:
+        print(f"Error: The file {csv_file_path} was not found.", file=sys.stderr)
+        return None, None
+    except OSError as e:
+        print(f"An unexpected error occurred: {e}", file=sys.stderr)
+        return None, None
+
+    path = snapshot_path(csv_file_path, cache_dir)
+    snapshot = read_snapshot(path, digest) if use_cache else None
+    changed = snapshot is None
+    if snapshot is None:
+        bingo_list = bingo_generator.csv_to_bingo_json(csv_file_path)
+        if bingo_list is None:
+            return None, None
+        snapshot = {
+            "schema": CACHE_SCHEMA_VERSION,
+            "csv_sha256": digest,
+            "bingo_list": bingo_list,
+            "index": bingo_generator.ObjectiveIndex(bingo_list),
+            # JS files already written from this version of the CSV
+            "js_outputs": []
+        }
+
+    if js_output_path:
+        target = os.path.abspath(js_output_path)
+        if target not in snapshot["js_outputs"] or not os.path.exists(target):
+            try:
+                bingo_generator.write_bingo_js(snapshot["bingo_list"], js_output_path)
+            except OSError as e:
+                print(f"An unexpected error occurred: {e}", file=sys.stderr)
+                return None, None
+            snapshot["js_outputs"].append(target)
+            changed = True
+
+    if changed and use_cache:
+        write_snapshot(path, snapshot)
+    return snapshot["bingo_list"], snapshot["index"]
+
+def pool_hash(bingo_list):
+    """SHA-256 hex digest of a bingo list's contents, in the bingo_list.js layout."""
+    pool = [[classification, [obj.as_dict() for obj in objectives]] for classification, objectives in bingo_list.items()]
+    return hashlib.sha256(json.dumps(pool, sort_keys=True).encode()).hexdigest()
+
+def normalize_options(config):
+    """
+    The generation options that decide what a seed's boards are, in one canonical form.
+
+    Defaults are filled in, bucket limits are resolved in bucket mode and dropped
+    otherwise, the race-only options are dropped outside race mode, tag limits are
+    compared as text and the engine, which the cache doesn't serve, is left out.
+    """
+    options = dict(bingo_generator.DEFAULT_CONFIG)
+    options.update(config or {})
+    options.pop("engine", None)
+    if options["bucket_mode"]:
+        options["bucket_limits"] = dict(options["bucket_limits"] or (
+            bingo_generator.BUCKET_LIMITS_HARD if options["bucket_hard_mode"] else bingo_generator.BUCKET_LIMITS_NORMAL))
+    else:
+        options["bucket_hard_mode"] = False
+        options["bucket_limits"] = None
+    if not options["race_mode"]:
+        options["remove_easy"] = False
+        options["harder_board"] = False
+    options["tag_limits"] = {tag: str(limit) for tag, limit in options["tag_limits"].items()}
+    return options
+
+def options_hash(config):
+    """SHA-256 hex digest of the normalized options."""
+    options = normalize_options(config)
+    return hashlib.sha256(json.dumps(options, sort_keys=True).encode()).hexdigest()
+
+class BoardCache:
+    """
+    LRU cache of generated boards over one loaded pool.
+
+    get() returns board n of a seed under some options, generating it only on a miss.
+    Entries are keyed by the pool's content hash, the normalized options, the seed and
+    the board number, so a changed sheet or option never serves a stale board. At most
+    max_boards boards are kept in memory. With a cache_dir every generated board is
+    also written there, one pickle per key, and boards evicted from memory or lost to
+    a restart are read back from it instead of being generated again. The directory
+    can be deleted at any time. The cache is safe to share between threads; two threads
+    missing the same key at once both generate the board, which is the same board.
+    """
+
+    def __init__(self, bingo_list, index=None, max_boards=DEFAULT_CACHED_BOARDS, cache_dir=None):
+        """
+        Args:
+            bingo_list: Bingo list from csv_to_bingo_json
+            index: ObjectiveIndex of bingo_list, compiled if omitted
+            max_boards: Boards kept in memory
+            cache_dir: Directory to store boards in across restarts, None for memory only
+        """
+        self.bingo_list = bingo_list
+        self.index = index if index is not None else bingo_generator.ObjectiveIndex(bingo_list)
+        self.pool_hash = pool_hash(bingo_list)
+        self.max_boards = max_boards
+        self.cache_dir = cache_dir
+        self.boards = collections.OrderedDict()
+        # Options hash -> BoardGenerator, so the tag limits are parsed once per option set
+        self.generators = {}
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.boards)
+
+    def key(self, config, seed, board=0):
+        """Cache key of board n of a seed under some options."""
+        return self._key(options_hash(config), seed, board)
+
+    def _key(self, options_digest, seed, board):
+        parts = [BOARD_CACHE_VERSION, self.pool_hash, options_digest, seed, board]
+        return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+    def board_path(self, key):
+        return os.path.join(self.cache_dir, key[:2], f"{key}.pickle")
+
+    def get(self, config=None, seed=0, board=0):
+        """
+        Return board n of a seed under some options, from the cache when possible.
+
+        Args:
+            config: Dictionary of options overriding DEFAULT_CONFIG; the batch engine
+                is never used
+            seed: Seed of the board, an int or a string
+            board: Number of the board among the seed's boards
+
+        Returns:
+            list: The board's objectives; the list is the caller's own
+        """
+        if seed is None:
+            raise ValueError("Only seeded boards can be cached")
+        options_digest = options_hash(config)
+        key = self._key(options_digest, seed, board)
+        objectives = self.lookup(key)
+        if objectives is not None:
+            return objectives
+
+        with self._lock:
+            generator = self.generators.get(options_digest)
+            if generator is None:
+                options = dict(config or {})
+                options["engine"] = "scalar"
+                generator = self.generators[options_digest] = bingo_generator.BoardGenerator(
+                    self.bingo_list, options, index=self.index)
+        objectives = generator.fork(seed).generate(board=board)
+        self.put(key, objectives)
+        return objectives
+
+    def lookup(self, key, read=True):
+        """
+        Return the board stored under a key, or None on a miss.
+
+        For callers that generate boards themselves, such as on a worker pool; pair it
+        with put().
+
+        Args:
+            key: Key from key()
+            read: Also look in cache_dir; False looks in memory only and leaves the miss
+                uncounted, for callers that run load() where file I/O may block
+
+        Returns:
+            list: The board's objectives, or None
+        """
+        with self._lock:
+            objectives = self.boards.get(key)
+            if objectives is not None:
+                self.boards.move_to_end(key)
+                self.hits += 1
+                return list(objectives)
+        return self.load(key) if read else None
+
+    def load(self, key):
+        """Read a board from cache_dir into memory; the disk half of lookup(), None on a miss."""
+        objectives = self._read(key)
+        with self._lock:
+            if objectives is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._store(key, objectives)
+        return list(objectives)
+
+    def put(self, key, objectives, write=True):
+        """
+        Store a board under a key, in memory and in cache_dir if there is one.
+
+        Args:
+            key: Key from key()
+            objectives: The board's objectives
+            write: False keeps the board in memory only, for callers that run write()
+                where file I/O may block
+        """
+        objectives = tuple(objectives)
+        if write:
+            self.write(key, objectives)
+        with self._lock:
+            self._store(key, objectives)
+
+    def write(self, key, objectives):
+        """Write a board to cache_dir, if there is one; the disk half of put()."""
+        if self.cache_dir is not None:
+            write_snapshot(self.board_path(key), tuple(objectives), "board cache")
+
+    def _store(self, key, objectives):
+        self.boards[key] = objectives
+        self.boards.move_to_end(key)
+        while len(self.boards) > self.max_boards:
+            self.boards.popitem(last=False)
+            self.evictions += 1
+
+    def _read(self, key):
+        if self.cache_dir is None:
+            return None
+        try:
+            with open(self.board_path(key), 'rb') as f:
+                objectives = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            return None
+        return objectives if isinstance(objectives, tuple) else None
+
+    def clear(self):
+        """Drop the boards kept in memory; stored boards stay on disk."""
+        with self._lock:
+            self.boards.clear()
+
+    def stats(self):
+        """Hit and miss counters as a dictionary."""
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "boards": len(self.boards),
+                "max_boards": self.max_boards,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0
+            }
@@ -0,0 +1,148 @@
+"""
+Streaming export of generated boards.
+
+Boards are serialized one at a time as they are yielded, so a batch of any size is
+written with flat memory. The layouts are:
+
+    jsonl      one [{"name": ...}] list per line, the layout of selected_objectives.txt
+    csv        a header, then one row per board: its number and the ids of its 25
+               squares, or the name of a generated objective, which has no id
+    boards-js  a bingoBoards array, then one bingoBoards[n] = [...]; assignment per
+               board holding its bingo_list.js records. This is a layout of its own,
+               not the bingoList of bingo_list.js, which lists the objectives of the
+               sheet by classification rather than by board
+
+Rows go through a large write buffer, are gzip-compressed on request or when the
+path ends in .gz, and '-' writes to stdout so an export can be piped.
+"""
+import contextlib
+import csv
+import gzip
+import io
+import json
+import os
+import sys
+
+BOARD_SIZE = 25
+DEFAULT_BUFFER_SIZE = 1 << 20
+
+def jsonl_rows(boards):
+    """Yield each board as a line of JSON."""
+    for board in boards:
+        yield json.dumps([{"name": obj.name} for obj in board]) + "\n"
+
+def csv_rows(boards, start=0):
+    """Yield a header and then one CSV row per board, numbered from start."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, lineterminator="\n")
+
+    def text(row):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerow(row)
+        return buffer.getvalue()
+
+    yield text(["board"] + [f"square_{i}" for i in range(1, BOARD_SIZE + 1)])
+    for number, board in enumerate(boards, start):
+        row = [number] + [obj.name if obj.id is None else obj.id for obj in board]
+        # Short boards get empty squares so every row has the same columns
+        row.extend([""] * (BOARD_SIZE - len(board)))
+        yield text(row)
+
+def boards_js_rows(boards, start=0):
+    """Yield a bingoBoards declaration and then one assignment per board, numbered from start."""
+    yield "var bingoBoards = [];\n\n"
+    for number, board in enumerate(boards, start):
+        yield f"bingoBoards[{number}] = {json.dumps([obj.as_dict() for obj in board])};\n"
+
+EXPORT_FORMATS = {
+    "jsonl": jsonl_rows,
+    "csv": csv_rows,
+    "boards-js": boards_js_rows
+}
+# The layouts that number the boards, and so take the number of the first one
+NUMBERED_FORMATS = {"csv", "boards-js"}
+# File extension -> export format
+EXTENSION_FORMATS = {
+    "jsonl": "jsonl",
+    "csv": "csv",
+    "js": "boards-js"
+}
+
+def infer_format(path):
+    """Export format for an output path by its extension, a .gz suffix aside; jsonl if unknown."""
+    if path.endswith(".gz"):
+        path = path[:-3]
+    extension = os.path.splitext(path)[1].lstrip(".")
+    return EXTENSION_FORMATS.get(extension, "jsonl")
+
+@contextlib.contextmanager
+def open_output(path='-', compress=None, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Open a buffered text stream for an export.
+
+    Args:
+        path: Output file, '-' for stdout; stdout itself is left open afterwards
+        compress: Gzip the output; None to compress when the path ends in .gz
+        buffer_size: Bytes buffered before a write reaches the file or the compressor
+
+    Yields:
+        io.TextIOWrapper: The stream to write the rows to
+    """
+    if compress is None:
+        compress = path.endswith(".gz")
+    if path == '-':
+        sys.stdout.flush()
+        raw = io.FileIO(sys.stdout.fileno(), 'w', closefd=False)
+    else:
+        raw = io.FileIO(path, 'w')
+    try:
+        target = gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) if compress else raw
+        stream = io.TextIOWrapper(io.BufferedWriter(target, buffer_size), encoding='utf-8', newline='\n')
+        try:
+            yield stream
+        finally:
+            # Flushes the buffer and, when compressing, writes the gzip trailer
+            stream.close()
+    finally:
+        raw.close()
+
+def export_boards(boards, path='-', file_format="jsonl", compress=None, start=0, buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Write boards as they are yielded.
+
+    Args:
+        boards: Iterable of boards, such as generate_boards()
+        path: Output file, '-' for stdout
+        file_format: One of EXPORT_FORMATS
+        compress: Gzip the output; None to compress when the path ends in .gz
+        start: Number of the first board, for the NUMBERED_FORMATS
+        buffer_size: Bytes buffered before a write reaches the file or the compressor
+
+    Returns:
+        int: Number of boards written
+    """
+    count = 0
+
+    def counted():
+        nonlocal count
+        for board in boards:
+            count += 1
+            yield board
+
+    rows = EXPORT_FORMATS[file_format]
+    with open_output(path, compress, buffer_size) as output:
+        for row in rows(counted(), start) if file_format in NUMBERED_FORMATS else rows(counted()):
+            output.write(row)
+    return count
+
+def add_export_arguments(parser):
+    parser.add_argument("-o", "--output", default="-", help="output file, '-' for stdout (default)")
+    parser.add_argument("--format", choices=list(EXPORT_FORMATS),
+                        help="output layout (default: by the output file's extension, otherwise jsonl)")
+    parser.add_argument("--compress", action="store_true",
+                        help="gzip the output; files ending in .gz are always compressed")
+
+def export_format(args):
+    """The export format chosen by add_export_arguments options."""
+    return args.format or infer_format(args.output)
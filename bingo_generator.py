@@ -3,13 +3,26 @@ import json
 import random
 import re
 import os
+import sys
+import copy
+import time
+import argparse
+import itertools
+import logging
+import contextlib
 from collections import defaultdict
 
 # Define djinn lists by element
 venus_djinn = ["Flint", "Granite", "Quartz", "Vine", "Sap", "Ground", "Bane", "Echo", "Steel", "Mud", "Flower", "Meld", "Petra", "Salt", "Geode", "Mold", "Crystal"]
 mercury_djinn = ["Fizz", "Sleet", "Mist", "Spritz", "Hail", "Tonic", "Dew", "Fog", "Sour", "Spring", "Shade", "Steam", "Rime", "Gel", "Eddy", "Balm", "Serac"]
-mars_djinn = ["Forge", "Fever", "Corona", "Scorch", "Ember", "Flash", "Torch", "Cannon", "Spark", " Kindle", "Char", "Coal", "Reflux", "Core", "Tinder", "Shine", "Fury", "Fugue"]
+mars_djinn = ["Forge", "Fever", "Corona", "Scorch", "Ember", "Flash", "Torch", "Cannon", "Spark", "Kindle", "Char", "Coal", "Reflux", "Core", "Tinder", "Shine", "Fury", "Fugue"]
 jupiter_djinn = ["Gust", "Breeze", "Zephyr", "Smog", "Kite", "Squall", "Luff", "Breath", "Blitz", "Ether", "Waft", "Haze", "Wheeze", "Aroma", "Whorl", "Gasp", "Lull", "Gale"]
+djinn_by_element = {
+    "Venus": venus_djinn,
+    "Mercury": mercury_djinn,
+    "Mars": mars_djinn,
+    "Jupiter": jupiter_djinn
+}
 
 # Define summons list
 summons = ["Zagan", "Megaera", "Flora", "Moloch", "Ulysses", "Eclipse", "Haures", "Coatlicue", "Daedalus", "Azul", "Catastrophe", "Charon", "Iris"]
@@ -56,26 +69,70 @@ armor_objectives_to_replace = [
     "Collect the Spirit Gloves or the Fujin Shield"
 ]
 
-# Keep track of excluded summons based on selected objectives
-excluded_summons = set()
+# Define tag limits
+DEFAULT_TAG_LIMITS = {
+    "Whirlwind": "5", "Lash": "2", "Pound": "3", "Scoop": "2", "Reveal": "2",
+    "Douse": "2", "Frost": "2", "Growth": "1", "Cyclone": "2", "Sand": "2",
+    "Parch": "2", "Burst": "2", "Grind": "-", "Hover": "-",
+    "Lift": "2", "Carry": "1", "Force": "1", "Blaze": "2", "Teleport": "2",
+    "Mind Read": "1", "RarePsy": "2"
+}
+
+# Objectives drawn from each bucket in bucket mode
+BUCKET_LIMITS_NORMAL = {
+    "A": 4, "B": 5, "C": 4, "D": 7, "E": 4, "F": 1
+}
+BUCKET_LIMITS_HARD = {
+    "A": 1, "B": 4, "C": 5, "D": 7, "E": 5, "F": 3
+}
 
-def get_available_summons():
+# Defaults for unattended generation (generate_boards and the command line)
+DEFAULT_CSV = "Bingo Eval.csv"
+DEFAULT_MAX_REROLL_ROUNDS = 20
+DEFAULT_CONFIG = {
+    "race_mode": False,
+    "remove_easy": False,
+    "harder_board": False,
+    "bucket_mode": False,
+    "bucket_hard_mode": False,
+    "exclude_boss_objectives": False,
+    "randomize_djinn": False,
+    "tag_limits": DEFAULT_TAG_LIMITS,
+    "reroll": "always",
+    "max_reroll_rounds": DEFAULT_MAX_REROLL_ROUNDS,
+    "engine": "scalar",
+    "solver": "greedy",
+    # Objectives per bucket in bucket mode; None for BUCKET_LIMITS_NORMAL or _HARD
+    "bucket_limits": None
+}
+
+# Selection messages: picks and rewrites at DEBUG, reroll notices at INFO, shortfalls
+# at WARNING. Nothing is logged when select_random_objectives runs with verbose=False.
+logger = logging.getLogger("bingo_generator")
+
+def get_available_summons(excluded_summons=()):
     """Get list of available summons excluding those that are banned."""
     return [s for s in summons if s not in excluded_summons]
 
-def generate_summon_objective():
-    """Generate a random summon objective using only available summons."""
-    available = get_available_summons()
+def generate_summon_objective(excluded_summons=(), rng=random):
+    """
+    Generate a random summon objective using only available summons.
+
+    Args:
+        excluded_summons: Summons ruled out by objectives already on the board
+        rng: Random number generator to draw from
+    """
+    available = get_available_summons(excluded_summons)
     if len(available) < 2:
         # If we don't have enough summons, use what's available or return a default
         if len(available) == 1:
             return f"Learn {available[0]}"
         return "No valid summons available"
-    selected_summons = random.sample(available, 2)
+    selected_summons = rng.sample(available, 2)
     return f"Learn {selected_summons[0]} or {selected_summons[1]}"
 
-def update_excluded_summons(objective_name):
-    """Update the excluded summons list based on an objective."""
+def update_excluded_summons(objective_name, excluded_summons):
+    """Update a board's set of excluded summons based on an objective."""
     if objective_name in summon_exclusions:
         excluded_summons.update(summon_exclusions[objective_name])
 
@@ -91,72 +148,137 @@ replaceable_objectives = {
 
 def should_replace_objective(obj):
     """Check if an objective should be replaced with a new summon objective."""
-    return obj.get('name', '') in replaceable_objectives
+    return obj.name in replaceable_objectives
 
-def generate_summon_objective():
-    """Generate a random summon objective using only available summons."""
-    available = get_available_summons()
-    if len(available) < 2:
-        # If we don't have enough summons, use what's available or return a default
-        if len(available) == 1:
-            return f"Learn {available[0]}"
-        return "No valid summons available"
-    selected_summons = random.sample(available, 2)
-    return f"Learn {selected_summons[0]} or {selected_summons[1]}"        
-        
-def generate_djinn_objective(used_djinn):
+class Objective:
     """
-    Generate a random djinn objective following the specified rules.
-    
-    Args:
-        used_djinn: Set of djinn that have already been used in other objectives
-    
-    Returns:
-        tuple: (objective_text, primary_element) or (None, None) if no valid combination possible
+    One objective of the sheet, or one generated for a board.
+
+    Records are immutable and compare by identity, so the same objective on many
+    boards is one shared object and membership tests are pointer comparisons.
+    Restrictions are integer ids and tags are tuples of interned strings. Generated
+    objectives have no tags or restrictions. replace() returns a changed copy, such as
+    a lucky medal objective with its locations filled in.
     """
-    elements = {
-        "Venus": [d for d in venus_djinn if d not in used_djinn],
-        "Mercury": [d for d in mercury_djinn if d not in used_djinn],
-        "Mars": [d for d in mars_djinn if d not in used_djinn],
-        "Jupiter": [d for d in jupiter_djinn if d not in used_djinn]
-    }
-    
-    # Filter out elements that don't have enough djinn for primary element (need 2)
-    valid_primary_elements = [e for e, djinn_list in elements.items() if len(djinn_list) >= 2]
-    
-    # Filter out elements that don't have any djinn for secondary element (need 1)
-    valid_secondary_elements = [e for e, djinn_list in elements.items() if len(djinn_list) >= 1]
-    
-    if not valid_primary_elements or not valid_secondary_elements:
-        return None, None
-    
-    # Select primary element (for 2 djinn)
-    primary_element = random.choice(valid_primary_elements)
-    
-    # Select two djinn from primary element
-    try:
-        primary_djinn = random.sample(elements[primary_element], 2)
-    except ValueError:
-        return None, None
-    
-    # Select secondary element and one djinn
-    valid_secondary = [e for e in valid_secondary_elements if e != primary_element]
-    if not valid_secondary:
-        return None, None
-        
-    secondary_element = random.choice(valid_secondary)
-    try:
-        secondary_djinn = [random.choice(elements[secondary_element])]
-    except IndexError:
-        return None, None
-    
-    # Format the objective - always list primary element djinn first
-    return f"Befriend {primary_djinn[0]}, {primary_djinn[1]}, or {secondary_djinn[0]}", primary_element
 
-def generate_summon_objective():
-    """Generate a random summon objective."""
-    selected_summons = random.sample(summons, 2)
-    return f"Learn {selected_summons[0]} or {selected_summons[1]}"
+    __slots__ = ("name", "id", "types", "supp_tags", "restrictions")
+
+    def __init__(self, name, id=None, types=(), supp_tags=(), restrictions=()):
+        set_field = object.__setattr__
+        set_field(self, "name", name)
+        set_field(self, "id", id)
+        set_field(self, "types", tuple(sys.intern(tag) for tag in types))
+        set_field(self, "supp_tags", tuple(sys.intern(tag) for tag in supp_tags))
+        set_field(self, "restrictions", tuple(restrictions))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Objective records are immutable; use replace()")
+
+    def __delattr__(self, name):
+        raise AttributeError("Objective records are immutable")
+
+    def __reduce__(self):
+        return Objective, (self.name, self.id, self.types, self.supp_tags, self.restrictions)
+
+    def __repr__(self):
+        return f"Objective({self.name!r}, id={self.id!r})"
+
+    def replace(self, **changes):
+        """Return a copy with some fields changed."""
+        fields = {field: getattr(self, field) for field in self.__slots__}
+        fields.update(changes)
+        return Objective(**fields)
+
+    def as_dict(self):
+        """The objective in the bingo_list.js layout."""
+        return {
+            "name": self.name,
+            "types": list(self.types),
+            "id": self.id,
+            "SuppTags": list(self.supp_tags),
+            "Restrictions": [str(restriction) for restriction in self.restrictions]
+        }
+
+class BoardRandom:
+    """
+    The random streams of one board, derived from a seed and the board's number.
+
+    Board n of a seed always gets the same streams, however many boards came before it
+    and whichever process builds it, so (seed, n) is enough to reproduce a board. Each
+    step of the generation draws from a substream of its own, so a change in how much
+    one step draws, such as an extra reroll, doesn't shift what the others draw.
+    """
+
+    STREAMS = ("selection", "bucket_c", "summons", "rewrites")
+    __slots__ = STREAMS + ("key",)
+
+    def __init__(self, seed, board=0):
+        self.key = f"{seed}:{board}"
+
+    def __getattr__(self, stream):
+        # Streams are seeded on first use, since most boards never touch some of them
+        if stream not in self.STREAMS:
+            raise AttributeError(stream)
+        rng = random.Random(f"{self.key}:{stream}")
+        setattr(self, stream, rng)
+        return rng
+
+    @classmethod
+    def single(cls, rng):
+        """Streams that all draw from one generator, for callers that pass a plain rng."""
+        streams = cls.__new__(cls)
+        for stream in cls.STREAMS:
+            setattr(streams, stream, rng)
+        return streams
+
+class DjinnSampler:
+    """
+    Draws the randomized djinn objectives of one board.
+
+    Each objective names two djinn of a primary element and one of a different
+    element. Primary elements are drawn without replacement and every djinn at most
+    once per board. The sampler keeps the set of djinn still available for each
+    element and the primary elements not used yet, so every draw does a fixed amount
+    of work and never has to retry.
+    """
+
+    def __init__(self, rng=random):
+        self.rng = rng
+        self.available = {element: list(djinn) for element, djinn in djinn_by_element.items()}
+        self.unused_primary_elements = list(djinn_by_element)
+
+    def _take(self, element):
+        """Remove and return a random djinn of an element, by swapping it with the last one."""
+        djinn = self.available[element]
+        i = self.rng.randrange(len(djinn))
+        djinn[i], djinn[-1] = djinn[-1], djinn[i]
+        return djinn.pop()
+
+    def draw(self):
+        """
+        Draw the next djinn objective.
+
+        Returns:
+            dict: {"name", "primary_element", "djinn"} with the djinn in the order they
+                are named, or None if no element can be the primary one any more
+        """
+        primary_elements = [e for e in self.unused_primary_elements if len(self.available[e]) >= 2]
+        if not primary_elements:
+            return None
+        primary_element = self.rng.choice(primary_elements)
+        secondary_elements = [e for e in self.available if e != primary_element and self.available[e]]
+        if not secondary_elements:
+            return None
+        self.unused_primary_elements.remove(primary_element)
+        secondary_element = self.rng.choice(secondary_elements)
+
+        # Always list the primary element djinn first
+        djinn = (self._take(primary_element), self._take(primary_element), self._take(secondary_element))
+        return {
+            "name": f"Befriend {djinn[0]}, {djinn[1]}, or {djinn[2]}",
+            "primary_element": primary_element,
+            "djinn": djinn
+        }
 
 def find_csv_file():
     csv_files = [f for f in os.listdir('.') if f.endswith('.csv')]
@@ -164,7 +286,7 @@ def find_csv_file():
         return csv_files[0]
     return None
 
-def csv_to_bingo_json(csv_file_path, output_file_path):
+def csv_to_bingo_json(csv_file_path, output_file_path=None):
     bingo_list = {}
     
     try:
@@ -178,50 +300,46 @@ def csv_to_bingo_json(csv_file_path, output_file_path):
                     objective = row['Objective']
                     core_tags = [tag.strip() for tag in row['Core Tags'].split(',') if tag.strip()]
                     supp_tags = [tag.strip() for tag in row['Supplementary Tags'].split(',') if tag.strip()]
-                    restrictions = [r.strip() for r in row['Mutually Exclusive With'].split(',') if r.strip()]
+                    # Entries that aren't ids could never match an objective, so they are dropped
+                    restrictions = [int(r) for r in row['Mutually Exclusive With'].split(',') if r.strip().isdigit()]
                     
                     if classification not in bingo_list:
                         bingo_list[classification] = []
                     
-                    bingo_list[classification].append({
-                        "name": objective,
-                        "types": core_tags,
-                        "id": id,
-                        "SuppTags": supp_tags,
-                        "Restrictions": restrictions
-                    })
+                    bingo_list[classification].append(Objective(objective, id, core_tags, supp_tags, restrictions))
                 except ValueError as e:
-                    print(f"Error processing row: {row}. Error: {e}")
+                    print(f"Error processing row: {row}. Error: {e}", file=sys.stderr)
                     continue
         
-        # Convert the dictionary to the desired format
-        formatted_bingo_list = []
-        for i in range(1, max(bingo_list.keys()) + 1):
-            if i in bingo_list:
-                formatted_bingo_list.append(f"bingoList[{i}] = {json.dumps(bingo_list[i], indent=2)};")
-            else:
-                formatted_bingo_list.append(f"bingoList[{i}] = [];")
-        
-        # Write the formatted bingo list to a JavaScript file
-        with open(output_file_path, 'w') as js_file:
-            js_file.write("var bingoGenerator = require(\"./generators/generator_bases/srl_generator_v5.js\");\n")
-            js_file.write("var bingoList = [];\n\n")
-            js_file.write("\n\n".join(formatted_bingo_list))
-        print(f"Bingo list has been generated and saved to {output_file_path}")
+        if output_file_path:
+            write_bingo_js(bingo_list, output_file_path)
         return bingo_list
     except FileNotFoundError:
-        print(f"Error: The file {csv_file_path} was not found.")
+        print(f"Error: The file {csv_file_path} was not found.", file=sys.stderr)
         return None
     except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+        print(f"An unexpected error occurred: {e}", file=sys.stderr)
         return None
 
-def is_valid_objective(objective, selected_objectives, classification_count, max_per_classification, classification):
-    for selected in selected_objectives:
-        if str(selected.get('id', '')) in objective.get('Restrictions', []) or str(objective.get('id', '')) in selected.get('Restrictions', []):
-            return False
-    
-    if any(obj['name'] == objective['name'] for obj in selected_objectives):
+def write_bingo_js(bingo_list, output_file_path):
+    """Write a bingo list as the bingoList JavaScript file used by the SRL generator."""
+    # Each classification is written as soon as it is formatted, rather than joining the whole file first
+    with open(output_file_path, 'w') as js_file:
+        js_file.write("var bingoGenerator = require(\"./generators/generator_bases/srl_generator_v5.js\");\n")
+        js_file.write("var bingoList = [];\n\n")
+        for i in range(1, max(bingo_list.keys()) + 1):
+            if i > 1:
+                js_file.write("\n\n")
+            if i in bingo_list:
+                js_file.write(f"bingoList[{i}] = {json.dumps([obj.as_dict() for obj in bingo_list[i]], indent=2)};")
+            else:
+                js_file.write(f"bingoList[{i}] = [];")
+    print(f"Bingo list has been generated and saved to {output_file_path}")
+
+def is_valid_objective(objective_bit, forbidden, classification_count, max_per_classification, classification):
+    # forbidden holds the conflict masks of everything already on the board, which
+    # covers mutual exclusions and duplicates in a single check
+    if forbidden & objective_bit:
         return False
     
     if classification_count[classification] >= max_per_classification:
@@ -232,7 +350,7 @@ def is_valid_objective(objective, selected_objectives, classification_count, max
 def check_tag_occurrences(selected_objectives, tag_limits):
     tag_counts = defaultdict(int)
     for obj in selected_objectives:
-        for tag in obj.get('types', []):
+        for tag in obj.types:
             if tag in tag_limits:
                 tag_counts[tag] += 1
     
@@ -243,16 +361,74 @@ def check_tag_occurrences(selected_objectives, tag_limits):
     
     return violations
 
-def is_valid_reroll_objective(objective, selected_objectives, classification_count, max_per_classification, classification, tag_limits):
+class TagBudget:
+    """
+    Per-tag occurrence counts for one board, checked against a tag_limits dict.
+
+    The limits are parsed once when the budget is built; new_board() returns an empty
+    budget that shares them. Each tag is a slot in a small integer vector, so adding,
+    removing or testing an objective only touches the slots of its own tags.
+    """
+
+    def __init__(self, tag_limits):
+        self.tag_limits = dict(tag_limits or {})
+        self.tags = list(self.tag_limits)
+        self.slots = {tag: slot for slot, tag in enumerate(self.tags)}
+        # '-' means the tag is counted but never limited
+        self.limits = [None if limit == '-' else int(limit) for limit in self.tag_limits.values()]
+        self.counts = [0] * len(self.tags)
+        self.headroom = [sys.maxsize if limit is None else limit for limit in self.limits]
+        # objective tags -> ((slot, occurrences), ...), shared by every board
+        self._slot_cache = {}
+
+    def new_board(self):
+        """Return an empty budget with the same limits."""
+        budget = copy.copy(self)
+        budget.counts = [0] * len(self.tags)
+        budget.headroom = [sys.maxsize if limit is None else limit for limit in self.limits]
+        return budget
+
+    def slots_for(self, tags):
+        """Return ((slot, occurrences), ...) for the limited and counted tags among tags."""
+        tags = tuple(tags)
+        slots = self._slot_cache.get(tags)
+        if slots is None:
+            occurrences = defaultdict(int)
+            for tag in tags:
+                if tag in self.slots:
+                    occurrences[self.slots[tag]] += 1
+            slots = self._slot_cache[tags] = tuple(occurrences.items())
+        return slots
+
+    def can_add(self, tags):
+        """Check whether an objective with these tags fits without exceeding a limit."""
+        headroom = self.headroom
+        for slot, occurrences in self.slots_for(tags):
+            if headroom[slot] < occurrences:
+                return False
+        return True
+
+    def add(self, tags):
+        for slot, occurrences in self.slots_for(tags):
+            self.counts[slot] += occurrences
+            self.headroom[slot] -= occurrences
+
+    def remove(self, tags):
+        for slot, occurrences in self.slots_for(tags):
+            self.counts[slot] -= occurrences
+            self.headroom[slot] += occurrences
+
+    def violations(self):
+        """Return {tag: count} for every tag over its limit, like check_tag_occurrences."""
+        return {self.tags[slot]: self.counts[slot] for slot, headroom in enumerate(self.headroom) if headroom < 0}
+
+def is_valid_reroll_objective(objective_bit, tags, forbidden, classification_count, max_per_classification, classification, tag_budget):
     # Check basic validity
-    if not is_valid_objective(objective, selected_objectives, classification_count, max_per_classification, classification):
+    if not is_valid_objective(objective_bit, forbidden, classification_count, max_per_classification, classification):
         return False
     
     # Check tag limits
-    temp_selected = selected_objectives + [objective]
-    violations = check_tag_occurrences(temp_selected, tag_limits)
-    
-    return len(violations) == 0
+    return tag_budget.can_add(tags)
 
 def classify_into_buckets(classification):
     if classification in [2, 3, 4, 8]:
@@ -270,6 +446,147 @@ def classify_into_buckets(classification):
     else:
         return "Unknown"
 
+class ObjectiveIndex:
+    """
+    Compiled lookup tables for a bingo list returned by csv_to_bingo_json.
+
+    Every objective gets a dense integer id (its position in `objectives`), so the
+    selection code can find its classification, bucket, tags and restrictions by
+    indexing instead of scanning the classification lists.
+    """
+
+    def __init__(self, bingo_list):
+        self.objectives = []
+        self.classifications = []
+        self.buckets = []
+        self.tags = []
+        self.restrictions = []
+        self.bits = []
+        self.conflicts = []
+        self.by_classification = {}
+        self.by_bucket = {bucket: [] for bucket in "ABCDEF"}
+        self.ids = {}
+        # (exclude_boss_objectives, randomize_djinn) -> candidate pools, see candidate_pools
+        self._pools = {}
+        # (tag limits, classification cap) -> BacktrackingSolver, see solver
+        self._solvers = {}
+
+        for classification, objectives in bingo_list.items():
+            bucket = classify_into_buckets(classification)
+            class_ids = self.by_classification.setdefault(classification, [])
+            for obj in objectives:
+                objective_id = len(self.objectives)
+                self.objectives.append(obj)
+                self.classifications.append(classification)
+                self.buckets.append(bucket)
+                self.tags.append(obj.types)
+                class_ids.append(objective_id)
+                if bucket != "Unknown":
+                    self.by_bucket[bucket].append(objective_id)
+                self.ids.setdefault(obj.id, objective_id)
+
+        # Restrictions reference CSV ids; resolve them once the whole sheet is numbered.
+        # Ids that don't exist in the sheet can never be selected, so they are dropped.
+        for obj in self.objectives:
+            resolved = set()
+            for restriction in obj.restrictions:
+                objective_id = self.ids.get(restriction)
+                if objective_id is not None:
+                    resolved.add(objective_id)
+            self.restrictions.append(tuple(sorted(resolved)))
+
+        # Conflict masks: bit j of conflicts[i] is set when i and j can't share a board.
+        # Restrictions are applied in both directions, and an objective conflicts with
+        # itself and with anything else of the same name.
+        self.bits = [1 << objective_id for objective_id in range(len(self.objectives))]
+        self.conflicts = list(self.bits)
+        by_name = defaultdict(int)
+        for objective_id, obj in enumerate(self.objectives):
+            by_name[obj.name] |= self.bits[objective_id]
+        for objective_id, obj in enumerate(self.objectives):
+            self.conflicts[objective_id] |= by_name[obj.name]
+            for other_id in self.restrictions[objective_id]:
+                self.conflicts[objective_id] |= self.bits[other_id]
+                self.conflicts[other_id] |= self.bits[objective_id]
+
+    def __len__(self):
+        return len(self.objectives)
+
+    def lookup(self, objective):
+        """Return the dense id of an objective, or None if it isn't in the sheet."""
+        return self.ids.get(objective.id)
+
+    def candidate_pools(self, exclude_boss_objectives=False, randomize_djinn=False):
+        """
+        Return the ids that may be drawn under one combination of options.
+
+        The pools are filtered once per combination and cached on the index. They are
+        tuples, so callers sample them with lazy_shuffle instead of shuffling in place.
+
+        Args:
+            exclude_boss_objectives: Leave out objectives tagged Boss
+            randomize_djinn: Leave Bucket C empty, since it is generated instead
+
+        Returns:
+            tuple: ({classification: ids}, {bucket: ids})
+        """
+        key = (bool(exclude_boss_objectives), bool(randomize_djinn))
+        pools = self._pools.get(key)
+        if pools is None:
+            by_classification = {}
+            by_bucket = {bucket: [] for bucket in self.by_bucket}
+            for classification, objective_ids in self.by_classification.items():
+                bucket = classify_into_buckets(classification)
+                if randomize_djinn and bucket == "C":
+                    objective_ids = ()
+                elif exclude_boss_objectives:
+                    objective_ids = [i for i in objective_ids if "Boss" not in self.tags[i]]
+                by_classification[classification] = tuple(objective_ids)
+                if bucket != "Unknown":
+                    by_bucket[bucket].extend(objective_ids)
+            pools = self._pools[key] = (by_classification, {bucket: tuple(ids) for bucket, ids in by_bucket.items()})
+        return pools
+
+    def solver(self, tag_budget, max_per_classification=float('inf')):
+        """
+        Return the backtracking solver for one set of tag limits and classification cap.
+
+        Building a solver compiles masks over the whole sheet, so solvers are cached on
+        the index like the candidate pools and shared by every board drawn under the
+        same limits.
+
+        Args:
+            tag_budget: TagBudget whose limits the solver checks
+            max_per_classification: Most objectives of one classification on a board
+
+        Returns:
+            bingo_solver.BacktrackingSolver
+        """
+        import bingo_solver
+        # Budget slots follow the order of the limits, so the order is part of the key
+        key = (tuple(tag_budget.tag_limits.items()), max_per_classification)
+        solver = self._solvers.get(key)
+        if solver is None:
+            solver = self._solvers[key] = bingo_solver.BacktrackingSolver(self, tag_budget, max_per_classification)
+        return solver
+
+def lazy_shuffle(pool, rng=random):
+    """
+    Yield the items of pool in random order without copying or modifying it.
+
+    This is a Fisher-Yates shuffle run one step per item taken, with the swapped
+    positions kept in a dict, so a caller that stops after k items has done O(k) work
+    however large the pool is.
+    """
+    swapped = {}
+    n = len(pool)
+    for i in range(n):
+        j = rng.randrange(i, n)
+        item = swapped.get(j, pool[j])
+        if j != i:
+            swapped[j] = swapped.get(i, pool[i])
+        yield item
+
 # Define class types and their properties
 class_table = {
     "Enchanter": {"type": "Dual", "adept": ("Venus", "Mars"), "element": "Jupiter"},
@@ -309,66 +626,107 @@ def are_classes_compatible(class1, class2):
         return info1["adept"] != info2["adept"]
     return True
 
-def generate_class_objectives(num_objectives):
-    """Generate the specified number of class objectives."""
-    objectives = []
-    used_types = set()
-    
-    while len(objectives) < num_objectives:
-        # Decide objective type with 2:1:1 ratio for Dual:Triple:Quad
-        if "Quad" not in used_types and random.random() < 0.25:
-            obj_type = "Quad"
-        elif "Triple" not in used_types and random.random() < 0.33:
-            obj_type = "Triple"
-        else:
-            obj_type = "Dual"
-        
-        if obj_type in used_types:
-            continue
-            
-        available_classes = get_classes_by_type(obj_type)
-        
-        if obj_type == "Dual":
-            # Pick two different dual classes
-            class1 = random.choice(available_classes)
-            class2 = random.choice([c for c in available_classes if c != class1])
-            
-            # Check compatibility with existing Triple objectives
-            triple_obj = next((obj for obj in objectives if class_table[obj["class"]]["type"] == "Triple"), None)
-            if triple_obj and (not are_classes_compatible(class1, triple_obj["class"]) or 
-                             not are_classes_compatible(class2, triple_obj["class"])):
-                continue
-                
-            objectives.append({
-                "name": f"Have a {class1} and {class2} in the party simultaneously",
-                "class": class1,
-                "second_class": class2,
-                "type": "Dual"
-            })
-        else:  # Triple or Quad
-            selected_class = random.choice(available_classes)
-            
-            # Check compatibility with existing Dual objectives
-            dual_objs = [obj for obj in objectives if class_table[obj["class"]]["type"] == "Dual"]
-            if any(not are_classes_compatible(selected_class, obj["class"]) for obj in dual_objs):
-                continue
-                
-            objectives.append({
-                "name": class_table[selected_class]["text"],
-                "class": selected_class,
-                "type": obj_type
-            })
-            
-        used_types.add(obj_type)
-    
-    return objectives    
+def generate_class_objectives(num_objectives, rng=random):
+    """
+    Generate the specified number of class objectives.
+
+    Each call is one weighted draw from class_combination_table.
+
+    Args:
+        num_objectives: Number of objectives, at most one per class objective type
+        rng: Random number generator to draw from
+
+    Returns:
+        list: Class objective dictionaries
+
+    Raises:
+        ValueError: If num_objectives is negative or more than there are types
+    """
+    if num_objectives not in class_combination_table:
+        raise ValueError(f"Can't generate {num_objectives} class objectives; each of the "
+                         f"{len(class_type_weights)} class types can only be used once")
+    combinations, cum_weights = class_combination_table[num_objectives]
+    combination = rng.choices(combinations, cum_weights=cum_weights)[0]
+    return [dict(objective) for objective in combination]
+
+def class_objective_options(class_type):
+    """Every objective of one class type; Dual objectives are ordered pairs of classes."""
+    available_classes = get_classes_by_type(class_type)
+    if class_type == "Dual":
+        return [{
+            "name": f"Have a {class1} and {class2} in the party simultaneously",
+            "class": class1,
+            "second_class": class2,
+            "type": "Dual"
+        } for class1 in available_classes for class2 in available_classes if class1 != class2]
+    return [{
+        "name": class_table[selected_class]["text"],
+        "class": selected_class,
+        "type": class_type
+    } for selected_class in available_classes]
+
+def build_class_combination_table():
+    """
+    Enumerate every valid set of class objectives once, for each number of objectives.
+
+    The types of a set are weighted as if drawn one after another without replacement
+    in the class_type_weights ratio, and that weight is split evenly over the
+    compatible combinations of objectives of those types.
+
+    Returns:
+        dict: num_objectives -> (combinations, cumulative weights), each combination a
+            tuple of objective dictionaries
+    """
+    options = {class_type: class_objective_options(class_type) for class_type in class_type_weights}
+
+    def compatible(combination):
+        for i, objective in enumerate(combination):
+            for other in combination[i + 1:]:
+                for class1 in (objective["class"], objective.get("second_class")):
+                    for class2 in (other["class"], other.get("second_class")):
+                        if class1 and class2 and not are_classes_compatible(class1, class2):
+                            return False
+        return True
+
+    table = {}
+    for num_objectives in range(len(class_type_weights) + 1):
+        combinations = []
+        weights = []
+        for class_types in itertools.combinations(class_type_weights, num_objectives):
+            # Probability of drawing exactly these types, summed over the draw orders
+            type_weight = 0
+            for order in itertools.permutations(class_types):
+                remaining = sum(class_type_weights.values())
+                probability = 1
+                for class_type in order:
+                    probability *= class_type_weights[class_type] / remaining
+                    remaining -= class_type_weights[class_type]
+                type_weight += probability
 
-def modify_lucky_medal_objectives(selected_objectives):
+            valid = [c for c in itertools.product(*(options[t] for t in class_types)) if compatible(c)]
+            for combination in valid:
+                combinations.append(combination)
+                weights.append(type_weight / len(valid))
+        table[num_objectives] = (combinations, list(itertools.accumulate(weights)))
+    return table
+
+# Dual:Triple:Quad ratio for the types of class objectives
+class_type_weights = {"Dual": 2, "Triple": 1, "Quad": 1}
+
+# Every valid set of class objectives with its weight, see build_class_combination_table
+class_combination_table = build_class_combination_table()
+
+def modify_lucky_medal_objectives(selected_objectives, verbose=True, rng=random):
     """
     Find and modify lucky medal objectives to include random locations.
+
+    Modified objectives are replaced by renamed copies, so the records of the loaded
+    pool are never changed.
     
     Args:
-        selected_objectives: List of selected objective dictionaries
+        selected_objectives: List of selected Objective records
+        verbose: Log each objective that is modified
+        rng: Random number generator to draw from
     
     Returns:
         List of objectives with lucky medal objectives modified
@@ -376,21 +734,27 @@ def modify_lucky_medal_objectives(selected_objectives):
     pattern = re.compile(r"Collect a lucky medal from .*", re.IGNORECASE)
     
     for i, obj in enumerate(selected_objectives):
-        if pattern.match(obj['name']):
+        if pattern.match(obj.name):
             # Choose two random locations
-            locations = random.sample(lucky_medal_locations, 2)
+            locations = rng.sample(lucky_medal_locations, 2)
             # Update the objective name
-            selected_objectives[i]['name'] = f"Collect the lucky medal from {locations[0]} and {locations[1]}"
-            print(f"Modified lucky medal objective: {selected_objectives[i]['name']}")
+            selected_objectives[i] = obj.replace(name=f"Collect the lucky medal from {locations[0]} and {locations[1]}")
+            if verbose:
+                logger.debug(f"Modified lucky medal objective: {selected_objectives[i].name}")
     
     return selected_objectives
 
-def modify_equipment_objectives(selected_objectives):
+def modify_equipment_objectives(selected_objectives, verbose=True, rng=random):
     """
     Find and modify weapon and armor objectives to include random equipment.
+
+    Modified objectives are replaced by renamed copies, so the records of the loaded
+    pool are never changed.
     
     Args:
-        selected_objectives: List of selected objective dictionaries
+        selected_objectives: List of selected Objective records
+        verbose: Log each objective that is modified
+        rng: Random number generator to draw from
     
     Returns:
         List of objectives with equipment objectives modified
@@ -399,53 +763,258 @@ def modify_equipment_objectives(selected_objectives):
     
     # Process weapons first
     for i, obj in enumerate(selected_objectives):
-        if obj['name'] in weapon_objectives_to_replace:
+        if obj.name in weapon_objectives_to_replace:
             # Choose two random weapons
-            weapons = random.sample(randomizable_weapons, 2)
+            weapons = rng.sample(randomizable_weapons, 2)
             # Update the objective name
-            selected_objectives[i]['name'] = f"Obtain the {weapons[0]} or {weapons[1]}"
-            print(f"Modified weapon objective: {selected_objectives[i]['name']}")
+            selected_objectives[i] = obj.replace(name=f"Obtain the {weapons[0]} or {weapons[1]}")
+            if verbose:
+                logger.debug(f"Modified weapon objective: {selected_objectives[i].name}")
             modified_count += 1
     
     # Then process armors
     for i, obj in enumerate(selected_objectives):
-        if obj['name'] in armor_objectives_to_replace:
+        if obj.name in armor_objectives_to_replace:
             # Choose two random armors
-            armors = random.sample(randomizable_armors, 2)
+            armors = rng.sample(randomizable_armors, 2)
             # Update the objective name
-            selected_objectives[i]['name'] = f"Obtain the {armors[0]} or {armors[1]}"
-            print(f"Modified armor objective: {selected_objectives[i]['name']}")
+            selected_objectives[i] = obj.replace(name=f"Obtain the {armors[0]} or {armors[1]}")
+            if verbose:
+                logger.debug(f"Modified armor objective: {selected_objectives[i].name}")
             modified_count += 1
     
-    if modified_count > 0:
-        print(f"Total equipment objectives modified: {modified_count}")
+    if modified_count > 0 and verbose:
+        logger.info(f"Total equipment objectives modified: {modified_count}")
     
     return selected_objectives
 
+class GenerationStats:
+    """
+    Counters and phase timings collected while boards are generated.
+
+    Pass one to select_random_objectives, BoardGenerator.generate or generate_boards
+    and it adds up over every board generated with it. Time is charged to a phase
+    with lap(), which counts from the previous lap, or with the phase() context manager.
+    """
+
+    PHASES = ("load", "bucket_c", "selection", "reroll", "post_process")
+    REJECTION_REASONS = ("conflict", "duplicate", "classification_cap", "tag_limit", "boss", "blocked")
+
+    def __init__(self):
+        self.boards = 0
+        self.candidates = 0
+        self.reroll_rounds = 0
+        self.phase_seconds = dict.fromkeys(self.PHASES, 0.0)
+        self.rejections = dict.fromkeys(self.REJECTION_REASONS, 0)
+        self.solver = {"nodes": 0, "backtracks": 0, "restarts": 0}
+        self._lap_start = time.perf_counter()
+
+    def start(self):
+        """Start timing a new board."""
+        self._lap_start = time.perf_counter()
+
+    def lap(self, phase):
+        """Charge the time since the previous lap to phase."""
+        now = time.perf_counter()
+        self.phase_seconds[phase] += now - self._lap_start
+        self._lap_start = now
+
+    @contextlib.contextmanager
+    def phase(self, phase):
+        """Charge the time spent in the with block to phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phase_seconds[phase] += time.perf_counter() - start
+
+    def examine(self, reason):
+        """Count one candidate, with the reason it was rejected or None if it was taken."""
+        self.candidates += 1
+        if reason is not None:
+            self.rejections[reason] += 1
+
+    def merge(self, other):
+        """Add the counts of another GenerationStats to this one."""
+        self.boards += other.boards
+        self.candidates += other.candidates
+        self.reroll_rounds += other.reroll_rounds
+        for counts, other_counts in ((self.phase_seconds, other.phase_seconds),
+                                     (self.rejections, other.rejections),
+                                     (self.solver, other.solver)):
+            for key, value in other_counts.items():
+                counts[key] = counts.get(key, 0) + value
+
+    def as_dict(self):
+        """The counters as a JSON-serializable dictionary."""
+        return {
+            "boards": self.boards,
+            "phase_seconds": dict(self.phase_seconds),
+            "candidates": self.candidates,
+            "rejections": dict(self.rejections),
+            "reroll_rounds": self.reroll_rounds,
+            "solver": dict(self.solver)
+        }
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.as_dict(), f, indent=2)
+            f.write("\n")
+
+    def summary(self):
+        """Short human-readable lines describing the counters."""
+        phases = ", ".join(f"{phase} {seconds * 1000:.1f} ms" for phase, seconds in self.phase_seconds.items())
+        rejections = ", ".join(f"{reason} {count}" for reason, count in self.rejections.items())
+        lines = [
+            f"Time per phase: {phases}",
+            f"Examined {self.candidates} candidates; rejected: {rejections}",
+            f"Reroll rounds: {self.reroll_rounds}"
+        ]
+        if self.solver["nodes"]:
+            lines.append(f"Solver explored {self.solver['nodes']} nodes with {self.solver['backtracks']} "
+                         f"backtracks and {self.solver['restarts']} restarts")
+        return lines
+
+def prompt_reroll(violations, rounds):
+    """Ask on the console whether to reroll objectives that break the tag limits."""
+    return input("Do you want to reroll the objectives that violate these limits? (y/n): ").lower() == 'y'
+
+def never_reroll(violations, rounds):
+    """Keep the board as it is, tag limit violations included."""
+    return False
+
+def make_reroll_policy(policy="always", max_rounds=DEFAULT_MAX_REROLL_ROUNDS):
+    """
+    Build a reroll policy for unattended generation.
+
+    A reroll policy is called with the current violations and the number of reroll
+    rounds already done, and returns True to reroll again.
+
+    Args:
+        policy: "always" to keep rerolling until the limits hold, "never" to accept the board,
+            or "prompt" to ask on the console
+        max_rounds: Upper bound on reroll rounds for "always", since a bucket can run out
+            of objectives that fit
+
+    Returns:
+        function: The reroll policy
+    """
+    if policy == "never":
+        return never_reroll
+    if policy == "prompt":
+        return prompt_reroll
+    if policy != "always":
+        raise ValueError(f"Unknown reroll policy: {policy}")
+
+    def always_reroll(violations, rounds):
+        return rounds < max_rounds
+    return always_reroll
+
 def select_random_objectives(bingo_list, race_mode=False, remove_easy=False, harder_board=False, 
                            tag_limits=None, bucket_mode=False, bucket_hard_mode=False, 
-                           exclude_boss_objectives=False, randomize_djinn=False):
+                           exclude_boss_objectives=False, randomize_djinn=False, index=None,
+                           reroll_policy=None, verbose=True, solver="greedy", stats=None,
+                           rng=random, bucket_limits=None, blocked=0):
+    """
+    Select the objectives of one board.
+
+    rng is a BoardRandom, or a single generator that every step draws from. blocked
+    is a mask of dense index ids that may not be drawn at all, for instance
+    the objectives a tournament set has already used as often as it allows.
+    """
+    if stats is not None:
+        stats.start()
+    if bucket_limits is None:
+        bucket_limits = BUCKET_LIMITS_HARD if bucket_hard_mode else BUCKET_LIMITS_NORMAL
+    if index is None:
+        index = ObjectiveIndex(bingo_list)
+    if not isinstance(tag_limits, TagBudget):
+        tag_limits = TagBudget(tag_limits)
+    tag_budget = tag_limits.new_board()
+    if reroll_policy is None:
+        reroll_policy = prompt_reroll
+    reroll_rounds = 0
+    streams = rng if isinstance(rng, BoardRandom) else BoardRandom.single(rng)
+    rng = streams.selection
+
+    # Per-pick messages are only formatted when they will be shown
+    log_picks = verbose and logger.isEnabledFor(logging.DEBUG)
+
+    def log(message, level=logging.INFO):
+        if verbose:
+            logger.log(level, message)
     all_classifications = list(bingo_list.keys())
     selected_objectives = []
+    # Classification and index id (None for generated objectives) of each entry in
+    # selected_objectives, kept in step with it
+    selected_classifications = []
+    selected_ids = []
+    # Union of the conflict masks of the selected objectives, and the blocked ids
+    forbidden = blocked
     classification_count = defaultdict(int)
     max_per_classification = 2 if race_mode else float('inf')
+
+    def add_selected(objective, classification, objective_id=None):
+        nonlocal forbidden
+        selected_objectives.append(objective)
+        selected_classifications.append(classification)
+        selected_ids.append(objective_id)
+        classification_count[classification] += 1
+        if objective_id is not None:
+            forbidden |= index.conflicts[objective_id]
+            tag_budget.add(index.tags[objective_id])
+        else:
+            tag_budget.add(objective.types)
+
+    def remove_selected(i):
+        nonlocal forbidden
+        obj = selected_objectives.pop(i)
+        classification = selected_classifications.pop(i)
+        objective_id = selected_ids.pop(i)
+        classification_count[classification] -= 1
+        tag_budget.remove(index.tags[objective_id] if objective_id is not None else obj.types)
+        # Masks can't be subtracted, so rebuild from what is left on the board
+        forbidden = blocked
+        for objective_id in selected_ids:
+            if objective_id is not None:
+                forbidden |= index.conflicts[objective_id]
+        return obj, classification
+
+    def accepts(objective_id, classification, check_tags=False):
+        """Check whether a candidate can go on the board now, counting it in stats."""
+        valid = is_valid_objective(index.bits[objective_id], forbidden, classification_count, max_per_classification, classification)
+        if valid and check_tags:
+            valid = tag_budget.can_add(index.tags[objective_id])
+        if stats is not None:
+            reason = None
+            if blocked & index.bits[objective_id]:
+                reason = "blocked"
+            elif forbidden & index.bits[objective_id]:
+                name = index.objectives[objective_id].name
+                duplicate = any(obj.name == name for obj in selected_objectives)
+                reason = "duplicate" if duplicate else "conflict"
+            elif not valid:
+                reason = "tag_limit" if classification_count[classification] < max_per_classification else "classification_cap"
+            stats.examine(reason)
+        return valid
+
+    # Candidate ids per classification and bucket. With randomized djinn the Bucket C
+    # classifications are generated below instead, so nothing more may be drawn from them.
+    classification_ids, bucket_ids = index.candidate_pools(exclude_boss_objectives, randomize_djinn)
+    if stats is not None and exclude_boss_objectives:
+        # The boss filter is applied to the cached pools, so count what it left out of them
+        all_ids, _ = index.candidate_pools(False, randomize_djinn)
+        stats.rejections["boss"] += sum(len(ids) for ids in all_ids.values()) - sum(len(ids) for ids in classification_ids.values())
     
 # Handle Bucket C replacements if randomize_djinn is enabled
     if randomize_djinn:
-        # Store original Bucket C objectives
-        bucket_c_classifications = [11, 12, 21, 23]
-        original_bucket_c = {}
-        for c in bucket_c_classifications:
-            if c in bingo_list:
-                original_bucket_c[c] = bingo_list[c].copy()
-                bingo_list[c] = []  # Clear original objectives
-        
         # Determine number of Bucket C objectives needed
-        bucket_c_count = 5 if bucket_mode and bucket_hard_mode else 4
+        bucket_c_count = bucket_limits.get("C", 0) if bucket_mode else 4
         
         # Generate new Bucket C objectives
-        num_21 = random.randint(0, 1)  # 0 or 1 objective from 21
-        num_23 = random.randint(0, 1)  # 0 or 1 objective from 23
+        bucket_c_rng = streams.bucket_c
+        num_21 = bucket_c_rng.randint(0, 1)  # 0 or 1 objective from 21
+        num_23 = bucket_c_rng.randint(0, 1)  # 0 or 1 objective from 23
         remaining_slots = bucket_c_count - num_21 - num_23
         
         # Ensure we have at least one of each type
@@ -456,158 +1025,165 @@ def select_random_objectives(bingo_list, race_mode=False, remove_easy=False, har
         extra_slots = remaining_slots - min_11 - min_12
         
         # For each extra slot, give 2/3 chance for 11 and 1/3 chance for 12
-        extra_11 = sum(1 for _ in range(extra_slots) if random.random() < 2/3)
+        extra_11 = sum(1 for _ in range(extra_slots) if bucket_c_rng.random() < 2/3)
         
         # Calculate final numbers
         num_11 = min(4, min_11 + extra_11)  # Cap at 4 objectives from 11
         num_12 = remaining_slots - num_11
+        # Each class objective type can appear once, so any further slots go to 11
+        if num_12 > len(class_type_weights):
+            num_11 += num_12 - len(class_type_weights)
+            num_12 = len(class_type_weights)
         
-        # Track used elements
-        used_primary_elements = set()
-        
-        # Generate bucket C objectives
-        bucket_c_objectives = []
-        
-        # Clear excluded summons at the start of generation
-        excluded_summons.clear()
+        # Summons ruled out by the selected objectives, for this board only
+        excluded_summons = set()
         
         # Add objectives from 21 and 23 if selected
-        if num_21 and 21 in original_bucket_c:
-            objectives_21 = [obj for obj in original_bucket_c[21] 
-                           if not (exclude_boss_objectives and "Boss" in obj.get('types', []))]
+        undrawn_ids, _ = index.candidate_pools(exclude_boss_objectives)
+        if num_21 and 21 in undrawn_ids:
+            objectives_21 = undrawn_ids[21]
+            if blocked:
+                objectives_21 = [i for i in objectives_21 if not blocked & index.bits[i]]
             if objectives_21:
-                selected_obj = random.choice(objectives_21)
-                bucket_c_objectives.append(selected_obj)
-                bingo_list[21] = [selected_obj]  # Add to bingo_list for classification tracking
+                selected_id = bucket_c_rng.choice(objectives_21)
+                add_selected(index.objectives[selected_id], 21, selected_id)
         
-        if num_23 and 23 in original_bucket_c:
-            objectives_23 = [obj for obj in original_bucket_c[23]
-                           if not (exclude_boss_objectives and "Boss" in obj.get('types', []))]
+        if num_23 and 23 in undrawn_ids:
+            objectives_23 = undrawn_ids[23]
+            if blocked:
+                objectives_23 = [i for i in objectives_23 if not blocked & index.bits[i]]
             if objectives_23:
-                selected_obj = random.choice(objectives_23)
+                selected_id = bucket_c_rng.choice(objectives_23)
+                selected_obj = index.objectives[selected_id]
                 # Update excluded summons based on the selected objective
-                update_excluded_summons(selected_obj['name'])
-                bucket_c_objectives.append(selected_obj)
-                bingo_list[23] = [selected_obj]  # Add to bingo_list for classification tracking
-
-        # Track all used djinn
-        used_djinn = set()
-
-        # Generate djinn objectives (category 11)
-        for _ in range(num_11):
-            attempts = 0
-            while attempts < 100:  # Prevent infinite loop
-                objective_text, primary_element = generate_djinn_objective(used_djinn)
-                if objective_text is None:
-                    attempts += 1
-                    continue
-
-                if primary_element not in used_primary_elements:
-                    used_primary_elements.add(primary_element)
-
-                    # Extract djinn names from the objective text
-                    djinn_names = [name.strip() for name in objective_text.replace("Befriend ", "").replace(" or ", ",").split(",")]
-                    used_djinn.update(djinn_names)
-
-                    new_obj = {
-                        "name": objective_text,
-                        "types": [],  # Empty types to avoid tag limit issues
-                        "id": random.randint(10000, 99999),
-                        "SuppTags": [],
-                        "Restrictions": []
-                    }
-                    bucket_c_objectives.append(new_obj)
-                    if 11 not in bingo_list:
-                        bingo_list[11] = []
-                    bingo_list[11].append(new_obj)  # Add to bingo_list for classification tracking
-                    break
-                attempts += 1
+                update_excluded_summons(selected_obj.name, excluded_summons)
+                add_selected(selected_obj, 23, selected_id)
 
-            if attempts >= 100:
-                print(f"Warning: Unable to generate more valid djinn objectives. Only generated {len(bingo_list[11])} objectives.")
+        # Generate djinn objectives (category 11), each with its own primary element
+        # and no djinn used twice
+        djinn_sampler = DjinnSampler(bucket_c_rng)
+        for num_djinn_objectives in range(num_11):
+            djinn_objective = djinn_sampler.draw()
+            if djinn_objective is None:
+                log(f"Warning: Unable to generate more valid djinn objectives. Only generated {num_djinn_objectives} objectives.", logging.WARNING)
                 break
+            # No id and no tags: generated objectives are never mistaken for sheet
+            # objectives and never count towards the tag limits
+            new_obj = Objective(djinn_objective["name"])
+            add_selected(new_obj, 11)
         
         # Add objectives from category 12
         if num_12 > 0:
-            class_objectives = generate_class_objectives(num_12)
+            class_objectives = generate_class_objectives(num_12, bucket_c_rng)
             for obj in class_objectives:
-                new_obj = {
-                    "name": obj["name"],
-                    "types": [],  # Empty types to avoid tag limit issues
-                    "id": random.randint(10000, 99999),
-                    "SuppTags": [],
-                    "Restrictions": []
-                }
-                bucket_c_objectives.append(new_obj)
-                if 12 not in bingo_list:
-                    bingo_list[12] = []
-                bingo_list[12].append(new_obj)
-        
-        # Add all bucket C objectives to selected_objectives directly
-        for obj in bucket_c_objectives:
-            classification = next(c for c in bucket_c_classifications if obj in bingo_list[c])
-            selected_objectives.append(obj)
-            classification_count[classification] += 1
+                new_obj = Objective(obj["name"])
+                add_selected(new_obj, 12)
 
-    if bucket_mode:
-        bucket_objectives = {
-            "A": [], "B": [], "C": [], "D": [], "E": [], "F": []
-        }
-        
-        # Define bucket_limits before using it
-        if bucket_hard_mode:
-            bucket_limits = {
-                "A": 1, "B": 4, "C": 5, "D": 7, "E": 5, "F": 3
-            }
+        if stats is not None:
+            stats.lap("bucket_c")
+
+    if solver == "backtrack":
+        # Describe the rest of the board as slots, in the order the greedy selection
+        # below would fill them, and let the solver fill them together; see bingo_solver
+        def candidates(classification):
+            objective_ids = classification_ids.get(classification, ())
+            if blocked:
+                # A classification with nothing left to draw gets no slot, as in the greedy selection
+                objective_ids = tuple(i for i in objective_ids if not blocked & index.bits[i])
+            return objective_ids
+
+        slots = []
+        if bucket_mode:
+            # Generated Bucket C objectives already count towards their quota
+            prefilled = defaultdict(int)
+            for classification in selected_classifications:
+                prefilled[classify_into_buckets(classification)] += 1
+            for bucket, limit in bucket_limits.items():
+                slots.extend([[bucket_ids[bucket]]] * max(0, limit - prefilled[bucket]))
+            rng.shuffle(slots)
         else:
-            bucket_limits = {
-                "A": 4, "B": 5, "C": 4, "D": 7, "E": 4, "F": 1
-            }
+            if race_mode:
+                high_classifications = [c for c in all_classifications if c > 21]
+                rng.shuffle(high_classifications)
+                if high_classifications and candidates(high_classifications[0]):
+                    slots.append([candidates(high_classifications[0])])
+                class_order = [c for c in all_classifications if 3 <= c <= 21]
+                rng.shuffle(class_order)
+                one_each_limit = 24
+                if harder_board:
+                    fill_order = [c for c in all_classifications if 16 <= c <= 21]
+                else:
+                    fill_order = class_order
+            else:
+                class_order = list(all_classifications)
+                rng.shuffle(class_order)
+                one_each_limit = 25
+                fill_order = class_order
+            for classification in class_order:
+                if len(selected_objectives) + len(slots) >= one_each_limit:
+                    break
+                if candidates(classification):
+                    slots.append([candidates(classification)])
+            fill_groups = [candidates(c) for c in fill_order]
+            slots.extend([fill_groups] * max(0, 25 - len(selected_objectives) - len(slots)))
+
+        solution, solver_stats = index.solver(tag_budget, max_per_classification).solve(
+            slots, tag_budget, forbidden, classification_count, rng)
+        for objective_id in solution:
+            objective = index.objectives[objective_id]
+            classification = index.classifications[objective_id]
+            add_selected(objective, classification, objective_id)
+            if log_picks:
+                if bucket_mode:
+                    logger.debug(f"Selected: {objective.name} from Bucket {index.buckets[objective_id]}")
+                else:
+                    logger.debug(f"Selected: {objective.name} from Classification {classification}")
+        log(f"Solver explored {solver_stats['nodes']} nodes with {solver_stats['backtracks']} backtracks and {solver_stats['restarts']} restarts")
+        if stats is not None:
+            for key, value in solver_stats.items():
+                stats.solver[key] += value
+            stats.lap("selection")
 
+    elif bucket_mode:
         def select_from_bucket(bucket):
-            objectives = bucket_objectives[bucket]
-            random.shuffle(objectives)
-            for objective in objectives:
-                if exclude_boss_objectives and "Boss" in objective.get('types', []):
-                    continue
-                classification = next(c for c in all_classifications if objective in bingo_list[c])
-                if is_valid_objective(objective, selected_objectives, classification_count, max_per_classification, classification):
-                    selected_objectives.append(objective)
-                    classification_count[classification] += 1
-                    print(f"Selected: {objective['name']} from Bucket {bucket}")
+            for objective_id in lazy_shuffle(bucket_ids[bucket], rng):
+                classification = index.classifications[objective_id]
+                if accepts(objective_id, classification):
+                    objective = index.objectives[objective_id]
+                    add_selected(objective, classification, objective_id)
+                    if log_picks:
+                        logger.debug(f"Selected: {objective.name} from Bucket {bucket}")
                     return True
             return False
 
-        # First, populate bucket_objectives
-        for classification, objectives in bingo_list.items():
-            bucket = classify_into_buckets(classification)
-            if bucket != "Unknown":
-                bucket_objectives[bucket].extend(objectives)
-
         # Initial selection phase
         bucket_selections = []
         for bucket, limit in bucket_limits.items():
             bucket_selections.extend([bucket] * limit)
-        random.shuffle(bucket_selections)
+        rng.shuffle(bucket_selections)
 
         # Select objectives in random order
         for bucket in bucket_selections:
             if not select_from_bucket(bucket):
-                print(f"Warning: Unable to find valid objective from Bucket {bucket}")
+                log(f"Warning: Unable to find valid objective from Bucket {bucket}", logging.WARNING)
+        if stats is not None:
+            stats.lap("selection")
 
         # Reroll loop
         while True:
-            violations = check_tag_occurrences(selected_objectives, tag_limits)
+            violations = tag_budget.violations()
             if not violations:
                 break
             
-            print("\nTag occurrence limits exceeded:")
+            log("\nTag occurrence limits exceeded:")
             for tag, count in violations.items():
-                print(f"{tag}: {count} occurrences (limit: {tag_limits[tag]})")
+                log(f"{tag}: {count} occurrences (limit: {tag_budget.tag_limits[tag]})")
             
-            reroll = input("Do you want to reroll the objectives that violate these limits? (y/n): ").lower() == 'y'
-            if not reroll:
+            if not reroll_policy(violations, reroll_rounds):
                 break
+            reroll_rounds += 1
+            if stats is not None:
+                stats.reroll_rounds += 1
 
             # Process objectives from most recent to oldest
             for i in range(len(selected_objectives) - 1, -1, -1):
@@ -615,46 +1191,42 @@ def select_random_objectives(bingo_list, race_mode=False, remove_easy=False, har
                 # Check if this objective contributes to any violations
                 contributes_to_violation = False
                 for tag in violations:
-                    if tag in obj.get('types', []):
+                    if tag in obj.types:
                         contributes_to_violation = True
                         break
                 
                 if contributes_to_violation:
-                    # Get the bucket of the violating objective
-                    classification = next(c for c in all_classifications if obj in bingo_list[c])
+                    # Remove the violating objective and get its bucket
+                    obj, classification = remove_selected(i)
                     bucket = classify_into_buckets(classification)
-                    
-                    # Remove the violating objective
-                    selected_objectives.pop(i)
-                    classification_count[classification] -= 1
-                    print(f"Removed violating objective: {obj['name']} from Bucket {bucket}")
+                    if log_picks:
+                        logger.debug(f"Removed violating objective: {obj.name} from Bucket {bucket}")
                     
                     # Select a new objective from the same bucket
                     if not select_from_bucket(bucket):
-                        print(f"Warning: Unable to find valid replacement objective from Bucket {bucket}")
+                        log(f"Warning: Unable to find valid replacement objective from Bucket {bucket}", logging.WARNING)
+        if stats is not None:
+            stats.lap("reroll")
 
     else:
         def select_objective(classifications):
             for classification in classifications:
-                objectives = bingo_list[classification]
-                random.shuffle(objectives)
-                for objective in objectives:
-                    if exclude_boss_objectives and "Boss" in objective.get('types', []):
-                        continue
-                    if is_valid_objective(objective, selected_objectives, classification_count, max_per_classification, classification):
-                        selected_objectives.append(objective)
-                        classification_count[classification] += 1
-                        print(f"Selected: {objective['name']} from Classification {classification}")
+                for objective_id in lazy_shuffle(classification_ids[classification], rng):
+                    if accepts(objective_id, classification):
+                        objective = index.objectives[objective_id]
+                        add_selected(objective, classification, objective_id)
+                        if log_picks:
+                            logger.debug(f"Selected: {objective.name} from Classification {classification}")
                         return True
             return False
 
         if race_mode:
             high_classifications = [c for c in all_classifications if c > 21]
-            random.shuffle(high_classifications)
+            rng.shuffle(high_classifications)
             select_objective(high_classifications[:1])
 
             initial_classifications = [c for c in all_classifications if 3 <= c <= 21]
-            random.shuffle(initial_classifications)
+            rng.shuffle(initial_classifications)
             for classification in initial_classifications:
                 if len(selected_objectives) >= 24:
                     break
@@ -664,102 +1236,100 @@ def select_random_objectives(bingo_list, race_mode=False, remove_easy=False, har
                 harder_classifications = [c for c in all_classifications if 16 <= c <= 21]
                 while len(selected_objectives) < 25:
                     if not select_objective(harder_classifications):
-                        print(f"Warning: Unable to find more valid objectives from harder range. Stopping at {len(selected_objectives)} objectives.")
+                        log(f"Warning: Unable to find more valid objectives from harder range. Stopping at {len(selected_objectives)} objectives.", logging.WARNING)
                         break
             else:
                 while len(selected_objectives) < 25:
                     if not select_objective(initial_classifications):
-                        print(f"Warning: Unable to find more valid objectives. Stopping at {len(selected_objectives)} objectives.")
+                        log(f"Warning: Unable to find more valid objectives. Stopping at {len(selected_objectives)} objectives.", logging.WARNING)
                         break
         else:
-            random.shuffle(all_classifications)
+            rng.shuffle(all_classifications)
             for classification in all_classifications:
                 select_objective([classification])
             
             while len(selected_objectives) < 25:
                 if not select_objective(all_classifications):
-                    print(f"Warning: Unable to find more valid objectives. Stopping at {len(selected_objectives)} objectives.")
+                    log(f"Warning: Unable to find more valid objectives. Stopping at {len(selected_objectives)} objectives.", logging.WARNING)
                     break
 
+        if stats is not None:
+            stats.lap("selection")
+
         # Check tag occurrences and offer rerolls
         while True:
-            violations = check_tag_occurrences(selected_objectives, tag_limits)
+            violations = tag_budget.violations()
             if not violations:
                 break
             
-            print("\nTag occurrence limits exceeded:")
+            log("\nTag occurrence limits exceeded:")
             for tag, count in violations.items():
-                print(f"{tag}: {count} occurrences (limit: {tag_limits[tag]})")
+                log(f"{tag}: {count} occurrences (limit: {tag_budget.tag_limits[tag]})")
             
-            reroll = input("Do you want to reroll the objectives that violate these limits? (y/n): ").lower() == 'y'
-            if not reroll:
+            if not reroll_policy(violations, reroll_rounds):
                 break
+            reroll_rounds += 1
+            if stats is not None:
+                stats.reroll_rounds += 1
             
             # Remove the most recently added objective for each violated tag
             for tag in violations:
                 for i in range(len(selected_objectives) - 1, -1, -1):
-                    if tag in selected_objectives[i].get('types', []):
-                        obj = selected_objectives.pop(i)
-                        classification_count[next(c for c in all_classifications if obj in bingo_list[c])] -= 1
+                    if tag in selected_objectives[i].types:
+                        remove_selected(i)
                         break
 
             # Reroll the removed objectives
-            if bucket_mode:
-                while len(selected_objectives) < 25:
-                    reroll_successful = False
-                    for bucket in bucket_objectives:
-                        if len([obj for obj in selected_objectives if classify_into_buckets(next(c for c in all_classifications if obj in bingo_list[c])) == bucket]) < bucket_limits[bucket]:
-                            if select_from_bucket(bucket):
-                                reroll_successful = True
-                                break
-                    if not reroll_successful:
-                        break
-            else:
-                reroll_classifications = all_classifications
-                if race_mode:
-                    if remove_easy:
-                        reroll_classifications = [c for c in all_classifications if c > 2]
-                    if harder_board:
-                        reroll_classifications = [c for c in reroll_classifications if c > 21 or 16 <= c <= 21]
-                    if len([obj for obj in selected_objectives if next(c for c in all_classifications if obj in bingo_list[c]) > 21]) == 1:
-                        reroll_classifications = [c for c in reroll_classifications if c <= 21]
+            reroll_classifications = all_classifications
+            if race_mode:
+                if remove_easy:
+                    reroll_classifications = [c for c in all_classifications if c > 2]
+                if harder_board:
+                    reroll_classifications = [c for c in reroll_classifications if c > 21 or 16 <= c <= 21]
+                if len([c for c in selected_classifications if c > 21]) == 1:
+                    reroll_classifications = [c for c in reroll_classifications if c <= 21]
 
-                while len(selected_objectives) < 25:
-                    reroll_successful = False
-                    for classification in reroll_classifications:
-                        objectives = bingo_list[classification]
-                        random.shuffle(objectives)
-                        for objective in objectives:
-                            if exclude_boss_objectives and "Boss" in objective.get('types', []):
-                                continue
-                            if is_valid_reroll_objective(objective, selected_objectives, classification_count, max_per_classification, classification, tag_limits):
-                                selected_objectives.append(objective)
-                                classification_count[classification] += 1
-                                print(f"Rerolled: {objective['name']} from Classification {classification}")
-                                reroll_successful = True
-                                break
-                        if reroll_successful:
+            while len(selected_objectives) < 25:
+                reroll_successful = False
+                for classification in reroll_classifications:
+                    for objective_id in lazy_shuffle(classification_ids[classification], rng):
+                        if accepts(objective_id, classification, check_tags=True):
+                            objective = index.objectives[objective_id]
+                            add_selected(objective, classification, objective_id)
+                            if log_picks:
+                                logger.debug(f"Rerolled: {objective.name} from Classification {classification}")
+                            reroll_successful = True
                             break
-                    if not reroll_successful:
+                    if reroll_successful:
                         break
+                if not reroll_successful:
+                    break
+        if stats is not None:
+            stats.lap("reroll")
 
     # Check for and replace category 6 objectives with summon objectives if randomize_djinn is enabled
     if randomize_djinn:
         for i, obj in enumerate(selected_objectives):
             # Only replace if it's a category 6 objective that matches our criteria
-            if any(obj == cat6_obj for cat6_obj in bingo_list.get(6, [])) and should_replace_objective(obj):
+            if selected_classifications[i] == 6 and should_replace_objective(obj):
                 # Replace with a simple summon objective
-                selected_objectives[i] = {"name": generate_summon_objective()}
+                selected_objectives[i] = Objective(generate_summon_objective(excluded_summons, streams.summons))
                 
     # Modify any lucky medal objectives to include random locations
-    selected_objectives = modify_lucky_medal_objectives(selected_objectives)
+    selected_objectives = modify_lucky_medal_objectives(selected_objectives, verbose, streams.rewrites)
     
     # Modify any equipment objectives to include random items
-    selected_objectives = modify_equipment_objectives(selected_objectives)
+    selected_objectives = modify_equipment_objectives(selected_objectives, verbose, streams.rewrites)
+    if stats is not None:
+        stats.lap("post_process")
+        stats.boards += 1
                             
     return selected_objectives
 
 def main():
+    # Show every selection on the console, as the prompts expect
+    logging.basicConfig(level=logging.DEBUG, format="%(message)s", stream=sys.stdout)
+
     # Check for CSV file in the current directory
     default_csv = find_csv_file()
     if default_csv:
@@ -772,7 +1342,9 @@ def main():
         csv_file_path = input("Enter the path to your CSV file: ")
 
     js_output_path = 'bingo_list.js'
-    bingo_list = csv_to_bingo_json(csv_file_path, js_output_path)
+    # Parsed sheet from the snapshot cache; bingo_list.js is only rewritten when the CSV changed
+    import bingo_cache
+    bingo_list, index = bingo_cache.load_pool(csv_file_path, js_output_path)
     
     if bingo_list is None:
         print("Failed to generate bingo list. Exiting.")
@@ -802,18 +1374,13 @@ def main():
     exclude_boss_objectives = input("Are you playing a mode that provides bonuses for beating bosses? (y/n): ").lower() == 'y'
     
     # Define tag limits
-    tag_limits = {
-        "Whirlwind": "5", "Lash": "2", "Pound": "3", "Scoop": "2", "Reveal": "2",
-        "Douse": "2", "Frost": "2", "Growth": "1", "Cyclone": "2", "Sand": "2",
-        "Parch": "2", "Burst": "2", "Grind": "-", "Hover": "-",
-        "Lift": "2", "Carry": "1", "Force": "1", "Blaze": "2", "Teleport": "2",
-        "Mind Read": "1", "RarePsy": "2"
-    }
+    tag_limits = dict(DEFAULT_TAG_LIMITS)
     
+    tag_budget = TagBudget(tag_limits)
     selected_objectives = select_random_objectives(
         bingo_list, race_mode, remove_easy, harder_board, 
-        tag_limits, bucket_mode, bucket_hard_mode, 
-        exclude_boss_objectives, randomize_djinn
+        tag_budget, bucket_mode, bucket_hard_mode, 
+        exclude_boss_objectives, randomize_djinn, index
     )
    
     # Ask user if they want to use the default output file name
@@ -825,49 +1392,417 @@ def main():
         output_file = input("Enter the desired output file name: ")
 
     with open(output_file, 'w') as file:
-        json.dump([{"name": obj['name']} for obj in selected_objectives], file, indent=2)
+        json.dump([{"name": obj.name} for obj in selected_objectives], file, indent=2)
     
     print(f"\nSelected objectives have been written to {output_file}")
     print(f"Total objectives selected: {len(selected_objectives)}")
 
-    classification_count = defaultdict(int)
-    for classification, objectives in bingo_list.items():
-        for obj in objectives:
-            if obj in selected_objectives:
-                classification_count[classification] += 1
-
-    for i, obj1 in enumerate(selected_objectives):
-        for j, obj2 in enumerate(selected_objectives[i+1:], start=i+1):
-            if str(obj1.get('id', '')) in obj2.get('Restrictions', []) or str(obj2.get('id', '')) in obj1.get('Restrictions', []):
-                print(f"Warning: Mutual exclusivity violated between {obj1['name']} and {obj2['name']}")
-    
-    for classification, count in classification_count.items():
-        if count > 2:
-            print(f"Warning: Classification {classification} has {count} objectives (more than 2)")
+    # The exclusion and classification checks of the validate subcommand
+    import bingo_validator
+    validator = bingo_validator.BoardValidator(index, {"race_mode": True})
+    for kind, detail in validator.validate(selected_objectives):
+        if kind == "exclusion":
+            print(f"Warning: Mutual exclusivity violated between {detail.replace(' / ', ' and ')}")
+        elif kind == "classification_cap":
+            print(f"Warning: More than 2 objectives in {detail}")
             
     # Print any lucky medal objectives that were modified
-    lucky_medal_objectives = [obj for obj in selected_objectives if "lucky medal from" in obj['name'].lower()]
+    lucky_medal_objectives = [obj for obj in selected_objectives if "lucky medal from" in obj.name.lower()]
     if lucky_medal_objectives:
         print("\nLucky Medal objectives:")
         for obj in lucky_medal_objectives:
-            print(f"- {obj['name']}")
+            print(f"- {obj.name}")
             
     # Print any equipment objectives that were modified
-    weapon_objectives = [obj for obj in selected_objectives if obj['name'].startswith("Obtain the") 
-                        and any(weapon in obj['name'] for weapon in randomizable_weapons)]
+    weapon_objectives = [obj for obj in selected_objectives if obj.name.startswith("Obtain the") 
+                        and any(weapon in obj.name for weapon in randomizable_weapons)]
 
-    armor_objectives = [obj for obj in selected_objectives if obj['name'].startswith("Obtain the") 
-                       and any(armor in obj['name'] for armor in randomizable_armors)]
+    armor_objectives = [obj for obj in selected_objectives if obj.name.startswith("Obtain the") 
+                       and any(armor in obj.name for armor in randomizable_armors)]
 
     if weapon_objectives:
         print("\nWeapon objectives:")
         for obj in weapon_objectives:
-            print(f"- {obj['name']}")
+            print(f"- {obj.name}")
 
     if armor_objectives:
         print("\nArmor objectives:")
         for obj in armor_objectives:
-            print(f"- {obj['name']}")
+            print(f"- {obj.name}")
+
+class BoardGenerator:
+    """
+    Generates boards from one loaded objective sheet.
+
+    The bingo list, its ObjectiveIndex and the parsed tag limits are only ever read.
+    Everything that changes while a board is built lives inside the
+    select_random_objectives call, and all randomness comes from the BoardRandom streams
+    of the board being built, derived from the generator's seed and the board's number.
+    Board n of a seed is the same whether it is generated alone, after other boards or
+    in another process. One parsed sheet can therefore serve a thread pool or a
+    long-running service; fork() hands each thread its own seed over the same pool.
+    """
+
+    def __init__(self, bingo_list=None, config=None, seed=None, index=None, csv_file_path=DEFAULT_CSV):
+        """
+        Args:
+            bingo_list: Bingo list from csv_to_bingo_json; csv_file_path is loaded if omitted
+            config: Dictionary of options overriding DEFAULT_CONFIG
+            seed: Seed the boards' random streams are derived from, or None for fresh
+                entropy; the seed drawn is kept in the seed attribute
+            index: ObjectiveIndex of bingo_list, compiled if omitted
+            csv_file_path: Objective sheet to load, through the snapshot cache, when
+                bingo_list is omitted
+        """
+        self.config = dict(DEFAULT_CONFIG)
+        self.config.update(config or {})
+        if bingo_list is None:
+            import bingo_cache
+            bingo_list, index = bingo_cache.load_pool(csv_file_path)
+            if bingo_list is None:
+                raise ValueError(f"Failed to load {csv_file_path}")
+        self.bingo_list = bingo_list
+        self.index = index if index is not None else ObjectiveIndex(bingo_list)
+        self.tag_budget = TagBudget(self.config["tag_limits"])
+        self.reroll_policy = make_reroll_policy(self.config["reroll"], self.config["max_reroll_rounds"])
+        self.seed = seed if seed is not None else random.SystemRandom().getrandbits(64)
+        # Number of the board the next generate() call builds
+        self.next_board = 0
+
+    def fork(self, seed=None):
+        """Return a generator that shares this one's pool but has its own seed."""
+        generator = copy.copy(self)
+        generator.seed = seed if seed is not None else random.SystemRandom().getrandbits(64)
+        generator.next_board = 0
+        return generator
+
+    def generate(self, stats=None, verbose=False, blocked=0, board=None):
+        """
+        Generate one board.
+
+        Args:
+            stats: Optional GenerationStats to add this board's counters to
+            verbose: Log the selections through the bingo_generator logger
+            blocked: Mask of dense index ids that may not be drawn
+            board: Number of the board to build, the one after the previous call if None
+
+        Returns:
+            list: The selected objectives
+        """
+        if board is None:
+            board = self.next_board
+        self.next_board = board + 1
+        options = self.config
+        return select_random_objectives(
+            self.bingo_list, options["race_mode"], options["remove_easy"], options["harder_board"],
+            self.tag_budget, options["bucket_mode"], options["bucket_hard_mode"],
+            options["exclude_boss_objectives"], options["randomize_djinn"], self.index,
+            reroll_policy=self.reroll_policy, verbose=verbose, solver=options["solver"],
+            stats=stats, rng=BoardRandom(self.seed, board), bucket_limits=options["bucket_limits"], blocked=blocked
+        )
+
+def generate_boards(n, config=None, seed=None, bingo_list=None, index=None, stats=None, verbose=False, start=0,
+                    on_solver_error=None):
+    """
+    Generate boards without prompting, yielding each one as soon as it is finished.
+
+    Args:
+        n: Number of boards to generate
+        config: Dictionary of options overriding DEFAULT_CONFIG
+        seed: Seed for the boards' random streams, or None for fresh entropy
+        bingo_list: Bingo list from csv_to_bingo_json; DEFAULT_CSV is loaded if omitted
+        index: ObjectiveIndex of bingo_list, compiled if omitted
+        stats: Optional GenerationStats to add the counters of every board to; the
+            batch engine only counts boards
+        verbose: Log the selections through the bingo_generator logger
+        start: Number of the first board; boards start..start+n-1 of the seed are the
+            same as in any other run that covers them
+        on_solver_error: Optional callable(board, error) called when the backtracking
+            solver can't fill a board; that board is then drawn with the greedy
+            selection from the same seed. Without it the error is raised.
+
+    Yields:
+        list: The selected objectives of one board
+    """
+    generator = BoardGenerator(bingo_list, config, seed, index)
+    options = generator.config
+
+    if options["engine"] == "batch":
+        # Vectorized bucket-mode sampler, see bingo_batch
+        import bingo_batch
+        if not options["bucket_mode"] or options["randomize_djinn"]:
+            raise ValueError("The batch engine only supports bucket mode without randomized djinn objectives")
+        if options["solver"] != "greedy":
+            raise ValueError("The batch engine has its own repair step and doesn't use the solver option")
+        if start:
+            raise ValueError("The batch engine draws whole batches and can't start at a given board")
+        sampler = bingo_batch.BatchSampler(generator.index, generator.tag_budget, options["bucket_hard_mode"],
+                                           options["exclude_boss_objectives"], options["bucket_limits"])
+        for board in sampler.iter_boards(n, seed):
+            if stats is not None:
+                stats.boards += 1
+            yield board
+        return
+
+    greedy = None
+    for board in range(start, start + n):
+        try:
+            objectives = generator.generate(stats, verbose, board=board)
+        except (ValueError, RuntimeError) as e:
+            if on_solver_error is None or options["solver"] != "backtrack":
+                raise
+            on_solver_error(board, e)
+            if greedy is None:
+                greedy = BoardGenerator(generator.bingo_list, dict(options, solver="greedy"), generator.seed,
+                                        generator.index)
+            objectives = greedy.generate(stats, verbose, board=board)
+        yield objectives
+
+def parse_tag_limit(value):
+    """Parse a TAG=LIMIT command line value."""
+    tag, sep, limit = value.partition('=')
+    limit = limit.strip()
+    if not sep or not tag.strip() or not (limit == '-' or limit.isdigit()):
+        raise argparse.ArgumentTypeError(f"expected TAG=LIMIT with a number or '-', got {value!r}")
+    return tag.strip(), limit
+
+def parse_bucket_limit(value):
+    """Parse a BUCKET=LIMIT command line value."""
+    bucket, sep, limit = value.partition('=')
+    bucket = bucket.strip().upper()
+    limit = limit.strip()
+    if not sep or bucket not in BUCKET_LIMITS_NORMAL or not limit.isdigit():
+        raise argparse.ArgumentTypeError(f"expected BUCKET=LIMIT with a bucket A-F and a number, got {value!r}")
+    return bucket, int(limit)
+
+def merge_bucket_limits(overrides, hard_mode=False):
+    """
+    Apply bucket limit overrides to the limits of a bucket mode.
+
+    Args:
+        overrides: {bucket: limit} or (bucket, limit) pairs, as parse_bucket_limit returns them
+        hard_mode: Override BUCKET_LIMITS_HARD instead of BUCKET_LIMITS_NORMAL
+
+    Returns:
+        dict: The limits of every bucket
+
+    Raises:
+        argparse.ArgumentTypeError: If the limits don't add up to the 25 squares of a board
+    """
+    bucket_limits = dict(BUCKET_LIMITS_HARD if hard_mode else BUCKET_LIMITS_NORMAL)
+    bucket_limits.update(overrides)
+    total = sum(bucket_limits.values())
+    if total != 25:
+        limits = ", ".join(f"{bucket}={limit}" for bucket, limit in bucket_limits.items())
+        raise argparse.ArgumentTypeError(f"bucket limits must add up to 25, got {total} ({limits})")
+    return bucket_limits
+
+def add_mode_arguments(parser, board_modes=True, drawing=True):
+    """
+    Add the generation mode options shared by the subcommands.
+
+    Args:
+        parser: Parser to add the options to
+        board_modes: Include the bucket/race mode flags, for subcommands that don't pick
+            the modes themselves
+        drawing: Include the options that only change how boards are drawn (easy and
+            harder objectives, djinn randomizing, the boss filter, rerolls, the solver),
+            for subcommands that generate boards rather than check them
+    """
+    parser.add_argument("--csv", default=DEFAULT_CSV, help=f"objective sheet (default: {DEFAULT_CSV})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse the objective sheet instead of loading the cached snapshot")
+    if board_modes:
+        parser.add_argument("--bucket", action="store_true", help="use bucket classification mode")
+        parser.add_argument("--hard", action="store_true", help="use hard mode for bucket classification")
+        parser.add_argument("--race", action="store_true", help="enable race mode")
+    if board_modes and drawing:
+        parser.add_argument("--remove-easy", action="store_true", help="remove easy objectives (categories 1 and 2)")
+        parser.add_argument("--harder-board", action="store_true", help="use categories 16-21 for remaining race objectives")
+    if drawing:
+        parser.add_argument("--randomize-djinn", action="store_true", help="enable randomized Djinn/Summon/Class objectives")
+        parser.add_argument("--exclude-boss", action="store_true", help="leave out objectives tagged Boss")
+    parser.add_argument("--tag-limit", type=parse_tag_limit, action="append", default=[], metavar="TAG=LIMIT",
+                        help="override one tag limit, '-' for no limit (repeatable)")
+    parser.add_argument("--bucket-limit", type=parse_bucket_limit, action="append", default=[], metavar="BUCKET=LIMIT",
+                        help="override the objectives drawn from one bucket in bucket mode (repeatable); "
+                             "the limits must still add up to 25")
+    if drawing:
+        parser.add_argument("--reroll", choices=["always", "never"], default="always",
+                            help="what to do when a board breaks the tag limits (default: always)")
+        parser.add_argument("--max-reroll-rounds", type=int, default=DEFAULT_MAX_REROLL_ROUNDS,
+                            help=f"reroll rounds per board before giving up (default: {DEFAULT_MAX_REROLL_ROUNDS})")
+        parser.add_argument("--solver", choices=["greedy", "backtrack"], default="greedy",
+                            help="'backtrack' searches for a board that meets every constraint instead of rerolling")
+
+def config_from_args(args, hard_limits=None, merge_buckets=True):
+    """
+    Build a generation config dictionary from parsed mode arguments.
+
+    Options add_mode_arguments left out keep their DEFAULT_CONFIG values.
+
+    Args:
+        args: Parsed arguments from add_mode_arguments
+        hard_limits: Apply --bucket-limit to the hard mode limits rather than the normal
+            ones; follows --hard if None
+        merge_buckets: Merge --bucket-limit at all; False leaves bucket_limits None for
+            callers that apply the overrides to several modes themselves
+
+    Raises:
+        argparse.ArgumentTypeError: If the bucket limits don't add up to 25
+    """
+    tag_limits = dict(DEFAULT_TAG_LIMITS)
+    tag_limits.update(args.tag_limit)
+    if hard_limits is None:
+        hard_limits = getattr(args, "hard", False)
+    bucket_limits = None
+    if args.bucket_limit and merge_buckets:
+        bucket_limits = merge_bucket_limits(args.bucket_limit, hard_limits)
+    return {
+        "race_mode": getattr(args, "race", False),
+        "remove_easy": getattr(args, "remove_easy", False),
+        "harder_board": getattr(args, "harder_board", False),
+        "bucket_mode": getattr(args, "bucket", False),
+        "bucket_hard_mode": getattr(args, "hard", False),
+        "exclude_boss_objectives": getattr(args, "exclude_boss", False),
+        "randomize_djinn": getattr(args, "randomize_djinn", False),
+        "tag_limits": tag_limits,
+        "reroll": getattr(args, "reroll", DEFAULT_CONFIG["reroll"]),
+        "max_reroll_rounds": getattr(args, "max_reroll_rounds", DEFAULT_CONFIG["max_reroll_rounds"]),
+        "engine": getattr(args, "engine", "scalar"),
+        "solver": getattr(args, "solver", DEFAULT_CONFIG["solver"]),
+        "bucket_limits": bucket_limits
+    }
+
+def run_generate(args):
+    import bingo_cache
+    import bingo_export
+    stats = GenerationStats()
+    profiler = None
+    if args.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    with stats.phase("load"):
+        bingo_list, index = bingo_cache.load_pool(args.csv, use_cache=not args.no_cache)
+    if bingo_list is None:
+        print("Failed to generate bingo list. Exiting.", file=sys.stderr)
+        return 1
+
+    fallbacks = []
+
+    def solver_failed(board, error):
+        fallbacks.append(board)
+        print(f"Board {board}: {error}; drawing it with the greedy selection instead", file=sys.stderr)
+
+    start = time.perf_counter()
+    boards = generate_boards(args.count, config_from_args(args), args.seed, bingo_list, index, stats,
+                             verbose=True, start=args.start, on_solver_error=solver_failed)
+    try:
+        count = bingo_export.export_boards(boards, args.output, bingo_export.export_format(args), args.compress or None,
+                                           args.start)
+    except BrokenPipeError:
+        # The reader went away, as with '| head'; point stdout at devnull so the exit flush doesn't fail again
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
+    except ValueError as e:
+        # The batch engine doesn't support the options
+        print(f"Failed to generate a board: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    if profiler is not None:
+        profiler.disable()
+        profiler.dump_stats(args.profile)
+        print(f"Wrote profile to {args.profile}", file=sys.stderr)
+    if args.stats:
+        stats.write_json(args.stats)
+
+    rate = count / elapsed if elapsed > 0 else float('inf')
+    print(f"Generated {count} boards in {elapsed:.2f}s ({rate:.1f} boards/sec)", file=sys.stderr)
+    if fallbacks:
+        print(f"Boards drawn greedily after the solver failed: {len(fallbacks)}", file=sys.stderr)
+    if logger.isEnabledFor(logging.INFO):
+        for line in stats.summary():
+            print(line, file=sys.stderr)
+    elif stats.solver["nodes"]:
+        print(stats.summary()[-1], file=sys.stderr)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Generate bingo objectives for TLA Rando. Run without arguments for the interactive prompts."
+    )
+    subparsers = parser.add_subparsers(dest="command")
+
+    import bingo_export
+    generate = subparsers.add_parser("generate", help="generate boards without prompting, as JSONL, CSV or JS")
+    add_mode_arguments(generate)
+    generate.add_argument("-n", "--count", type=int, default=1, help="number of boards (default: 1)")
+    generate.add_argument("--seed", type=int, help="seed for reproducible output")
+    generate.add_argument("--start", type=int, default=0,
+                          help="number of the first board; with --seed, '--start 41 -n 1' gives board 41 of any run")
+    bingo_export.add_export_arguments(generate)
+    generate.add_argument("--engine", choices=["scalar", "batch"], default="scalar",
+                          help="'batch' draws bucket-mode boards in vectorized batches (needs NumPy)")
+    generate.add_argument("--log-level", choices=["debug", "info", "warning", "error"], default="warning",
+                          help="'debug' logs every pick, 'info' adds reroll notices and counters (default: warning)")
+    generate.add_argument("--stats", metavar="FILE", help="write phase timings and rejection counters as JSON")
+    generate.add_argument("--profile", metavar="FILE", help="write a cProfile dump of the run, for pstats or snakeviz")
+    generate.set_defaults(func=run_generate)
+
+    import bingo_simulator
+    simulate = subparsers.add_parser("simulate", help="estimate objective frequencies and tag limit violations")
+    bingo_simulator.add_simulate_arguments(simulate)
+    simulate.set_defaults(func=bingo_simulator.run_simulate)
+
+    import bingo_benchmark
+    benchmark = subparsers.add_parser("benchmark", help="time loading and generation, optionally against a baseline")
+    bingo_benchmark.add_benchmark_arguments(benchmark)
+    benchmark.set_defaults(func=bingo_benchmark.run_benchmark)
+
+    import bingo_analysis
+    analyze = subparsers.add_parser("analyze", help="regenerate tag_conflicts.csv from the objective sheet")
+    bingo_analysis.add_analyze_arguments(analyze)
+    analyze.set_defaults(func=bingo_analysis.run_analyze)
+
+    import bingo_tuner
+    tune = subparsers.add_parser("tune", help="search bucket and tag limits that meet frequency targets")
+    bingo_tuner.add_tune_arguments(tune)
+    tune.set_defaults(func=bingo_tuner.run_tune)
+
+    import bingo_validator
+    validate = subparsers.add_parser("validate", help="check generated boards against the sheet and the limits")
+    bingo_validator.add_validate_arguments(validate)
+    validate.set_defaults(func=bingo_validator.run_validate)
+
+    import bingo_tournament
+    tournament = subparsers.add_parser("tournament", help="generate a set of boards with limits on shared objectives")
+    bingo_tournament.add_tournament_arguments(tournament)
+    tournament.set_defaults(func=bingo_tournament.run_tournament)
+
+    import bingo_server
+    serve = subparsers.add_parser("serve", help="serve boards over HTTP as JSON")
+    bingo_server.add_serve_arguments(serve)
+    serve.set_defaults(func=bingo_server.run_serve)
+
+    return parser
+
+def cli(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        main()
+        return 0
+    logging.basicConfig(level=getattr(args, "log_level", "warning").upper(), format="%(message)s", stream=sys.stderr)
+    try:
+        return args.func(args)
+    except argparse.ArgumentTypeError as e:
+        # Options that are only checked together, such as bucket limits that don't add up to 25
+        parser.error(str(e))
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # Run through the importable module so subcommand modules share its state
+    import bingo_generator
+    sys.exit(bingo_generator.cli())
\ No newline at end of file
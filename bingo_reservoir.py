@@ -0,0 +1,291 @@
+"""
+Reservoir of pre-generated boards.
+
+Some boards need several reroll rounds, so generating on demand makes latency spiky.
+BoardReservoir keeps a bounded queue of ready boards for each configured mode. A
+producer thread per mode has boards generated, checks them with BoardValidator, and
+tops the queue back up to capacity whenever it falls below the low-water mark, so
+taking a board is a deque pop. Every board is board n of the mode's seed, so a board
+handed out can still be reproduced. Unused boards can be saved on close and picked
+up by the next reservoir over the same sheet and options.
+"""
+import collections
+import pickle
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError
+from concurrent.futures.process import BrokenProcessPool
+
+import bingo_cache
+import bingo_generator
+import bingo_validator
+
+# Bump whenever the layout of a saved reservoir changes
+RESERVOIR_VERSION = 1
+DEFAULT_CAPACITY = 64
+
+# A producer whose boards keep failing validation waits before each retry, doubling
+# from the first to the second delay, and stops after this many failures in a row
+REJECT_BACKOFF_SECONDS = 0.01
+MAX_BACKOFF_SECONDS = 1.0
+MAX_CONSECUTIVE_REJECTIONS = 50
+
+class ModeQueue:
+    """The ready boards of one mode, with the generator that refills them and its counters."""
+
+    def __init__(self, name, generator, validator, capacity, low_water):
+        self.name = name
+        self.generator = generator
+        self.validator = validator
+        self.capacity = capacity
+        self.low_water = low_water
+        # (board number, objectives), oldest first
+        self.boards = collections.deque()
+        # Number of the next board, handed out under the reservoir's lock so the
+        # producer and a starved caller never build the same board
+        self.next_board = 0
+        self.produced = 0
+        self.served = 0
+        self.rejected = 0
+        self.starved = 0
+        self.refill_seconds = 0.0
+        # Why the producer stopped refilling before close, or None while it runs
+        self.stopped = None
+        self.thread = None
+
+    def stats(self):
+        return {
+            "depth": len(self.boards),
+            "capacity": self.capacity,
+            "produced": self.produced,
+            "served": self.served,
+            "rejected": self.rejected,
+            "starved": self.starved,
+            "refill_rate": self.produced / self.refill_seconds if self.refill_seconds else 0.0,
+            "stopped": self.stopped
+        }
+
+class BoardReservoir:
+    """
+    Bounded queues of ready boards, one per mode, refilled by background threads.
+
+    Without submit the producers generate in their own threads, which hold the GIL
+    while they do and so slow down every other thread of the process, an asyncio
+    event loop included. A server passes submit to have the boards generated on its
+    process pool instead; the producers then only wait on the results and validate
+    the boards. A mode that has MAX_CONSECUTIVE_REJECTIONS boards in a row rejected or
+    failed stops refilling, backing off between attempts before that, and take()
+    then only serves what is left of its queue.
+    """
+
+    def __init__(self, bingo_list, index, modes, capacity=DEFAULT_CAPACITY, low_water=None, seed=None,
+                 persist_path=None, submit=None):
+        """
+        Args:
+            bingo_list: Bingo list from csv_to_bingo_json
+            index: ObjectiveIndex of bingo_list
+            modes: {name: config} of the modes to keep boards for
+            capacity: Boards kept ready per mode
+            low_water: Depth below which a mode is refilled, half the capacity if None
+            seed: Seed of the boards; each mode derives its own from it. None for fresh
+                entropy
+            persist_path: File unused boards are saved to on close and loaded from here
+            submit: Optional callable(config, seed, board) returning a Future of board
+                n of a seed, to generate the refills elsewhere, such as on a process pool
+        """
+        self.bingo_list = bingo_list
+        self.index = index
+        self.persist_path = persist_path
+        self.submit = submit
+        self.pool_hash = bingo_cache.pool_hash(bingo_list)
+        self.queues = {}
+        # Options hash -> mode name, for callers that have a config rather than a name
+        self.by_options = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+        saved = self._load() if persist_path else {}
+        for name, config in modes.items():
+            digest = bingo_cache.options_hash(config)
+            mode_seed = None if seed is None else f"{seed}:{name}"
+            state = saved.get(name)
+            if state is not None and state["options"] != digest:
+                state = None
+            if state is not None:
+                mode_seed = state["seed"]
+            generator = bingo_generator.BoardGenerator(bingo_list, dict(config, engine="scalar"), mode_seed, index)
+            validator = bingo_validator.BoardValidator(index, generator.config)
+            queue = ModeQueue(name, generator, validator, capacity,
+                              capacity // 2 if low_water is None else low_water)
+            if state is not None:
+                queue.next_board = state["next_board"]
+                queue.boards.extend(state["boards"][:capacity])
+            self.queues[name] = queue
+            self.by_options[digest] = name
+
+        for queue in self.queues.values():
+            queue.thread = threading.Thread(target=self._produce, args=(queue,),
+                                            name=f"reservoir-{queue.name}", daemon=True)
+            queue.thread.start()
+
+    def _generate(self, queue, board_number):
+        """Build board n of a mode, on the submit target if there is one."""
+        generator = queue.generator
+        if self.submit is None:
+            return generator.generate(board=board_number)
+        return self.submit(generator.config, generator.seed, board_number).result()
+
+    def _produce(self, queue):
+        """Producer loop of one mode: wait for the low-water mark, then fill to capacity."""
+        condition = self._condition
+        failures = 0
+        while True:
+            with condition:
+                while not self._closed and len(queue.boards) >= queue.low_water:
+                    condition.wait()
+                if self._closed:
+                    return
+            while True:
+                with condition:
+                    if self._closed or len(queue.boards) >= queue.capacity:
+                        break
+                    board_number = queue.next_board
+                    queue.next_board += 1
+                start = time.perf_counter()
+                try:
+                    objectives = self._generate(queue, board_number)
+                except (CancelledError, BrokenProcessPool) as e:
+                    if self._closed:
+                        return
+                    queue.stopped = f"the generation pool is gone ({type(e).__name__})"
+                    break
+                except (ValueError, RuntimeError) as e:
+                    # The backtracking solver found no board or gave up
+                    error = e
+                    objectives = None
+                else:
+                    error = None
+                    if queue.validator.validate(objectives):
+                        objectives = None
+                with condition:
+                    queue.refill_seconds += time.perf_counter() - start
+                    if objectives is not None:
+                        failures = 0
+                        queue.boards.append((board_number, objectives))
+                        queue.produced += 1
+                        continue
+                    queue.rejected += 1
+                    failures += 1
+                    if failures >= MAX_CONSECUTIVE_REJECTIONS:
+                        queue.stopped = f"{failures} boards in a row were rejected"
+                        if error is not None:
+                            queue.stopped += f", the last with {type(error).__name__}: {error}"
+                        break
+                    # Waits on the condition, so close() still stops the producer at once
+                    condition.wait(min(REJECT_BACKOFF_SECONDS * 2 ** (failures - 1), MAX_BACKOFF_SECONDS))
+            if queue.stopped:
+                print(f"Warning: the {queue.name} reservoir stopped refilling: {queue.stopped}", file=sys.stderr)
+                return
+
+    def take(self, name, fallback=True):
+        """
+        Take a ready board of a mode.
+
+        Args:
+            name: Mode name
+            fallback: When the queue is empty, generate a board right away instead of
+                returning None; either way the starvation is counted
+
+        Returns:
+            tuple: (seed, board number, objectives), or None if the queue was empty
+                and fallback is False
+        """
+        queue = self.queues[name]
+        with self._condition:
+            if queue.boards:
+                board_number, objectives = queue.boards.popleft()
+                queue.served += 1
+                if len(queue.boards) < queue.low_water:
+                    self._condition.notify_all()
+                return queue.generator.seed, board_number, list(objectives)
+            queue.starved += 1
+            self._condition.notify_all()
+            if not fallback:
+                return None
+            board_number = queue.next_board
+            queue.next_board += 1
+        # A fork, since the producer thread may be using the mode's generator
+        generator = queue.generator
+        objectives = generator.fork(generator.seed).generate(board=board_number)
+        with self._condition:
+            queue.served += 1
+        return generator.seed, board_number, objectives
+
+    def mode_for(self, config):
+        """Name of the mode with the same normalized options as config, or None."""
+        return self.by_options.get(bingo_cache.options_hash(config))
+
+    def stats(self):
+        """{mode: counters} with the depth, refill rate and starvation events of each mode."""
+        with self._condition:
+            return {name: queue.stats() for name, queue in self.queues.items()}
+
+    def drain(self):
+        """
+        Remove and return every ready board.
+
+        Returns:
+            dict: {mode: [(seed, board number, objectives)]}
+        """
+        with self._condition:
+            drained = {}
+            for name, queue in self.queues.items():
+                drained[name] = [(queue.generator.seed, board_number, list(objectives))
+                                 for board_number, objectives in queue.boards]
+                queue.boards.clear()
+            return drained
+
+    def close(self, persist=True):
+        """
+        Stop the producers, and save the unused boards to persist_path if there is one.
+
+        A board being generated when close is called is finished first.
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        for queue in self.queues.values():
+            queue.thread.join()
+        if persist and self.persist_path:
+            self._save()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _save(self):
+        modes = {}
+        for name, queue in self.queues.items():
+            modes[name] = {
+                "options": bingo_cache.options_hash(queue.generator.config),
+                "seed": queue.generator.seed,
+                "next_board": queue.next_board,
+                "boards": [(board_number, tuple(objectives)) for board_number, objectives in queue.boards]
+            }
+        snapshot = {"schema": RESERVOIR_VERSION, "pool_sha256": self.pool_hash, "modes": modes}
+        bingo_cache.write_snapshot(self.persist_path, snapshot, "board reservoir")
+
+    def _load(self):
+        """Saved modes whose sheet matches, or {} if there are none."""
+        try:
+            with open(self.persist_path, 'rb') as f:
+                snapshot = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError, AttributeError, ImportError, TypeError, ValueError):
+            return {}
+        if (not isinstance(snapshot, dict) or snapshot.get("schema") != RESERVOIR_VERSION
+                or snapshot.get("pool_sha256") != self.pool_hash):
+            return {}
+        return snapshot["modes"]
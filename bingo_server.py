@@ -0,0 +1,552 @@
+"""
+HTTP/JSON board server.
+
+An asyncio server built on the standard library only. It keeps one loaded pool
+resident and hands generation to a process pool (or a thread pool), whose workers
+load the pool once from the snapshot cache. GET or POST /board returns one board in
+the [{"name": ...}] layout main() writes to selected_objectives.txt; seeded boards
+are served from a BoardCache when they were generated before, and unseeded boards of
+the modes given with --reservoir are taken from a BoardReservoir kept filled in the
+background. /metrics reports request counts and the p50/p99 latency and boards/sec
+over recent requests.
+
+Endpoints:
+    GET  /board?bucket=1&hard=1&seed=42   options as query parameters
+    POST /board                           options as a JSON object
+    GET  /metrics
+    GET  /health
+"""
+import argparse
+import asyncio
+import collections
+import json
+import os
+import random
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import bingo_benchmark
+import bingo_cache
+import bingo_generator
+import bingo_reservoir
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8000
+DEFAULT_TIMEOUT = 10.0
+DEFAULT_MAX_PENDING = 64
+
+# Seconds a client may take to send a request, and the largest body accepted
+REQUEST_READ_TIMEOUT = 10.0
+MAX_BODY_BYTES = 64 * 1024
+
+# Latencies kept for the percentiles, and the window boards/sec is measured over
+LATENCY_WINDOW = 1000
+RATE_WINDOW_SECONDS = 60.0
+
+# Query parameter or JSON key -> boolean config option
+FLAG_OPTIONS = {
+    "bucket": "bucket_mode",
+    "hard": "bucket_hard_mode",
+    "race": "race_mode",
+    "remove_easy": "remove_easy",
+    "harder_board": "harder_board",
+    "randomize_djinn": "randomize_djinn",
+    "exclude_boss": "exclude_boss_objectives"
+}
+CHOICE_OPTIONS = {
+    "reroll": ("always", "never"),
+    "solver": ("greedy", "backtrack")
+}
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large",
+           500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout"}
+
+class RequestError(Exception):
+    """A request that can't be served, with the HTTP status to answer it with."""
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+# Built once per worker process (or once for the thread pool) by init_worker
+_worker_state = {}
+
+def init_worker(csv_file_path, use_cache=True):
+    bingo_list, index = bingo_cache.load_pool(csv_file_path, use_cache=use_cache)
+    if bingo_list is None:
+        raise ValueError(f"Failed to load {csv_file_path}")
+    _worker_state["bingo_list"] = bingo_list
+    _worker_state["index"] = index
+    # Normalized options -> BoardGenerator, so each option set's limits are parsed once
+    _worker_state["generators"] = {}
+
+def worker_ready():
+    return "index" in _worker_state
+
+def generate_board(config, seed, board):
+    """Generate board n of a seed in a worker."""
+    key = json.dumps(bingo_cache.normalize_options(config), sort_keys=True)
+    generators = _worker_state["generators"]
+    generator = generators.get(key)
+    if generator is None:
+        generator = generators[key] = bingo_generator.BoardGenerator(
+            _worker_state["bingo_list"], config, index=_worker_state["index"])
+    return generator.fork(seed).generate(board=board)
+
+def parse_flag(name, value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.lower() in ("1", "true", "yes", "on", ""):
+        return True
+    if isinstance(value, str) and value.lower() in ("0", "false", "no", "off"):
+        return False
+    raise RequestError(400, f"{name} must be true or false")
+
+def parse_int(name, value):
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        raise RequestError(400, f"{name} must be an integer")
+    try:
+        number = int(value)
+    except ValueError:
+        raise RequestError(400, f"{name} must be an integer") from None
+    if number < 0:
+        raise RequestError(400, f"{name} must not be negative")
+    return number
+
+def parse_limits(name, values, parse):
+    """Parse TAG=LIMIT style strings, or a JSON object of them, with a parse_*_limit function."""
+    if isinstance(values, dict):
+        values = [f"{key}={value}" for key, value in values.items()]
+    elif isinstance(values, str):
+        values = [values]
+    elif not isinstance(values, list):
+        raise RequestError(400, f"{name} must be a list or an object of limits")
+    limits = {}
+    for value in values:
+        try:
+            key, limit = parse(str(value))
+        except Exception as e:
+            raise RequestError(400, f"{name}: {e}") from None
+        limits[key] = limit
+    return limits
+
+def request_options(params):
+    """
+    Turn request parameters into a generation config, a seed and a board number.
+
+    Args:
+        params: Query parameters as {name: [values]} or a JSON object; query flags
+            may be given without a value, as in ?bucket&hard
+
+    Returns:
+        tuple: (config, seed or None, board number)
+    """
+    def single(name):
+        value = params[name]
+        if isinstance(value, list) and name not in ("tag_limit", "bucket_limit"):
+            value = value[-1]
+        return value
+
+    config = {}
+    seed = None
+    board = 0
+    for name in params:
+        if name in FLAG_OPTIONS:
+            config[FLAG_OPTIONS[name]] = parse_flag(name, single(name))
+        elif name in CHOICE_OPTIONS:
+            value = single(name)
+            if value not in CHOICE_OPTIONS[name]:
+                raise RequestError(400, f"{name} must be one of {', '.join(CHOICE_OPTIONS[name])}")
+            config[name] = value
+        elif name == "tag_limit":
+            tag_limits = dict(bingo_generator.DEFAULT_TAG_LIMITS)
+            tag_limits.update(parse_limits(name, params[name], bingo_generator.parse_tag_limit))
+            config["tag_limits"] = tag_limits
+        elif name == "bucket_limit":
+            config["bucket_limits"] = parse_limits(name, params[name], bingo_generator.parse_bucket_limit)
+        elif name == "seed":
+            seed = parse_int(name, single(name))
+        elif name == "board":
+            board = parse_int(name, single(name))
+        else:
+            raise RequestError(400, f"Unknown option {name}")
+
+    if "bucket_limits" in config:
+        try:
+            config["bucket_limits"] = bingo_generator.merge_bucket_limits(config["bucket_limits"],
+                                                                          config.get("bucket_hard_mode", False))
+        except argparse.ArgumentTypeError as e:
+            raise RequestError(400, f"bucket_limit: {e}") from None
+    return config, seed, board
+
+class ServerMetrics:
+    """Request counters, and latencies and completion times of recent boards."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.boards = 0
+        self.cached_boards = 0
+        self.reservoir_boards = 0
+        self.errors = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.in_flight = 0
+        # Generation jobs on the pool, including ones whose requests timed out
+        self.running = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.completions = collections.deque()
+
+    def record_board(self, seconds, source=None):
+        now = time.monotonic()
+        self.boards += 1
+        if source == "cache":
+            self.cached_boards += 1
+        elif source == "reservoir":
+            self.reservoir_boards += 1
+        self.latencies.append(seconds)
+        self.completions.append(now)
+        while self.completions and self.completions[0] < now - RATE_WINDOW_SECONDS:
+            self.completions.popleft()
+
+    def as_dict(self):
+        now = time.monotonic()
+        while self.completions and self.completions[0] < now - RATE_WINDOW_SECONDS:
+            self.completions.popleft()
+        window = min(RATE_WINDOW_SECONDS, now - self.started)
+        latencies = sorted(seconds * 1000 for seconds in self.latencies)
+        return {
+            "uptime_seconds": now - self.started,
+            "requests": self.requests,
+            "boards": self.boards,
+            "cached_boards": self.cached_boards,
+            "reservoir_boards": self.reservoir_boards,
+            "errors": self.errors,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "in_flight": self.in_flight,
+            "running": self.running,
+            "latency_p50_ms": bingo_benchmark.percentile(latencies, 50) if latencies else None,
+            "latency_p99_ms": bingo_benchmark.percentile(latencies, 99) if latencies else None,
+            "boards_per_sec": len(self.completions) / window if window > 0 else 0.0
+        }
+
+class BoardServer:
+    """
+    Serves boards over HTTP from one loaded pool.
+
+    At most max_concurrent boards are generated at a time, normally one per worker.
+    Requests beyond that wait, up to max_pending of them in all; any more get a 503
+    straight away. A board that takes longer than timeout seconds gets a 504; its
+    worker still finishes it, and a seeded board is cached when it does. Until then
+    the job keeps its place among the max_concurrent, so timeouts can't pile up work
+    on the pool. An unseeded
+    request for a reservoir mode takes a ready board, and only goes to the pool when
+    that mode's queue has run dry.
+    """
+
+    def __init__(self, csv_file_path=bingo_generator.DEFAULT_CSV, workers=None, executor="process",
+                 max_concurrent=None, max_pending=DEFAULT_MAX_PENDING, timeout=DEFAULT_TIMEOUT,
+                 cache_size=bingo_cache.DEFAULT_CACHED_BOARDS, cache_dir=None, use_cache=True,
+                 reservoir_modes=None, reservoir_size=bingo_reservoir.DEFAULT_CAPACITY, reservoir_file=None):
+        """
+        Args:
+            csv_file_path: Objective sheet to serve boards from
+            workers: Pool size, os.cpu_count() if None
+            executor: "process" or "thread"; threads share one interpreter, so they
+                only help while boards wait on something other than the CPU
+            max_concurrent: Boards generated at a time, the pool size if None
+            max_pending: Board requests accepted at a time, waiting ones included
+            timeout: Seconds a board may take before the request gets a 504
+            cache_size: Seeded boards kept in memory, 0 for no cache
+            cache_dir: Directory to keep seeded boards in across restarts
+            use_cache: False to parse the sheet instead of loading its snapshot
+            reservoir_modes: {name: config} of the modes to keep ready boards for
+            reservoir_size: Ready boards kept per reservoir mode
+            reservoir_file: File the unused ready boards are kept in across restarts
+        """
+        bingo_list, index = bingo_cache.load_pool(csv_file_path, use_cache=use_cache)
+        if bingo_list is None:
+            raise ValueError(f"Failed to load {csv_file_path}")
+        self.workers = workers or os.cpu_count() or 1
+        if executor == "process":
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                                initargs=(csv_file_path, use_cache))
+        else:
+            init_worker(csv_file_path, use_cache)
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self.cache = bingo_cache.BoardCache(bingo_list, index, cache_size, cache_dir) if cache_size else None
+        self.reservoir = None
+        if reservoir_modes:
+            # Refills go through the pool too, so the producer threads don't hold the
+            # GIL the event loop needs while they generate
+            self.reservoir = bingo_reservoir.BoardReservoir(
+                bingo_list, index, reservoir_modes, reservoir_size, persist_path=reservoir_file,
+                submit=lambda config, seed, board: self.executor.submit(generate_board, config, seed, board))
+        self.metrics = ServerMetrics()
+        self.semaphore = asyncio.Semaphore(max_concurrent or self.workers)
+        self.seeds = random.SystemRandom()
+
+    async def board(self, params):
+        """Generate or look up one board; returns (status, payload, extra headers)."""
+        config, seed, board = request_options(params)
+        if self.metrics.in_flight >= self.max_pending:
+            self.metrics.rejected += 1
+            raise RequestError(503, "Too many requests in progress, try again later")
+        start = time.perf_counter()
+        ready = None
+        if seed is None and self.reservoir is not None:
+            mode = self.reservoir.mode_for(config)
+            if mode is not None:
+                ready = self.reservoir.take(mode, fallback=False)
+        if ready is not None:
+            seed, board, objectives = ready
+            if self.cache is not None:
+                self._remember(self.cache.key(config, seed, board), objectives)
+            self.metrics.record_board(time.perf_counter() - start, "reservoir")
+            headers = {"X-Bingo-Seed": str(seed), "X-Bingo-Board": str(board)}
+            return 200, [{"name": obj.name} for obj in objectives], headers
+        if seed is None:
+            seed = self.seeds.getrandbits(32)
+
+        self.metrics.in_flight += 1
+        try:
+            key = None
+            objectives = None
+            if self.cache is not None:
+                key = self.cache.key(config, seed, board)
+                objectives = self.cache.lookup(key, read=False)
+                if objectives is None:
+                    objectives = await self._cache_io(self.cache.load, key)
+            source = "cache" if objectives is not None else None
+            if source is None:
+                await self.semaphore.acquire()
+                try:
+                    future = asyncio.get_running_loop().run_in_executor(
+                        self.executor, generate_board, config, seed, board)
+                except BaseException:
+                    self.semaphore.release()
+                    raise
+                # The permit is held until the job is done, not until the request gives up
+                # on it, so jobs that time out still count against max_concurrent
+                self.metrics.running += 1
+                future.add_done_callback(self._job_done)
+                if self.cache is not None:
+                    future.add_done_callback(lambda done: self._cache_result(key, done))
+                try:
+                    objectives = await asyncio.wait_for(asyncio.shield(future), self.timeout)
+                except asyncio.TimeoutError:
+                    self.metrics.timeouts += 1
+                    raise RequestError(504, f"No board after {self.timeout:g}s") from None
+                except (ValueError, RuntimeError) as e:
+                    raise RequestError(500, f"Generation failed: {e}") from None
+        finally:
+            self.metrics.in_flight -= 1
+        self.metrics.record_board(time.perf_counter() - start, source)
+        headers = {"X-Bingo-Seed": str(seed), "X-Bingo-Board": str(board)}
+        return 200, [{"name": obj.name} for obj in objectives], headers
+
+    def _job_done(self, future):
+        self.metrics.running -= 1
+        self.semaphore.release()
+
+    def _cache_result(self, key, future):
+        if not future.cancelled() and future.exception() is None:
+            self._remember(key, future.result())
+
+    async def _cache_io(self, function, *args):
+        """Run a BoardCache file operation on a thread, so the disk never blocks the event loop."""
+        if self.cache.cache_dir is None:
+            return function(*args)
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+    def _remember(self, key, objectives):
+        """Cache a board in memory now and write it to the cache directory in the background."""
+        self.cache.put(key, objectives, write=False)
+        if self.cache.cache_dir is not None:
+            asyncio.get_running_loop().run_in_executor(None, self.cache.write, key, objectives)
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        if url.path == "/board":
+            if method == "GET":
+                params = parse_qs(url.query, keep_blank_values=True)
+            elif method == "POST":
+                try:
+                    params = json.loads(body or b"{}")
+                except ValueError as e:
+                    raise RequestError(400, f"Invalid JSON: {e}") from None
+                if not isinstance(params, dict):
+                    raise RequestError(400, "The body must be a JSON object")
+            else:
+                raise RequestError(405, "Use GET or POST")
+            return await self.board(params)
+        if method != "GET":
+            raise RequestError(405, "Use GET")
+        if url.path == "/metrics":
+            metrics = self.metrics.as_dict()
+            if self.cache is not None:
+                metrics["cache"] = self.cache.stats()
+            if self.reservoir is not None:
+                metrics["reservoir"] = self.reservoir.stats()
+            return 200, metrics, {}
+        if url.path == "/health":
+            return 200, {"status": "ok"}, {}
+        raise RequestError(404, f"No such endpoint {url.path}")
+
+    async def handle(self, reader, writer):
+        """Serve the requests of one connection, keeping it open while the client asks to."""
+        try:
+            while True:
+                try:
+                    request = await asyncio.wait_for(read_request(reader), REQUEST_READ_TIMEOUT)
+                except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+                    return
+                except RequestError as e:
+                    await write_response(writer, e.status, {"error": str(e)}, {}, keep_alive=False)
+                    return
+                if request is None:
+                    return
+                method, target, headers, body, keep_alive = request
+
+                self.metrics.requests += 1
+                try:
+                    status, payload, extra_headers = await self.dispatch(method, target, body)
+                except RequestError as e:
+                    if e.status == 500:
+                        self.metrics.errors += 1
+                    status, payload, extra_headers = e.status, {"error": str(e)}, {}
+                except Exception as e:
+                    self.metrics.errors += 1
+                    status, payload, extra_headers = 500, {"error": f"{type(e).__name__}: {e}"}, {}
+                await write_response(writer, status, payload, extra_headers, keep_alive)
+                if not keep_alive:
+                    return
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host=DEFAULT_HOST, port=DEFAULT_PORT, on_start=None):
+        """Serve until cancelled or sent SIGTERM."""
+        loop = asyncio.get_running_loop()
+        try:
+            # Start the workers before listening, so forked workers don't inherit the
+            # socket, and so a pool that can't load the sheet fails here
+            await loop.run_in_executor(self.executor, worker_ready)
+            try:
+                loop.add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+            except (NotImplementedError, RuntimeError):
+                pass
+            server = await asyncio.start_server(self.handle, host, port)
+            if on_start:
+                on_start(server)
+            async with server:
+                await server.serve_forever()
+        finally:
+            # The reservoir first, so its producers finish their boards on a live pool
+            if self.reservoir is not None:
+                self.reservoir.close()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+async def read_request(reader):
+    """
+    Read one HTTP/1.1 request.
+
+    Returns:
+        tuple: (method, target, {header: value}, body, keep_alive), or None when the
+            client closed the connection between requests
+    """
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    parts = request_line.decode('latin-1').split()
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise RequestError(400, "Malformed request line")
+    method, target, version = parts
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if not line:
+            raise asyncio.IncompleteReadError(line, None)
+        line = line.decode('latin-1').strip()
+        if not line:
+            break
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise RequestError(400, "Invalid Content-Length") from None
+    if length > MAX_BODY_BYTES:
+        raise RequestError(413, f"Bodies are limited to {MAX_BODY_BYTES} bytes")
+    body = await reader.readexactly(length) if length > 0 else b""
+
+    connection = headers.get("connection", "").lower()
+    keep_alive = connection != "close" if version == "HTTP/1.1" else connection == "keep-alive"
+    return method, target, headers, body, keep_alive
+
+async def write_response(writer, status, payload, headers, keep_alive):
+    body = json.dumps(payload).encode()
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+             "Content-Type: application/json",
+             f"Content-Length: {len(body)}",
+             f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1') + body)
+    await writer.drain()
+
+def add_serve_arguments(parser):
+    parser.add_argument("--csv", default=bingo_generator.DEFAULT_CSV,
+                        help=f"objective sheet (default: {bingo_generator.DEFAULT_CSV})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="parse the objective sheet instead of loading the cached snapshot")
+    parser.add_argument("--host", default=DEFAULT_HOST, help=f"address to listen on (default: {DEFAULT_HOST})")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"port to listen on (default: {DEFAULT_PORT})")
+    parser.add_argument("--workers", type=int, help="generation workers (default: one per CPU)")
+    parser.add_argument("--executor", choices=["process", "thread"], default="process",
+                        help="run the workers as processes (default) or threads")
+    parser.add_argument("--max-concurrent", type=int, help="boards generated at a time (default: one per worker)")
+    parser.add_argument("--max-pending", type=int, default=DEFAULT_MAX_PENDING,
+                        help=f"board requests accepted at a time before answering 503 (default: {DEFAULT_MAX_PENDING})")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT,
+                        help=f"seconds a board may take before answering 504 (default: {DEFAULT_TIMEOUT:g})")
+    parser.add_argument("--cache-size", type=int, default=bingo_cache.DEFAULT_CACHED_BOARDS,
+                        help=f"seeded boards kept in memory, 0 to turn the cache off "
+                             f"(default: {bingo_cache.DEFAULT_CACHED_BOARDS})")
+    parser.add_argument("--cache-dir", help="directory to keep seeded boards in across restarts")
+    parser.add_argument("--reservoir", action="append", choices=list(bingo_benchmark.BENCHMARK_MODES),
+                        metavar="MODE", help="keep ready boards for unseeded requests of a benchmark mode; "
+                                             f"repeat for more modes ({', '.join(bingo_benchmark.BENCHMARK_MODES)})")
+    parser.add_argument("--reservoir-size", type=int, default=bingo_reservoir.DEFAULT_CAPACITY,
+                        help=f"ready boards kept per reservoir mode (default: {bingo_reservoir.DEFAULT_CAPACITY})")
+    parser.add_argument("--reservoir-file", help="file to keep unused ready boards in across restarts")
+
+def run_serve(args):
+    reservoir_modes = {mode: bingo_benchmark.BENCHMARK_MODES[mode] for mode in args.reservoir or ()}
+    try:
+        server = BoardServer(args.csv, args.workers, args.executor, args.max_concurrent, args.max_pending,
+                             args.timeout, args.cache_size, args.cache_dir, not args.no_cache,
+                             reservoir_modes, args.reservoir_size, args.reservoir_file)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+
+    def started(listener):
+        for sock in listener.sockets:
+            host, port = sock.getsockname()[:2]
+            print(f"Serving boards on http://{host}:{port}/board with {server.workers} {args.executor} workers; "
+                  "press Ctrl+C to stop", file=sys.stderr)
+
+    try:
+        asyncio.run(server.serve(args.host, args.port, started))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    return 0
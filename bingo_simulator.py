@@ -0,0 +1,401 @@
+"""
+Monte Carlo frequency simulator for the bingo generator.
+
+Generates a large number of boards with the real selection code, spread over a
+process pool, and writes how often each objective is picked and how often each
+tag limit is broken in the first pick of a board, with Wilson score confidence
+intervals. Boards can be drawn in rounds until every interval is narrow enough or a
+time budget runs out, instead of a fixed number of them.
+"""
+import csv
+import os
+import math
+import statistics
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import bingo_cache
+import bingo_generator
+
+# Bucket modes the frequency files are produced for
+SIMULATION_MODES = {
+    "hard": {"bucket_mode": True, "bucket_hard_mode": True},
+    "normal": {"bucket_mode": True, "bucket_hard_mode": False}
+}
+
+FREQUENCY_FILES = {
+    "hard": "hard_mode_frequencies.csv",
+    "normal": "normal_mode_frequencies.csv"
+}
+VIOLATIONS_FILE = "tag_limit_violations.csv"
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_CONFIDENCE = 0.95
+# Boards per mode drawn between precision checks
+DEFAULT_ROUND_SIZE = 10000
+
+# Loaded once per worker process by init_worker
+_worker_state = {}
+
+def init_worker(csv_file_path, config, use_cache=True):
+    """Load the compiled objective sheet in a worker process, from the snapshot run_simulate left."""
+    bingo_list, index = bingo_cache.load_pool(csv_file_path, use_cache=use_cache)
+    if bingo_list is None:
+        raise ValueError(f"Failed to load {csv_file_path}")
+    _worker_state["bingo_list"] = bingo_list
+    _worker_state["index"] = index
+    _worker_state["tag_budget"] = bingo_generator.TagBudget(config["tag_limits"])
+    _worker_state["config"] = config
+
+def chunk_seed(seed, mode, chunk):
+    """Seed of one chunk's boards, so results don't depend on how chunks are scheduled."""
+    return f"{seed}:{mode}:{chunk}"
+
+def simulate_chunk(mode, chunk, boards, seed, overrides=None):
+    """
+    Generate one chunk of boards in a worker and count what was selected.
+
+    overrides replaces config options for this chunk only, such as the tag or bucket
+    limits of a candidate being tuned.
+
+    Returns:
+        tuple: (mode, selection counts by dense objective id, {tag: boards whose first
+            pick broke the tag's limit}, boards that needed a reroll)
+    """
+    bingo_list = _worker_state["bingo_list"]
+    index = _worker_state["index"]
+    tag_budget = _worker_state["tag_budget"]
+    options = dict(_worker_state["config"])
+    options.update(SIMULATION_MODES[mode])
+    if overrides:
+        options.update(overrides)
+        if "tag_limits" in overrides:
+            tag_budget = bingo_generator.TagBudget(options["tag_limits"])
+    base_policy = bingo_generator.make_reroll_policy(options["reroll"], options["max_reroll_rounds"])
+
+    selection_counts = [0] * len(index)
+    violation_counts = defaultdict(int)
+    rerolled_boards = 0
+    first_violations = {}
+
+    def recording_policy(violations, rounds):
+        if rounds == 0:
+            first_violations.update(violations)
+        return base_policy(violations, rounds)
+
+    stream_seed = chunk_seed(seed, mode, chunk)
+    for board_number in range(boards):
+        first_violations.clear()
+        board = bingo_generator.select_random_objectives(
+            bingo_list, options["race_mode"], options["remove_easy"], options["harder_board"],
+            tag_budget, options["bucket_mode"], options["bucket_hard_mode"],
+            options["exclude_boss_objectives"], options["randomize_djinn"], index,
+            reroll_policy=recording_policy, verbose=False, solver=options["solver"],
+            rng=bingo_generator.BoardRandom(stream_seed, board_number),
+            bucket_limits=options["bucket_limits"]
+        )
+        for obj in board:
+            objective_id = index.lookup(obj)
+            if objective_id is not None:
+                selection_counts[objective_id] += 1
+        if first_violations:
+            rerolled_boards += 1
+            for tag in first_violations:
+                violation_counts[tag] += 1
+
+    return mode, selection_counts, dict(violation_counts), rerolled_boards
+
+def z_score(confidence):
+    """Two-sided standard normal quantile for a confidence level, 1.96 for 0.95."""
+    return statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+
+def wilson_interval(successes, trials, z):
+    """
+    Wilson score interval for a binomial proportion.
+
+    Unlike the normal approximation it stays inside [0, 1] and is usable for
+    proportions at or near 0, which most objectives and tags are.
+
+    Returns:
+        tuple: (low, high), or (0.0, 1.0) when there are no trials
+    """
+    if not trials:
+        return 0.0, 1.0
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    center = (p + z * z / (2 * trials)) / denominator
+    half_width = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return max(0.0, center - half_width), min(1.0, center + half_width)
+
+def widest_interval(result, tags, z):
+    """
+    Largest half-width among a mode's estimates.
+
+    Returns:
+        tuple: (half-width, what it belongs to) over every objective's selection
+            probability and every tag's violation rate
+    """
+    widest = (0.0, None)
+    boards = result["boards"]
+    for objective_id, count in enumerate(result["selection_counts"] or []):
+        low, high = wilson_interval(count, boards, z)
+        widest = max(widest, ((high - low) / 2, objective_id), key=lambda item: item[0])
+    for tag in tags:
+        low, high = wilson_interval(result["violations"][tag], boards, z)
+        widest = max(widest, ((high - low) / 2, tag), key=lambda item: item[0])
+    return widest
+
+def simulate(boards, config=None, seed=0, workers=None, csv_file_path=bingo_generator.DEFAULT_CSV,
+             modes=("hard", "normal"), chunk_size=DEFAULT_CHUNK_SIZE, progress=None, use_cache=True,
+             precision=None, time_budget=None, confidence=DEFAULT_CONFIDENCE, round_size=DEFAULT_ROUND_SIZE,
+             on_round=None, bucket_overrides=None):
+    """
+    Generate boards for each mode across a process pool and merge the counters.
+
+    Without precision or time_budget exactly boards boards are drawn per mode. With
+    either, boards are drawn round_size at a time per mode, and a mode stops once
+    the Wilson interval of every objective's selection probability and every tag's
+    violation rate is at most precision wide on each side, once it reaches boards,
+    or once time_budget seconds have passed. Chunks are seeded by their position, so
+    a run that stops on precision gives the same counts for a given seed and
+    round_size whatever the worker count.
+
+    Args:
+        boards: Number of boards per mode; in adaptive mode the cap, None for no cap
+        config: Options overriding bingo_generator.DEFAULT_CONFIG; the bucket mode
+            flags are set per mode
+        seed: Base seed; every chunk derives its own stream from it
+        workers: Number of worker processes, os.cpu_count() if None
+        csv_file_path: Objective sheet to load in each worker
+        modes: Keys of SIMULATION_MODES to run
+        chunk_size: Boards per task sent to a worker
+        progress: Optional callable(done, total) called as chunks finish, per round
+        use_cache: Load the sheet in the workers through the snapshot cache
+        precision: Target half-width of the intervals, e.g. 0.005 for +/-0.5 points
+        time_budget: Seconds after which no further round is started
+        confidence: Confidence level of the intervals
+        round_size: Boards per mode drawn between precision checks
+        on_round: Optional callable(mode, result, half_width, widest) called after each
+            round for every mode still running
+        bucket_overrides: {bucket: limit} applied to the bucket limits of each mode
+            separately, as --bucket-limit gives them
+
+    Returns:
+        dict: mode -> {"boards", "selection_counts", "violations", "rerolled_boards",
+            "confidence", "stopped"}, where stopped is "precision", "time", or "boards"
+
+    Raises:
+        argparse.ArgumentTypeError: If bucket_overrides don't leave a mode at 25 squares
+    """
+    options = dict(bingo_generator.DEFAULT_CONFIG)
+    options.update(config or {})
+    mode_overrides = dict.fromkeys(modes)
+    if bucket_overrides:
+        mode_overrides = {
+            mode: {"bucket_limits": bingo_generator.merge_bucket_limits(
+                bucket_overrides, SIMULATION_MODES[mode]["bucket_hard_mode"])}
+            for mode in modes
+        }
+    adaptive = precision is not None or time_budget is not None
+    if not adaptive and boards is None:
+        raise ValueError("boards is required without a precision or time budget")
+    z = z_score(confidence)
+    tags = [tag for tag, limit in options["tag_limits"].items() if limit != '-']
+
+    results = {
+        mode: {"boards": 0, "selection_counts": None, "violations": defaultdict(int), "rerolled_boards": 0,
+               "confidence": confidence, "stopped": None}
+        for mode in modes
+    }
+    next_chunk = dict.fromkeys(modes, 0)
+    active = list(modes)
+    start_time = time.perf_counter()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(csv_file_path, options, use_cache)) as executor:
+        while active:
+            tasks = []
+            for mode in active:
+                remaining = float('inf') if boards is None else boards - results[mode]["boards"]
+                round_boards = int(min(round_size if adaptive else boards, remaining))
+                for start in range(0, round_boards, chunk_size):
+                    tasks.append((mode, next_chunk[mode], min(chunk_size, round_boards - start), seed,
+                                  mode_overrides[mode]))
+                    next_chunk[mode] += 1
+            sizes = {(mode, chunk): count for mode, chunk, count, _, _ in tasks}
+
+            futures = {executor.submit(simulate_chunk, *task): task for task in tasks}
+            for done, future in enumerate(as_completed(futures), 1):
+                mode, selection_counts, violations, rerolled_boards = future.result()
+                _, chunk, _, _, _ = futures[future]
+                result = results[mode]
+                result["boards"] += sizes[(mode, chunk)]
+                if result["selection_counts"] is None:
+                    result["selection_counts"] = selection_counts
+                else:
+                    result["selection_counts"] = [a + b for a, b in zip(result["selection_counts"], selection_counts)]
+                for tag, count in violations.items():
+                    result["violations"][tag] += count
+                result["rerolled_boards"] += rerolled_boards
+                if progress:
+                    progress(done, len(tasks))
+
+            out_of_time = time_budget is not None and time.perf_counter() - start_time >= time_budget
+            for mode in list(active):
+                result = results[mode]
+                half_width, widest = widest_interval(result, tags, z)
+                if on_round:
+                    on_round(mode, result, half_width, widest)
+                if precision is not None and half_width <= precision:
+                    result["stopped"] = "precision"
+                elif boards is not None and result["boards"] >= boards:
+                    result["stopped"] = "boards"
+                elif out_of_time:
+                    result["stopped"] = "time"
+                else:
+                    continue
+                active.remove(mode)
+
+    return results
+
+def write_frequency_csv(path, index, result):
+    """
+    Write per-objective selection counts in the hard/normal_mode_frequencies.csv layout.
+
+    The CI Low and CI High columns bound the selection probability at the result's
+    confidence level.
+    """
+    boards = result["boards"]
+    z = z_score(result.get("confidence", DEFAULT_CONFIDENCE))
+    rows = [(count, objective_id) for objective_id, count in enumerate(result["selection_counts"] or []) if count]
+    rows.sort(key=lambda row: (-row[0], index.objectives[row[1]].name))
+
+    fieldnames = ['Objective', 'ID', 'Classification', 'Bucket', 'Core Tags', 'Supplementary Tags',
+                  'Restrictions', 'Selection Count', 'Selection Frequency', 'CI Low', 'CI High']
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for count, objective_id in rows:
+            obj = index.objectives[objective_id]
+            low, high = wilson_interval(count, boards, z)
+            writer.writerow({
+                'Objective': obj.name,
+                'ID': obj.id,
+                'Classification': index.classifications[objective_id],
+                'Bucket': index.buckets[objective_id],
+                'Core Tags': ', '.join(obj.types),
+                'Supplementary Tags': ', '.join(obj.supp_tags),
+                'Restrictions': ', '.join(map(str, obj.restrictions)),
+                'Selection Count': count,
+                'Selection Frequency': f"{count/boards:.1%}",
+                'CI Low': f"{low:.2%}",
+                'CI High': f"{high:.2%}"
+            })
+
+def write_violations_csv(path, tag_limits, results):
+    """
+    Write per-tag violation counts and rates in the tag_limit_violations.csv layout.
+
+    The _CI columns give the confidence interval of each rate as "low-high".
+    """
+    def rate(mode, tag):
+        result = results.get(mode)
+        if not result or not result["boards"]:
+            return "0%"
+        return f"{result['violations'][tag]/result['boards']:.1%}"
+
+    def interval(mode, tag):
+        result = results.get(mode)
+        if not result or not result["boards"]:
+            return ""
+        z = z_score(result.get("confidence", DEFAULT_CONFIDENCE))
+        low, high = wilson_interval(result["violations"][tag], result["boards"], z)
+        return f"{low:.2%}-{high:.2%}"
+
+    def count(mode, tag):
+        result = results.get(mode)
+        return result["violations"][tag] if result else 0
+
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['Tag', 'Limit', 'Hard_Mode_Violations',
+                                               'Hard_Mode_Rate', 'Hard_Mode_Rate_CI', 'Normal_Mode_Violations',
+                                               'Normal_Mode_Rate', 'Normal_Mode_Rate_CI'])
+        writer.writeheader()
+        for tag in sorted(tag for tag, limit in tag_limits.items() if limit != '-'):
+            writer.writerow({
+                'Tag': tag,
+                'Limit': tag_limits[tag],
+                'Hard_Mode_Violations': count("hard", tag),
+                'Hard_Mode_Rate': rate("hard", tag),
+                'Hard_Mode_Rate_CI': interval("hard", tag),
+                'Normal_Mode_Violations': count("normal", tag),
+                'Normal_Mode_Rate': rate("normal", tag),
+                'Normal_Mode_Rate_CI': interval("normal", tag)
+            })
+
+def print_progress(done, total, length=50):
+    filled_length = int(length * done // total)
+    bar = '█' * filled_length + '-' * (length - filled_length)
+    print(f'\rProgress: |{bar}| {100 * done / total:.1f}%', end='\n' if done == total else '', file=sys.stderr)
+
+def add_simulate_arguments(parser):
+    bingo_generator.add_mode_arguments(parser, board_modes=False)
+    parser.add_argument("-n", "--boards", type=int,
+                        help="boards per mode (default: 10000); with --precision or --time-budget, the most to draw")
+    parser.add_argument("--modes", nargs="+", choices=list(SIMULATION_MODES), default=list(SIMULATION_MODES),
+                        help="bucket modes to simulate (default: hard normal)")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="base seed (default: 0)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"boards per worker task (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("--output-dir", default=".", help="where to write the CSV files (default: .)")
+    parser.add_argument("--precision", type=float,
+                        help="draw boards in rounds until every interval is at most this wide on each side, e.g. 0.005")
+    parser.add_argument("--time-budget", type=float, metavar="SECONDS", help="start no further rounds after this long")
+    parser.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE,
+                        help=f"confidence level of the intervals (default: {DEFAULT_CONFIDENCE})")
+    parser.add_argument("--round-size", type=int, default=DEFAULT_ROUND_SIZE,
+                        help=f"boards per mode between precision checks (default: {DEFAULT_ROUND_SIZE})")
+
+def run_simulate(args):
+    bingo_list, index = bingo_cache.load_pool(args.csv, use_cache=not args.no_cache)
+    if bingo_list is None:
+        print("Failed to generate bingo list. Exiting.", file=sys.stderr)
+        return 1
+    # --bucket-limit is merged onto each simulated mode's own limits by simulate
+    config = bingo_generator.config_from_args(args, merge_buckets=False)
+    adaptive = args.precision is not None or args.time_budget is not None
+    boards = args.boards if args.boards is not None or adaptive else 10000
+
+    def print_round(mode, result, half_width, widest):
+        if isinstance(widest, int):
+            widest = index.objectives[widest].name
+        print(f"{mode}: {result['boards']} boards, widest interval +/-{half_width:.2%} ({widest})", file=sys.stderr)
+
+    start = time.perf_counter()
+    results = simulate(boards, config, args.seed, args.workers, args.csv, args.modes, args.chunk_size,
+                       progress=None if adaptive else print_progress, use_cache=not args.no_cache,
+                       precision=args.precision, time_budget=args.time_budget, confidence=args.confidence,
+                       round_size=args.round_size, on_round=print_round if adaptive else None,
+                       bucket_overrides=dict(args.bucket_limit))
+    elapsed = time.perf_counter() - start
+
+    for mode in args.modes:
+        path = os.path.join(args.output_dir, FREQUENCY_FILES[mode])
+        write_frequency_csv(path, index, results[mode])
+        print(f"Wrote {path}", file=sys.stderr)
+    path = os.path.join(args.output_dir, VIOLATIONS_FILE)
+    write_violations_csv(path, config["tag_limits"], results)
+    print(f"Wrote {path}", file=sys.stderr)
+
+    total = sum(result["boards"] for result in results.values())
+    for mode in args.modes:
+        result = results[mode]
+        if result["boards"]:
+            print(f"{mode}: {result['rerolled_boards']/result['boards']:.1%} of boards needed a reroll", file=sys.stderr)
+        if adaptive:
+            print(f"{mode}: stopped on {result['stopped']} after {result['boards']} boards", file=sys.stderr)
+    print(f"Simulated {total} boards in {elapsed:.2f}s ({total/elapsed:.1f} boards/sec)", file=sys.stderr)
+    return 0
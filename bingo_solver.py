@@ -0,0 +1,191 @@
+"""
+Backtracking solver for board selection.
+
+select_random_objectives(..., solver="backtrack") describes the board as a list of
+slots, each a list of candidate groups in the order the greedy selection would try
+them, and this module fills the slots together. Bucket quotas, race-mode caps per
+classification, mutual exclusions and tag limits are all checked as each objective
+is placed. A placement that leaves a later slot without a candidate is undone at
+once, so every board comes out valid and never needs a reroll.
+"""
+import random
+from collections import Counter, defaultdict
+
+import bingo_generator
+
+DEFAULT_MAX_NODES = 100000
+
+# Placements per slot allowed in the first search attempt; each restart doubles it
+RESTART_NODES_PER_SLOT = 4
+
+class _Restart(Exception):
+    """Raised inside the search when an attempt uses up its placements."""
+
+class BacktrackingSolver:
+    """
+    Randomized backtracking search with forward checking over compiled objective masks.
+
+    Values are tried in random order: the groups of a slot in the order given, and
+    the ids inside a group shuffled, which is how the greedy selection walks them.
+    The slot with the fewest candidates left is filled next, ties going to the
+    earlier slot, so a tight classification or bucket is settled before the looser
+    ones use up what it needs.
+
+    A few random orders lead the search into a dead end far from where it went wrong,
+    which would take a long stretch of backtracking to leave. So each attempt gets a
+    budget of placements, and an attempt that runs out starts over with a fresh random
+    order and twice the budget.
+    """
+
+    def __init__(self, index, tag_budget, max_per_classification=float('inf'), max_nodes=DEFAULT_MAX_NODES):
+        self.index = index
+        self.tag_budget = tag_budget
+        self.max_per_classification = max_per_classification
+        self.max_nodes = max_nodes
+
+        # occurrence_masks[slot][c] holds the objectives with at least c occurrences of
+        # the tag in that budget slot, so the objectives a tag's headroom rules out are
+        # one lookup away
+        self.occurrence_masks = [[0] for _ in tag_budget.tags]
+        for objective_id, tags in enumerate(index.tags):
+            for slot, occurrences in tag_budget.slots_for(tags):
+                masks = self.occurrence_masks[slot]
+                while len(masks) <= occurrences:
+                    masks.append(0)
+                for c in range(1, occurrences + 1):
+                    masks[c] |= index.bits[objective_id]
+
+        self.classification_masks = {}
+        for classification, objective_ids in index.by_classification.items():
+            mask = 0
+            for objective_id in objective_ids:
+                mask |= index.bits[objective_id]
+            self.classification_masks[classification] = mask
+
+    def _tag_blocked(self, slot, headroom):
+        """Objectives that no longer fit under a tag with this much headroom left."""
+        masks = self.occurrence_masks[slot]
+        needed = max(headroom + 1, 1)
+        return masks[needed] if needed < len(masks) else 0
+
+    def solve(self, slots, tag_budget, forbidden=0, classification_count=None, rng=random):
+        """
+        Fill every slot with an objective so the whole board satisfies the constraints.
+
+        Args:
+            slots: List of slots, each a list of groups of dense objective ids
+            tag_budget: TagBudget of the objectives already on the board; not modified
+            forbidden: Conflict mask of the objectives already on the board
+            classification_count: Objectives already on the board per classification
+            rng: Random number generator used for the value ordering
+
+        Returns:
+            tuple: (ids, stats) with the dense id chosen for each slot and
+                {"nodes": placements tried, "backtracks": placements undone,
+                "restarts": attempts started over}
+
+        Raises:
+            ValueError: If no assignment satisfies the constraints
+            RuntimeError: If the search gives up after max_nodes placements
+        """
+        index = self.index
+        bits = index.bits
+        cap = self.max_per_classification
+        initial_counts = dict(classification_count or {})
+        initial_tag_blocked = [self._tag_blocked(slot, room) for slot, room in enumerate(tag_budget.headroom)]
+        class_blocked = 0
+        for classification, count in initial_counts.items():
+            if count >= cap:
+                class_blocked |= self.classification_masks.get(classification, 0)
+
+        domains = []
+        for groups in slots:
+            domain = 0
+            for group in groups:
+                for objective_id in group:
+                    domain |= bits[objective_id]
+            domains.append(domain)
+
+        # Search state, reset at the start of every attempt
+        headroom = []
+        counts = defaultdict(int)
+        tag_blocked = []
+        unfilled = []
+        chosen = [None] * len(slots)
+        stats = {"nodes": 0, "backtracks": 0, "restarts": 0}
+        attempt_limit = 0
+
+        def tag_mask():
+            mask = 0
+            for blocked in tag_blocked:
+                mask |= blocked
+            return mask
+
+        def viable(blocked):
+            # Unfilled slots that share a domain need that many distinct candidates in it
+            for domain, needed in Counter(domains[i] for i in unfilled).items():
+                free = domain & ~blocked
+                if not free or (needed > 1 and free.bit_count() < needed):
+                    return False
+            return True
+
+        def search(forbidden, class_blocked):
+            if not unfilled:
+                return True
+            blocked = forbidden | class_blocked | tag_mask()
+            position = min(range(len(unfilled)), key=lambda k: (domains[unfilled[k]] & ~blocked).bit_count())
+            current = unfilled.pop(position)
+            for group in slots[current]:
+                for objective_id in bingo_generator.lazy_shuffle(group, rng):
+                    if blocked & bits[objective_id]:
+                        continue
+                    stats["nodes"] += 1
+                    if stats["nodes"] > attempt_limit:
+                        if attempt_limit >= self.max_nodes:
+                            raise RuntimeError(f"Gave up after {self.max_nodes} nodes without finding a valid board")
+                        raise _Restart()
+
+                    classification = index.classifications[objective_id]
+                    tag_slots = tag_budget.slots_for(index.tags[objective_id])
+                    saved = [(slot, tag_blocked[slot]) for slot, _ in tag_slots]
+                    for slot, occurrences in tag_slots:
+                        headroom[slot] -= occurrences
+                        tag_blocked[slot] = self._tag_blocked(slot, headroom[slot])
+                    counts[classification] += 1
+                    next_class_blocked = class_blocked
+                    if counts[classification] >= cap:
+                        next_class_blocked |= self.classification_masks.get(classification, 0)
+                    next_forbidden = forbidden | index.conflicts[objective_id]
+
+                    if (viable(next_forbidden | next_class_blocked | tag_mask())
+                            and search(next_forbidden, next_class_blocked)):
+                        chosen[current] = objective_id
+                        return True
+
+                    counts[classification] -= 1
+                    for slot, occurrences in tag_slots:
+                        headroom[slot] += occurrences
+                    for slot, blocked_by_tag in saved:
+                        tag_blocked[slot] = blocked_by_tag
+                    stats["backtracks"] += 1
+            unfilled.insert(position, current)
+            return False
+
+        cutoff = max(RESTART_NODES_PER_SLOT * len(slots), 1)
+        while True:
+            headroom[:] = tag_budget.headroom
+            counts.clear()
+            counts.update(initial_counts)
+            tag_blocked[:] = initial_tag_blocked
+            unfilled[:] = range(len(slots))
+            attempt_limit = min(stats["nodes"] + cutoff, self.max_nodes)
+            try:
+                found = viable(forbidden | class_blocked | tag_mask()) and search(forbidden, class_blocked)
+            except _Restart:
+                stats["restarts"] += 1
+                cutoff *= 2
+                continue
+            # An attempt that ends without a restart has tried every assignment
+            if not found:
+                raise ValueError("No board satisfies the bucket, classification, exclusion and tag constraints")
+            return chosen, stats
@@ -0,0 +1,274 @@
+"""
+Tournament sets: several boards generated together under limits across the boards.
+
+No objective may appear on more than max_uses boards of a set, and no two boards may
+share more than max_overlap objectives. Each board's sheet objectives are kept as a
+bitset signature over the dense index ids, so the overlap of two boards is the
+popcount of an AND, and the usage counters keep a mask of the objectives that are
+used up, which the generator never draws. A board that shares too much with an
+earlier one is repaired in place by swapping shared squares for other objectives of
+the same classification (or bucket) that still fit the board; it is only generated
+again when no swap works.
+"""
+import random
+import sys
+import time
+
+import bingo_cache
+import bingo_export
+import bingo_generator
+
+BOARD_SIZE = 25
+DEFAULT_BOARDS = 16
+DEFAULT_MAX_ATTEMPTS = 20
+
+class TournamentSet:
+    """
+    Boards of one tournament set, with their signatures and the usage counters.
+
+    Generated djinn, class and summon objectives aren't in the sheet, so they have no
+    bit in the signatures and never count towards the usage or overlap limits.
+    """
+
+    def __init__(self, generator, max_uses=None, max_overlap=None, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """
+        Args:
+            generator: BoardGenerator the boards are drawn from
+            max_uses: Boards an objective may appear on, None for no limit
+            max_overlap: Objectives two boards may share, None for no limit
+            max_attempts: Boards generated for one slot of the set before giving up
+        """
+        self.generator = generator
+        self.index = generator.index
+        self.max_uses = max_uses
+        self.max_overlap = max_overlap
+        self.max_attempts = max_attempts
+        self.boards = []
+        self.signatures = []
+        self.uses = [0] * len(self.index)
+        # Ids that have been used max_uses times
+        self.used_up = 0
+        self.swaps = 0
+        self.regenerations = 0
+        # Replacements are drawn from a stream of the set's own, so the boards' streams
+        # stay the ones generate() derives from the seed
+        self.rng = random.Random(f"{generator.seed}:tournament")
+
+        options = generator.config
+        self.classification_ids, self.bucket_ids = self.index.candidate_pools(
+            options["exclude_boss_objectives"], options["randomize_djinn"])
+
+    def __len__(self):
+        return len(self.boards)
+
+    def overlaps(self, signature):
+        """Number of objectives a signature shares with each board of the set."""
+        return [(signature & other).bit_count() for other in self.signatures]
+
+    def add_board(self, stats=None):
+        """
+        Generate the next board of the set and add it.
+
+        Returns:
+            list: The board's objectives
+
+        Raises:
+            ValueError: If no board meeting the limits was found in max_attempts tries, or
+                the backtracking solver found none
+        """
+        for attempt in range(self.max_attempts):
+            if attempt:
+                self.regenerations += 1
+            try:
+                board = self.generator.generate(stats, blocked=self.used_up)
+            except (ValueError, RuntimeError) as e:
+                # The backtracking solver found nothing that fits around the used-up objectives
+                raise ValueError(f"No board {len(self.boards) + 1} within the limits: {e}; "
+                                 "allow more uses or more overlap") from e
+            if len(board) < BOARD_SIZE:
+                continue
+            ids = [self.index.lookup(obj) for obj in board]
+            signature = self._repair(board, ids)
+            if signature is None:
+                continue
+
+            self.boards.append(board)
+            self.signatures.append(signature)
+            for objective_id in ids:
+                if objective_id is None:
+                    continue
+                self.uses[objective_id] += 1
+                if self.max_uses is not None and self.uses[objective_id] >= self.max_uses:
+                    self.used_up |= self.index.bits[objective_id]
+            return board
+        raise ValueError(f"No board {len(self.boards) + 1} within the limits after {self.max_attempts} attempts; "
+                         "allow more uses or more overlap")
+
+    def _repair(self, board, ids):
+        """
+        Swap squares of a new board until it overlaps no earlier board too much.
+
+        Every swap lowers the overlap with at least one of the boards over the limit
+        without taking any other board over it, so this ends after a bounded number of
+        swaps, either with the board fixed or with no swap left to try.
+
+        Returns:
+            int: The board's signature, or None if it couldn't be repaired
+        """
+        index = self.index
+        signature = 0
+        for objective_id in ids:
+            if objective_id is not None:
+                signature |= index.bits[objective_id]
+        if self.max_overlap is None:
+            return signature
+
+        while True:
+            overlaps = self.overlaps(signature)
+            over = [self.signatures[j] for j, overlap in enumerate(overlaps) if overlap > self.max_overlap]
+            if not over:
+                return signature
+            # Squares shared with the most boards over the limit are tried first
+            shared = []
+            for position, objective_id in enumerate(ids):
+                if objective_id is not None:
+                    count = sum(1 for other in over if other & index.bits[objective_id])
+                    if count:
+                        shared.append((-count, position))
+            shared.sort()
+            for _, position in shared:
+                old_id = ids[position]
+                if self._swap(board, ids, position, overlaps):
+                    signature = signature & ~index.bits[old_id] | index.bits[ids[position]]
+                    self.swaps += 1
+                    break
+            else:
+                return None
+
+    def _swap(self, board, ids, position, overlaps):
+        """
+        Replace one square of a board with an objective that still fits it.
+
+        The replacement comes from the same classification, or the same bucket in
+        bucket mode, isn't used up, doesn't conflict with the rest of the board or
+        exceed a tag limit, and doesn't take the board over the overlap limit with any
+        board of the set.
+
+        Returns:
+            bool: Whether the square was replaced
+        """
+        index = self.index
+        generator = self.generator
+        options = generator.config
+        old_id = ids[position]
+        old_bit = index.bits[old_id]
+
+        forbidden = self.used_up
+        budget = generator.tag_budget.new_board()
+        classification_count = {}
+        for other_position, objective_id in enumerate(ids):
+            if other_position == position:
+                continue
+            if objective_id is None:
+                budget.add(board[other_position].types)
+                continue
+            forbidden |= index.conflicts[objective_id]
+            budget.add(index.tags[objective_id])
+            classification = index.classifications[objective_id]
+            classification_count[classification] = classification_count.get(classification, 0) + 1
+
+        # Boards that would go over the limit if the replacement were on them too
+        for signature, overlap in zip(self.signatures, overlaps):
+            if overlap - bool(signature & old_bit) >= self.max_overlap:
+                forbidden |= signature
+
+        if options["bucket_mode"]:
+            pool = self.bucket_ids[index.buckets[old_id]]
+        else:
+            pool = self.classification_ids[index.classifications[old_id]]
+        for objective_id in bingo_generator.lazy_shuffle(pool, self.rng):
+            if forbidden & index.bits[objective_id] or not budget.can_add(index.tags[objective_id]):
+                continue
+            classification = index.classifications[objective_id]
+            if options["race_mode"] and classification_count.get(classification, 0) >= 2:
+                continue
+            objective = index.objectives[objective_id]
+            # These would have been turned into summon objectives by the generator
+            if options["randomize_djinn"] and classification == 6 and bingo_generator.should_replace_objective(objective):
+                continue
+            objectives = bingo_generator.modify_lucky_medal_objectives([objective], False, self.rng)
+            board[position] = bingo_generator.modify_equipment_objectives(objectives, False, self.rng)[0]
+            ids[position] = objective_id
+            return True
+        return False
+
+    def max_pairwise_overlap(self):
+        """The largest number of objectives any two boards of the set share."""
+        largest = 0
+        for i, signature in enumerate(self.signatures):
+            for other in self.signatures[i + 1:]:
+                largest = max(largest, (signature & other).bit_count())
+        return largest
+
+def generate_tournament(k, config=None, seed=None, bingo_list=None, index=None, max_uses=None, max_overlap=None,
+                        max_attempts=DEFAULT_MAX_ATTEMPTS, stats=None):
+    """
+    Generate a tournament set of k boards.
+
+    Args:
+        k: Number of boards in the set
+        config: Dictionary of options overriding DEFAULT_CONFIG
+        seed: Seed for the set's random stream, or None for fresh entropy
+        bingo_list: Bingo list from csv_to_bingo_json; DEFAULT_CSV is loaded if omitted
+        index: ObjectiveIndex of bingo_list, compiled if omitted
+        max_uses: Boards an objective may appear on, None for no limit
+        max_overlap: Objectives two boards may share, None for no limit
+        max_attempts: Boards generated for one slot of the set before giving up
+        stats: Optional GenerationStats to add the counters of every board to
+
+    Returns:
+        TournamentSet: The set, with the boards in its boards list
+
+    Raises:
+        ValueError: If a board meeting the limits couldn't be found
+    """
+    generator = bingo_generator.BoardGenerator(bingo_list, config, seed, index)
+    if generator.config["engine"] != "scalar":
+        raise ValueError("Tournament sets are generated one board at a time and only support the scalar engine")
+    tournament = TournamentSet(generator, max_uses, max_overlap, max_attempts)
+    for _ in range(k):
+        tournament.add_board(stats)
+    return tournament
+
+def add_tournament_arguments(parser):
+    bingo_generator.add_mode_arguments(parser)
+    parser.add_argument("-n", "--boards", type=int, default=DEFAULT_BOARDS,
+                        help=f"boards in the set (default: {DEFAULT_BOARDS})")
+    parser.add_argument("--max-uses", type=int, help="boards an objective may appear on (default: no limit)")
+    parser.add_argument("--max-overlap", type=int, help="objectives two boards may share (default: no limit)")
+    parser.add_argument("--max-attempts", type=int, default=DEFAULT_MAX_ATTEMPTS,
+                        help=f"boards generated for one slot of the set before giving up (default: {DEFAULT_MAX_ATTEMPTS})")
+    parser.add_argument("--seed", type=int, help="seed for a reproducible set")
+    bingo_export.add_export_arguments(parser)
+
+def run_tournament(args):
+    bingo_list, index = bingo_cache.load_pool(args.csv, use_cache=not args.no_cache)
+    if bingo_list is None:
+        print("Failed to generate bingo list. Exiting.", file=sys.stderr)
+        return 1
+
+    start = time.perf_counter()
+    try:
+        tournament = generate_tournament(args.boards, bingo_generator.config_from_args(args), args.seed, bingo_list,
+                                         index, args.max_uses, args.max_overlap, args.max_attempts)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    bingo_export.export_boards(tournament.boards, args.output, bingo_export.export_format(args), args.compress or None)
+
+    print(f"Generated a set of {len(tournament)} boards in {elapsed:.2f}s: most shared objectives "
+          f"{tournament.max_pairwise_overlap()}, most uses {max(tournament.uses, default=0)}, "
+          f"{tournament.swaps} swaps, {tournament.regenerations} regenerated", file=sys.stderr)
+    return 0
@@ -0,0 +1,325 @@
+"""
+Auto-tuner for the bucket and tag limits.
+
+Searches the integer bucket limits of one simulation mode and the tag limits for a
+configuration that meets frequency targets, such as no objective selected on more
+than 15% of boards or a Cyclone violation rate under 2%. Candidates are scored with
+the simulator, all of them on the same board seeds so their differences aren't
+drowned in sampling noise, evaluated in parallel, and cached so no configuration is
+simulated twice. The search is a hill climb over single-step moves: one bucket slot
+moved to another bucket, or one tag limit raised or lowered by one.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import bingo_cache
+import bingo_generator
+import bingo_simulator
+
+DEFAULT_EVALUATION_BOARDS = 2000
+# Bumped when the boards drawn for a seed change, which invalidates cached metrics
+CACHE_FORMAT_VERSION = 2
+DEFAULT_MAX_EVALUATIONS = 100
+
+# Bucket limits of each simulation mode before tuning
+MODE_BUCKET_LIMITS = {
+    "hard": bingo_generator.BUCKET_LIMITS_HARD,
+    "normal": bingo_generator.BUCKET_LIMITS_NORMAL
+}
+
+def parse_share(text):
+    """Parse a share of boards written as 0.15 or 15%, or return None."""
+    text = text.strip()
+    try:
+        rate = float(text[:-1]) / 100 if text.endswith('%') else float(text)
+    except ValueError:
+        return None
+    return rate if 0 <= rate <= 1 else None
+
+def parse_rate(value):
+    """Parse a RATE command line value."""
+    rate = parse_share(value)
+    if rate is None:
+        raise argparse.ArgumentTypeError(f"expected a rate like 0.15 or 15%, got {value!r}")
+    return rate
+
+def parse_rate_target(value):
+    """Parse a TAG=RATE command line value."""
+    tag, sep, rate = value.partition('=')
+    tag = tag.strip()
+    rate = parse_share(rate)
+    if not sep or not tag or rate is None:
+        raise argparse.ArgumentTypeError(f"expected TAG=RATE with a rate like 0.02 or 2%, got {value!r}")
+    return tag, rate
+
+def config_key(bucket_limits, tag_limits):
+    """Hashable, JSON-friendly key of a candidate configuration."""
+    return json.dumps([sorted(bucket_limits.items()), sorted(tag_limits.items())])
+
+def distance(bucket_limits, tag_limits, start_buckets, start_tags):
+    """Total number of single steps between a candidate and the starting limits."""
+    buckets = sum(abs(bucket_limits[b] - start_buckets[b]) for b in start_buckets) // 2
+    tags = sum(abs(int(tag_limits[t]) - int(start_tags[t])) for t in start_tags if start_tags[t] != '-')
+    return buckets + tags
+
+def penalty(metrics, max_selection=None, max_violations=None):
+    """
+    How far a candidate's metrics are from the targets; 0 when every target is met.
+
+    Args:
+        metrics: {"boards", "selection_counts", "violations"} as returned by evaluate
+        max_selection: Highest allowed selection frequency of any objective
+        max_violations: {tag: highest allowed violation rate}, '*' for every tag
+    """
+    boards = metrics["boards"]
+    total = 0.0
+    if max_selection is not None:
+        total += sum(max(0.0, count / boards - max_selection) for count in metrics["selection_counts"])
+    for tag, limit in (max_violations or {}).items():
+        tags = metrics["violations"] if tag == '*' else {tag: metrics["violations"].get(tag, 0)}
+        total += sum(max(0.0, count / boards - limit) for count in tags.values())
+    return total
+
+def neighbours(bucket_limits, tag_limits, bucket_sizes, tune_buckets=True, tune_tags=True):
+    """
+    Every configuration one step away.
+
+    Yields:
+        tuple: (bucket_limits, tag_limits)
+    """
+    if tune_buckets:
+        for source in bucket_limits:
+            if not bucket_limits[source]:
+                continue
+            for target in bucket_limits:
+                if target != source and bucket_limits[target] < bucket_sizes[target]:
+                    moved = dict(bucket_limits)
+                    moved[source] -= 1
+                    moved[target] += 1
+                    yield moved, tag_limits
+    if tune_tags:
+        for tag, limit in tag_limits.items():
+            if limit == '-':
+                continue
+            for step in (-1, 1):
+                if int(limit) + step >= 0:
+                    changed = dict(tag_limits)
+                    changed[tag] = str(int(limit) + step)
+                    yield bucket_limits, changed
+
+class Tuner:
+    """
+    Hill climb over bucket and tag limits, scored by the simulator.
+
+    Every candidate is simulated on the same chunk seeds (common random numbers), so
+    two candidates only differ where their limits make the boards differ. Metrics are
+    cached by configuration, in memory and optionally in a JSON file that later runs
+    with the same sheet, mode, seed and board count pick up again.
+    """
+
+    def __init__(self, mode="hard", config=None, boards=DEFAULT_EVALUATION_BOARDS, seed=0, workers=None,
+                 csv_file_path=bingo_generator.DEFAULT_CSV, chunk_size=bingo_simulator.DEFAULT_CHUNK_SIZE,
+                 cache_path=None, use_cache=True):
+        self.mode = mode
+        self.options = dict(bingo_generator.DEFAULT_CONFIG)
+        self.options.update(config or {})
+        self.boards = boards
+        self.seed = seed
+        self.workers = workers
+        self.csv_file_path = csv_file_path
+        self.chunk_size = chunk_size
+        self.cache_path = cache_path
+        self.use_cache = use_cache
+        self.evaluations = 0
+
+        _, self.index = bingo_cache.load_pool(csv_file_path, use_cache=use_cache)
+        if self.index is None:
+            raise ValueError(f"Failed to load {csv_file_path}")
+        mode_options = dict(self.options)
+        mode_options.update(bingo_simulator.SIMULATION_MODES[mode])
+        _, bucket_ids = self.index.candidate_pools(mode_options["exclude_boss_objectives"],
+                                                   mode_options["randomize_djinn"])
+        self.bucket_sizes = {bucket: len(ids) for bucket, ids in bucket_ids.items()}
+
+        # Metrics are only reusable for the same sheet, mode, seeds and fixed options
+        fixed = {key: value for key, value in self.options.items() if key not in ("tag_limits", "bucket_limits")}
+        self.cache_context = {
+            "version": CACHE_FORMAT_VERSION,
+            "csv_sha256": bingo_cache.csv_hash(csv_file_path),
+            "mode": mode,
+            "seed": seed,
+            "boards": boards,
+            "chunk_size": chunk_size,
+            "options": hashlib.sha256(json.dumps(fixed, sort_keys=True, default=str).encode()).hexdigest()
+        }
+        self.cache = {}
+        if cache_path and os.path.exists(cache_path):
+            with open(cache_path, encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get("context") == self.cache_context:
+                self.cache = stored.get("metrics", {})
+
+    def save_cache(self):
+        if self.cache_path:
+            with open(self.cache_path, 'w', encoding='utf-8') as f:
+                json.dump({"context": self.cache_context, "metrics": self.cache}, f)
+
+    def evaluate(self, executor, candidates):
+        """
+        Simulate the candidates that aren't cached yet, all of them in one batch of tasks.
+
+        Args:
+            candidates: List of (bucket_limits, tag_limits)
+
+        Returns:
+            list: The metrics of each candidate, {"boards", "selection_counts", "violations"}
+        """
+        pending = {}
+        for bucket_limits, tag_limits in candidates:
+            key = config_key(bucket_limits, tag_limits)
+            if key not in self.cache and key not in pending:
+                pending[key] = {"bucket_limits": bucket_limits, "tag_limits": tag_limits}
+
+        futures = {}
+        for key, overrides in pending.items():
+            self.cache[key] = {"boards": 0, "selection_counts": [0] * len(self.index), "violations": {}}
+            # The same chunk numbers, so the same seeds, for every candidate
+            for chunk, start in enumerate(range(0, self.boards, self.chunk_size)):
+                boards = min(self.chunk_size, self.boards - start)
+                future = executor.submit(bingo_simulator.simulate_chunk, self.mode, chunk, boards, self.seed, overrides)
+                futures[future] = (key, boards)
+        for future in as_completed(futures):
+            key, boards = futures[future]
+            _, selection_counts, violations, _ = future.result()
+            metrics = self.cache[key]
+            metrics["boards"] += boards
+            metrics["selection_counts"] = [a + b for a, b in zip(metrics["selection_counts"], selection_counts)]
+            for tag, count in violations.items():
+                metrics["violations"][tag] = metrics["violations"].get(tag, 0) + count
+        self.evaluations += len(pending)
+        return [self.cache[config_key(b, t)] for b, t in candidates]
+
+    def tune(self, max_selection=None, max_violations=None, max_evaluations=DEFAULT_MAX_EVALUATIONS,
+             tune_buckets=True, tune_tags=True, progress=None):
+        """
+        Climb from the configured limits towards the targets.
+
+        Each step scores every neighbour of the current configuration and moves to the
+        best one, by penalty first and then by distance from the starting limits, so
+        once the targets are met the climb walks back any change that isn't needed. It
+        stops when no neighbour is better or after max_evaluations simulations, which
+        bounds the cost of a pass at max_evaluations * boards boards.
+
+        Args:
+            progress: Optional callable(step, evaluations, penalty, distance) called
+                after each step
+
+        Returns:
+            dict: {"bucket_limits", "tag_limits", "penalty", "distance", "metrics",
+                "evaluations"} of the best configuration found
+        """
+        start_buckets = dict(self.options["bucket_limits"] or MODE_BUCKET_LIMITS[self.mode])
+        start_tags = dict(self.options["tag_limits"])
+        rng = random.Random(f"{self.seed}:tune")
+
+        def score(candidate, metrics):
+            return (round(penalty(metrics, max_selection, max_violations), 9),
+                    distance(candidate[0], candidate[1], start_buckets, start_tags))
+
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=bingo_simulator.init_worker,
+                                 initargs=(self.csv_file_path, self.options, self.use_cache)) as executor:
+            current = (start_buckets, start_tags)
+            current_score = score(current, self.evaluate(executor, [current])[0])
+            step = 0
+            while self.evaluations < max_evaluations:
+                candidates = list(neighbours(current[0], current[1], self.bucket_sizes, tune_buckets, tune_tags))
+                # Within the budget, simulate a random share of the neighbours not seen yet
+                fresh = [c for c in candidates if config_key(*c) not in self.cache]
+                seen = [c for c in candidates if config_key(*c) in self.cache]
+                rng.shuffle(fresh)
+                candidates = seen + fresh[:max_evaluations - self.evaluations]
+                scores = [score(c, m) for c, m in zip(candidates, self.evaluate(executor, candidates))]
+                self.save_cache()
+                step += 1
+                best = min(range(len(candidates)), key=scores.__getitem__, default=None)
+                if best is None or scores[best] >= current_score:
+                    break
+                current, current_score = candidates[best], scores[best]
+                if progress:
+                    progress(step, self.evaluations, *current_score)
+
+        return {
+            "bucket_limits": current[0],
+            "tag_limits": current[1],
+            "penalty": current_score[0],
+            "distance": current_score[1],
+            "metrics": self.cache[config_key(*current)],
+            "evaluations": self.evaluations
+        }
+
+def add_tune_arguments(parser):
+    bingo_generator.add_mode_arguments(parser, board_modes=False)
+    parser.add_argument("--mode", choices=list(bingo_simulator.SIMULATION_MODES), default="hard",
+                        help="bucket mode whose limits are tuned (default: hard)")
+    parser.add_argument("--max-selection", type=parse_rate, metavar="RATE",
+                        help="target: no objective selected on more than this share of boards, e.g. 15%%")
+    parser.add_argument("--max-violation", type=parse_rate_target, action="append", default=[], metavar="TAG=RATE",
+                        help="target: the tag's limit broken on at most this share of boards, '*' for every tag (repeatable)")
+    parser.add_argument("--tune", choices=["both", "buckets", "tags"], default="both",
+                        help="which limits may change (default: both)")
+    parser.add_argument("--boards", type=int, default=DEFAULT_EVALUATION_BOARDS,
+                        help=f"boards simulated per candidate (default: {DEFAULT_EVALUATION_BOARDS})")
+    parser.add_argument("--max-evaluations", type=int, default=DEFAULT_MAX_EVALUATIONS,
+                        help=f"candidates simulated per pass (default: {DEFAULT_MAX_EVALUATIONS})")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--seed", type=int, default=0, help="seed shared by every candidate (default: 0)")
+    parser.add_argument("--cache-file", help="JSON file keeping evaluated configurations between runs")
+    parser.add_argument("-o", "--output", help="write the best configuration as JSON")
+
+def run_tune(args):
+    if args.max_selection is None and not args.max_violation:
+        print("Give at least one target with --max-selection or --max-violation", file=sys.stderr)
+        return 2
+    # Overrides apply to the limits of the mode being tuned
+    config = bingo_generator.config_from_args(args, hard_limits=args.mode == "hard")
+    tuner = Tuner(args.mode, config, args.boards, args.seed, args.workers, args.csv,
+                  cache_path=args.cache_file, use_cache=not args.no_cache)
+
+    total = args.max_evaluations * args.boards
+    print(f"Tuning {args.mode} mode: at most {args.max_evaluations} candidates x {args.boards} boards "
+          f"= {total} boards", file=sys.stderr)
+    start = time.perf_counter()
+
+    def progress(step, evaluations, penalty, distance):
+        elapsed = time.perf_counter() - start
+        print(f"Step {step}: {evaluations} candidates simulated, penalty {penalty:.4f}, "
+              f"{distance} steps from the start ({elapsed:.1f}s)", file=sys.stderr)
+
+    result = tuner.tune(args.max_selection, dict(args.max_violation), args.max_evaluations,
+                        args.tune != "tags", args.tune != "buckets", progress)
+
+    metrics = result["metrics"]
+    top = max(range(len(metrics["selection_counts"])), key=metrics["selection_counts"].__getitem__)
+    print(f"Best configuration after {result['evaluations']} candidates: penalty {result['penalty']:.4f}, "
+          f"most selected objective {tuner.index.objectives[top].name} at "
+          f"{metrics['selection_counts'][top] / metrics['boards']:.1%}", file=sys.stderr)
+    # Against the shipped limits, so the flags include the --bucket-limit and --tag-limit given here
+    bucket_defaults = MODE_BUCKET_LIMITS[args.mode]
+    tag_defaults = bingo_generator.DEFAULT_TAG_LIMITS
+    flags = [f"--bucket-limit {b}={n}" for b, n in result["bucket_limits"].items() if n != bucket_defaults[b]]
+    flags += [f"--tag-limit {t}={n}" for t, n in result["tag_limits"].items() if n != tag_defaults.get(t)]
+    print("Flags: " + (" ".join(flags) if flags else "(no changes)"))
+    if result["penalty"] > 0:
+        print("The targets were not all met", file=sys.stderr)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({key: result[key] for key in ("bucket_limits", "tag_limits", "penalty", "evaluations")}, f, indent=2)
+            f.write("\n")
+    return 0 if result["penalty"] == 0 else 1
@@ -0,0 +1,385 @@
+"""
+Bulk validator for generated boards.
+
+Reads boards from JSONL (one JSON list per line, as the generate subcommand writes
+them) or from JSON files holding one board or a list of boards, resolves every square
+to the compiled pool by id or by name, and checks mutual exclusions, duplicates,
+classification caps, bucket quotas and tag limits. Lines are validated in chunks over
+a process pool, and the violations are summed into one report.
+"""
+import gzip
+import itertools
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import bingo_cache
+import bingo_generator
+
+DEFAULT_CHUNK_SIZE = 5000
+BOARD_SIZE = 25
+
+# Violation kinds in report order
+VIOLATION_KINDS = ("exclusion", "duplicate", "classification_cap", "bucket_quota", "tag_limit", "size", "unmatched",
+                   "malformed")
+
+# Examples of each violation kind kept in the report
+MAX_EXAMPLES = 20
+
+LUCKY_MEDAL_REWRITE = re.compile(r"Collect the lucky medal from .+ and .+")
+EQUIPMENT_REWRITE = re.compile(r"Obtain the (.+) or (.+)")
+
+class BoardValidator:
+    """
+    Checks boards against a compiled ObjectiveIndex and a generation config.
+
+    Squares are Objective records, dictionaries with an "id" or "name", ids or names.
+    They are matched by id when they carry one from the sheet, otherwise by name.
+    Lucky medal and equipment objectives that were rewritten for the board are matched
+    back to the sheet objective they came from when there is only one. Generated
+    djinn, class and summon objectives aren't in the sheet; they are only counted as
+    unmatched, and only reported as violations with strict=True.
+    """
+
+    def __init__(self, index, config=None, strict=False):
+        options = dict(bingo_generator.DEFAULT_CONFIG)
+        options.update(config or {})
+        self.index = index
+        self.strict = strict
+        self.tag_budget = bingo_generator.TagBudget(options["tag_limits"])
+        self.max_per_classification = 2 if options["race_mode"] else None
+        self.bucket_limits = None
+        if options["bucket_mode"]:
+            self.bucket_limits = options["bucket_limits"] or (
+                bingo_generator.BUCKET_LIMITS_HARD if options["bucket_hard_mode"] else bingo_generator.BUCKET_LIMITS_NORMAL)
+
+        self.by_name = {}
+        for objective_id, obj in enumerate(index.objectives):
+            self.by_name.setdefault(obj.name, objective_id)
+
+        # Mutual exclusions only, in both directions; duplicates are reported on their own
+        self.exclusions = [0] * len(index)
+        for objective_id, restrictions in enumerate(index.restrictions):
+            for other_id in restrictions:
+                if other_id != objective_id:
+                    self.exclusions[objective_id] |= index.bits[other_id]
+                    self.exclusions[other_id] |= index.bits[objective_id]
+
+        def only(names):
+            ids = {self.by_name[name] for name in names if name in self.by_name}
+            return ids.pop() if len(ids) == 1 else None
+        lucky_medals = [obj.name for obj in index.objectives if obj.name.lower().startswith("collect a lucky medal from")]
+        self.lucky_medal_id = only(lucky_medals)
+        self.weapon_id = only(bingo_generator.weapon_objectives_to_replace)
+        self.armor_id = only(bingo_generator.armor_objectives_to_replace)
+
+    def resolve(self, square):
+        """Return the dense id of one square of a board, or None if it isn't in the sheet."""
+        if isinstance(square, bingo_generator.Objective):
+            # Rewritten objectives keep the id of the sheet objective they came from
+            return self.index.lookup(square)
+        if isinstance(square, dict):
+            objective_id = self.index.ids.get(square.get("id")) if "id" in square else None
+            if objective_id is not None:
+                return objective_id
+            square = square.get("name")
+        if isinstance(square, int):
+            return self.index.ids.get(square)
+        if not isinstance(square, str):
+            return None
+        objective_id = self.by_name.get(square)
+        if objective_id is not None:
+            return objective_id
+        if LUCKY_MEDAL_REWRITE.fullmatch(square):
+            return self.lucky_medal_id
+        rewrite = EQUIPMENT_REWRITE.fullmatch(square)
+        if rewrite:
+            if all(item in bingo_generator.randomizable_weapons for item in rewrite.groups()):
+                return self.weapon_id
+            if all(item in bingo_generator.randomizable_armors for item in rewrite.groups()):
+                return self.armor_id
+        return None
+
+    def validate(self, board):
+        """
+        Check one board.
+
+        Returns:
+            list: (kind, detail) for every violation found, empty for a valid board
+        """
+        if not isinstance(board, list):
+            return [("malformed", "not a list of objectives")]
+        index = self.index
+        violations = []
+        if len(board) != BOARD_SIZE:
+            violations.append(("size", f"{len(board)} objectives"))
+
+        ids = []
+        unmatched = 0
+        for square in board:
+            objective_id = self.resolve(square)
+            if objective_id is None:
+                unmatched += 1
+                if self.strict:
+                    name = square.get("name") if isinstance(square, dict) else square
+                    violations.append(("unmatched", str(name)))
+            else:
+                ids.append(objective_id)
+
+        seen = 0
+        names = set()
+        for objective_id in ids:
+            name = index.objectives[objective_id].name
+            if seen & index.bits[objective_id] or name in names:
+                violations.append(("duplicate", name))
+            elif self.exclusions[objective_id] & seen:
+                others = self.exclusions[objective_id] & seen
+                for other_id in ids:
+                    if others & index.bits[other_id]:
+                        violations.append(("exclusion", f"{index.objectives[other_id].name} / {name}"))
+                        others &= ~index.bits[other_id]
+            seen |= index.bits[objective_id]
+            names.add(name)
+
+        if self.max_per_classification is not None:
+            counts = defaultdict(int)
+            for objective_id in ids:
+                counts[index.classifications[objective_id]] += 1
+            for classification, count in sorted(counts.items()):
+                if count > self.max_per_classification:
+                    violations.append(("classification_cap", f"classification {classification}: {count}"))
+
+        if self.bucket_limits is not None:
+            counts = defaultdict(int)
+            for objective_id in ids:
+                counts[index.buckets[objective_id]] += 1
+            for bucket, limit in self.bucket_limits.items():
+                # Unmatched squares may be generated objectives filling a quota
+                if counts[bucket] > limit or (counts[bucket] < limit and not unmatched):
+                    violations.append(("bucket_quota", f"bucket {bucket}: {counts[bucket]} of {limit}"))
+
+        budget = self.tag_budget.new_board()
+        for objective_id in ids:
+            budget.add(index.tags[objective_id])
+        for tag, count in budget.violations().items():
+            violations.append(("tag_limit", f"{tag}: {count} (limit {budget.tag_limits[tag]})"))
+        return violations
+
+# Built once per worker process by init_worker
+_worker_state = {}
+
+def init_worker(csv_file_path, config, strict, use_cache=True):
+    _, index = bingo_cache.load_pool(csv_file_path, use_cache=use_cache)
+    if index is None:
+        raise ValueError(f"Failed to load {csv_file_path}")
+    _worker_state["validator"] = BoardValidator(index, config, strict)
+
+def new_report():
+    return {
+        "boards": 0,
+        "invalid_boards": 0,
+        "violations": dict.fromkeys(VIOLATION_KINDS, 0),
+        "details": {kind: defaultdict(int) for kind in VIOLATION_KINDS},
+        "examples": {kind: [] for kind in VIOLATION_KINDS}
+    }
+
+def merge_reports(report, other):
+    """Add the counts of another report to report."""
+    report["boards"] += other["boards"]
+    report["invalid_boards"] += other["invalid_boards"]
+    for kind in VIOLATION_KINDS:
+        report["violations"][kind] += other["violations"][kind]
+        for detail, count in other["details"][kind].items():
+            report["details"][kind][detail] += count
+        examples = report["examples"][kind]
+        examples.extend(other["examples"][kind][:MAX_EXAMPLES - len(examples)])
+
+def validate_chunk(boards, validator=None):
+    """
+    Validate a chunk of boards.
+
+    Args:
+        boards: List of (board number, JSON text or parsed board)
+        validator: BoardValidator to use, the worker's if None
+
+    Returns:
+        dict: The report for the chunk
+    """
+    validator = validator or _worker_state["validator"]
+    report = new_report()
+    for number, board in boards:
+        if isinstance(board, str):
+            try:
+                board = json.loads(board)
+            except ValueError as e:
+                violations = [("malformed", str(e))]
+            else:
+                violations = validator.validate(board)
+        else:
+            violations = validator.validate(board)
+        report["boards"] += 1
+        if violations:
+            report["invalid_boards"] += 1
+        for kind, detail in violations:
+            report["violations"][kind] += 1
+            if kind not in ("malformed", "size"):
+                report["details"][kind][detail] += 1
+            if len(report["examples"][kind]) < MAX_EXAMPLES:
+                report["examples"][kind].append({"board": number, "detail": detail})
+    return report
+
+def read_boards(path, file_format="auto"):
+    """
+    Yield (board number, board) for every board in a file, '-' for stdin.
+
+    JSONL lines are yielded as text so the workers parse them. A JSON file may hold
+    one board or a list of boards; "auto" reads .jsonl files as JSONL and tries JSON
+    first for anything else. Files ending in .gz are decompressed as they are read.
+
+    Raises:
+        ValueError: If the file is missing or can't be read
+    """
+    try:
+        if path == '-':
+            stream = sys.stdin
+        elif path.endswith(".gz"):
+            stream = gzip.open(path, 'rt', encoding='utf-8')
+        else:
+            stream = open(path, encoding='utf-8')
+    except FileNotFoundError:
+        raise ValueError(f"The file {path} was not found.") from None
+    except OSError as e:
+        raise ValueError(f"The file {path} could not be read: {e.strerror or e}") from None
+    try:
+        if file_format == "auto":
+            name = path[:-3] if path.endswith(".gz") else path
+            file_format = "jsonl" if name.endswith(".jsonl") or path == '-' else "json"
+            if file_format == "json":
+                text = stream.read()
+                try:
+                    document = json.loads(text)
+                except ValueError:
+                    # More than one JSON value: one board per line
+                    lines = text.splitlines()
+                else:
+                    yield from enumerate(iter_document(document), 1)
+                    return
+                yield from ((n, line) for n, line in enumerate(lines, 1) if line.strip())
+                return
+        if file_format == "json":
+            yield from enumerate(iter_document(json.load(stream)), 1)
+            return
+        yield from ((n, line) for n, line in enumerate(stream, 1) if line.strip())
+    except (OSError, EOFError) as e:
+        # Such as a truncated or corrupt .gz file
+        raise ValueError(f"The file {path} could not be read: {e}") from None
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+def iter_document(document):
+    """Boards of a JSON document: a single board or a list of boards."""
+    if isinstance(document, list) and document and all(isinstance(board, list) for board in document):
+        return document
+    return [document]
+
+def validate_files(paths, config=None, csv_file_path=bingo_generator.DEFAULT_CSV, workers=None,
+                   chunk_size=DEFAULT_CHUNK_SIZE, strict=False, file_format="auto", use_cache=True):
+    """
+    Validate every board in the given files across a process pool.
+
+    Args:
+        paths: Files to read, '-' for stdin
+        config: Generation options the boards were made with (modes, tag and bucket limits)
+        workers: Worker processes, os.cpu_count() if None; 1 validates in this process
+        chunk_size: Boards per task sent to a worker
+        strict: Report squares that aren't in the sheet as violations
+
+    Returns:
+        dict: {"boards", "invalid_boards", "violations": {kind: count},
+            "details": {kind: {detail: count}}, "examples": {kind: [{"board", "detail"}]}}
+            with boards numbered by line, or by position in a JSON list
+    """
+    report = new_report()
+    chunks = (list(chunk) for path in paths
+              for chunk in batched(read_boards(path, file_format), chunk_size))
+
+    if workers == 1:
+        _, index = bingo_cache.load_pool(csv_file_path, use_cache=use_cache)
+        if index is None:
+            raise ValueError(f"Failed to load {csv_file_path}")
+        validator = BoardValidator(index, config, strict)
+        for chunk in chunks:
+            merge_reports(report, validate_chunk(chunk, validator))
+        return report
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                             initargs=(csv_file_path, config, strict, use_cache)) as executor:
+        # Keep a few chunks per worker in flight so huge files aren't read into memory at once
+        window = 2 * (workers or os.cpu_count() or 1)
+        pending = set()
+        for chunk in chunks:
+            if len(pending) >= window:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    merge_reports(report, future.result())
+            pending.add(executor.submit(validate_chunk, chunk))
+        for future in pending:
+            merge_reports(report, future.result())
+    return report
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+def add_validate_arguments(parser):
+    bingo_generator.add_mode_arguments(parser, drawing=False)
+    parser.add_argument("files", nargs="+", help="JSONL or JSON files of boards, gzipped or not, '-' for stdin")
+    parser.add_argument("--format", choices=["auto", "jsonl", "json"], default="auto",
+                        help="input format (default: auto, by extension and content)")
+    parser.add_argument("--strict", action="store_true",
+                        help="report objectives that aren't in the sheet, such as generated djinn objectives")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"boards per worker task (default: {DEFAULT_CHUNK_SIZE})")
+    parser.add_argument("-o", "--output", help="write the full report as JSON, '-' for stdout")
+
+def run_validate(args):
+    config = bingo_generator.config_from_args(args)
+    start = time.perf_counter()
+    try:
+        report = validate_files(args.files, config, args.csv, args.workers, args.chunk_size, args.strict,
+                                args.format, not args.no_cache)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 1
+    elapsed = time.perf_counter() - start
+
+    if args.output:
+        text = json.dumps(report, indent=2) + "\n"
+        if args.output == '-':
+            sys.stdout.write(text)
+        else:
+            with open(args.output, 'w', encoding='utf-8') as f:
+                f.write(text)
+
+    rate = report["boards"] / elapsed if elapsed > 0 else float('inf')
+    print(f"Validated {report['boards']} boards in {elapsed:.2f}s ({rate:.0f} boards/sec): "
+          f"{report['invalid_boards']} with violations", file=sys.stderr)
+    for kind in VIOLATION_KINDS:
+        count = report["violations"][kind]
+        if not count:
+            continue
+        print(f"  {kind}: {count}", file=sys.stderr)
+        common = sorted(report["details"][kind].items(), key=lambda item: -item[1])[:3]
+        for detail, times in common:
+            print(f"    {detail} ({times})", file=sys.stderr)
+    return 1 if report["invalid_boards"] else 0
@@ -0,0 +1,65 @@
+"""Batch-sampled boards must keep the bucket quotas and never hold conflicting objectives."""
+import unittest
+from collections import Counter
+
+import bingo_batch
+import bingo_cache
+import bingo_generator
+
+
+@unittest.skipIf(bingo_batch.np is None, "the batch sampler requires NumPy")
+class BatchSamplerTest(unittest.TestCase):
+    BOARDS = 300
+
+    @classmethod
+    def setUpClass(cls):
+        _, cls.index = bingo_cache.load_pool(bingo_generator.DEFAULT_CSV)
+
+    def sample(self, bucket_hard_mode=False, bucket_limits=None, exclude_boss_objectives=False):
+        sampler = bingo_batch.BatchSampler(self.index, bingo_generator.DEFAULT_TAG_LIMITS, bucket_hard_mode,
+                                           exclude_boss_objectives, bucket_limits)
+        ids, _ = sampler.sample(self.BOARDS, rng=7)
+        return ids.tolist()
+
+    def assert_valid(self, boards, bucket_limits):
+        index = self.index
+        for number, board in enumerate(boards):
+            with self.subTest(board=number):
+                self.assertNotIn(-1, board)
+                buckets = Counter(index.buckets[i] for i in board)
+                self.assertEqual(buckets, Counter({bucket: limit for bucket, limit in bucket_limits.items() if limit}))
+                names = [index.objectives[i].name for i in board]
+                self.assertEqual(len(set(names)), len(names))
+                for position, objective_id in enumerate(board):
+                    for other_id in board[position + 1:]:
+                        self.assertFalse(index.conflicts[objective_id] & index.bits[other_id],
+                                         f"{names[position]} conflicts with {index.objectives[other_id].name}")
+
+    def test_normal_mode(self):
+        self.assert_valid(self.sample(), bingo_generator.BUCKET_LIMITS_NORMAL)
+
+    def test_hard_mode(self):
+        self.assert_valid(self.sample(bucket_hard_mode=True), bingo_generator.BUCKET_LIMITS_HARD)
+
+    def test_bucket_limit_overrides(self):
+        limits = bingo_generator.merge_bucket_limits({"A": 2, "B": 3}, hard_mode=True)
+        self.assert_valid(self.sample(bucket_hard_mode=True, bucket_limits=limits), limits)
+
+    def test_exclude_boss(self):
+        boards = self.sample(bucket_hard_mode=True, exclude_boss_objectives=True)
+        self.assert_valid(boards, bingo_generator.BUCKET_LIMITS_HARD)
+        for board in boards:
+            self.assertFalse(any("Boss" in self.index.tags[i] for i in board))
+
+    def test_repair_chunks_give_the_same_boards(self):
+        boards = self.sample(bucket_hard_mode=True)
+        size = bingo_batch.REPAIR_BATCH_SIZE
+        bingo_batch.REPAIR_BATCH_SIZE = 64
+        try:
+            self.assertEqual(self.sample(bucket_hard_mode=True), boards)
+        finally:
+            bingo_batch.REPAIR_BATCH_SIZE = size
+
+
+if __name__ == "__main__":
+    unittest.main()
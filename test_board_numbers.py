@@ -0,0 +1,68 @@
+"""Board n of a seed must be the same however it is reached."""
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import bingo_cache
+import bingo_generator
+
+MODES = {
+    "normal": {},
+    "race": {"race_mode": True},
+    "bucket-hard": {"bucket_mode": True, "bucket_hard_mode": True},
+    "backtrack": {"bucket_mode": True, "solver": "backtrack"}
+}
+
+
+def names(boards):
+    return [[obj.name for obj in board] for board in boards]
+
+
+class BoardNumberTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.bingo_list, cls.index = bingo_cache.load_pool(bingo_generator.DEFAULT_CSV)
+
+    def boards(self, n, config, seed, start=0):
+        return names(bingo_generator.generate_boards(n, config, seed, self.bingo_list, self.index, start=start))
+
+    def test_start_reproduces_the_boards(self):
+        for mode, config in MODES.items():
+            with self.subTest(mode=mode):
+                run = self.boards(45, config, seed=7)
+                self.assertEqual(self.boards(3, config, seed=7, start=41), run[41:44])
+                self.assertEqual(self.boards(1, config, seed=7, start=0), run[:1])
+
+    def test_order_of_generation_does_not_matter(self):
+        generator = bingo_generator.BoardGenerator(self.bingo_list, MODES["bucket-hard"], "order", self.index)
+        forward = [generator.generate(board=n) for n in range(6)]
+        backward = [generator.fork(generator.seed).generate(board=n) for n in reversed(range(6))]
+        self.assertEqual(names(forward), names(reversed(backward)))
+
+    def test_other_seeds_differ(self):
+        self.assertNotEqual(self.boards(1, {}, seed=7, start=5), self.boards(1, {}, seed=8, start=5))
+        self.assertNotEqual(self.boards(1, {}, seed=7, start=5), self.boards(1, {}, seed=7, start=6))
+
+    def test_cli_start(self):
+        with tempfile.TemporaryDirectory() as directory:
+            whole = os.path.join(directory, "whole.jsonl")
+            single = os.path.join(directory, "single.jsonl")
+            with contextlib.redirect_stderr(io.StringIO()):
+                bingo_generator.cli(["generate", "--bucket", "--seed", "7", "-n", "45", "-o", whole])
+                bingo_generator.cli(["generate", "--bucket", "--seed", "7", "--start", "41", "-n", "1", "-o", single])
+            with open(whole, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+            with open(single, encoding='utf-8') as f:
+                self.assertEqual(json.loads(f.read()), json.loads(lines[41]))
+
+    def test_batch_engine_rejects_start(self):
+        config = {"bucket_mode": True, "engine": "batch"}
+        with self.assertRaisesRegex(ValueError, "can't start at a given board"):
+            next(bingo_generator.generate_boards(1, config, 7, self.bingo_list, self.index, start=3))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Bucket limit overrides must keep boards at 25 squares."""
+import argparse
+import contextlib
+import io
+import unittest
+from collections import Counter
+
+import bingo_cache
+import bingo_generator
+import bingo_simulator
+
+
+class MergeBucketLimitsTest(unittest.TestCase):
+    def test_overrides_that_keep_the_total(self):
+        limits = bingo_generator.merge_bucket_limits([("A", 5), ("B", 4)])
+        self.assertEqual(limits, dict(bingo_generator.BUCKET_LIMITS_NORMAL, A=5, B=4))
+        self.assertEqual(sum(limits.values()), 25)
+
+    def test_hard_mode_overrides_apply_to_the_hard_limits(self):
+        limits = bingo_generator.merge_bucket_limits({"A": 2, "B": 3}, hard_mode=True)
+        self.assertEqual(limits, dict(bingo_generator.BUCKET_LIMITS_HARD, A=2, B=3))
+
+    def test_too_many_squares(self):
+        with self.assertRaisesRegex(argparse.ArgumentTypeError, "add up to 25, got 46"):
+            bingo_generator.merge_bucket_limits([("A", 25)])
+
+    def test_too_few_squares(self):
+        with self.assertRaisesRegex(argparse.ArgumentTypeError, "add up to 25, got 21"):
+            bingo_generator.merge_bucket_limits([("A", 0)])
+
+    def test_generate_rejects_the_limits(self):
+        for limit in ("A=25", "A=0"):
+            with self.subTest(limit=limit), contextlib.redirect_stderr(io.StringIO()) as stderr:
+                with self.assertRaises(SystemExit) as raised:
+                    bingo_generator.cli(["generate", "--bucket", "--bucket-limit", limit, "--seed", "1"])
+                self.assertEqual(raised.exception.code, 2)
+                self.assertIn("bucket limits must add up to 25", stderr.getvalue())
+
+
+class SimulateBucketLimitsTest(unittest.TestCase):
+    BOARDS = 20
+
+    def squares_per_bucket(self, modes, overrides):
+        _, index = bingo_cache.load_pool(bingo_generator.DEFAULT_CSV)
+        results = bingo_simulator.simulate(self.BOARDS, seed=1, workers=1, modes=modes, chunk_size=10,
+                                           bucket_overrides=overrides)
+        squares = {}
+        for mode, result in results.items():
+            counts = Counter()
+            for objective_id, count in enumerate(result["selection_counts"]):
+                if count:
+                    counts[index.buckets[objective_id]] += count
+            squares[mode] = {bucket: count / self.BOARDS for bucket, count in counts.items()}
+        return squares
+
+    def test_hard_mode_overrides(self):
+        squares = self.squares_per_bucket(("hard",), {"A": 2, "B": 3})
+        self.assertEqual(squares["hard"], dict(bingo_generator.BUCKET_LIMITS_HARD, A=2, B=3))
+
+    def test_each_mode_keeps_its_own_limits(self):
+        squares = self.squares_per_bucket(("hard", "normal"), {"B": 6, "C": 3})
+        self.assertEqual(squares["hard"], dict(bingo_generator.BUCKET_LIMITS_HARD, B=6, C=3))
+        self.assertEqual(squares["normal"], dict(bingo_generator.BUCKET_LIMITS_NORMAL, B=6, C=3))
+
+    def test_overrides_checked_for_every_mode(self):
+        # A=2 B=3 fills a hard board but leaves a normal one at 21 squares
+        with self.assertRaisesRegex(argparse.ArgumentTypeError, "add up to 25, got 21"):
+            bingo_simulator.simulate(self.BOARDS, modes=("hard", "normal"), bucket_overrides={"A": 2, "B": 3})
+
+
+if __name__ == "__main__":
+    unittest.main()
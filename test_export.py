@@ -0,0 +1,98 @@
+"""Every export format must read back as the boards that were written."""
+import csv
+import gzip
+import json
+import os
+import re
+import tempfile
+import unittest
+
+import bingo_cache
+import bingo_export
+import bingo_generator
+
+JS_ASSIGNMENT = re.compile(r"bingoBoards\[(\d+)\] = (.*);")
+
+
+def read_text(path):
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, 'rt', encoding='utf-8', newline='') as f:
+        return f.read()
+
+
+class ExportRoundTripTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        bingo_list, index = bingo_cache.load_pool(bingo_generator.DEFAULT_CSV)
+        config = {"bucket_mode": True, "bucket_hard_mode": True, "randomize_djinn": True}
+        cls.boards = list(bingo_generator.generate_boards(6, config, 11, bingo_list, index))
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def export(self, name, file_format=None, compress=None, start=0):
+        path = os.path.join(self.directory.name, name)
+        count = bingo_export.export_boards(iter(self.boards), path, file_format or bingo_export.infer_format(path),
+                                           compress, start)
+        self.assertEqual(count, len(self.boards))
+        return path
+
+    def read_jsonl(self, path):
+        return [json.loads(line) for line in read_text(path).splitlines()]
+
+    def read_csv(self, path):
+        rows = list(csv.reader(read_text(path).splitlines()))
+        self.assertEqual(rows[0], ["board"] + [f"square_{i}" for i in range(1, 26)])
+        return rows[1:]
+
+    def read_js(self, path):
+        lines = read_text(path).splitlines()
+        self.assertEqual(lines[:2], ["var bingoBoards = [];", ""])
+        return [(int(number), json.loads(board)) for number, board in
+                (JS_ASSIGNMENT.fullmatch(line).groups() for line in lines[2:])]
+
+    def test_jsonl(self):
+        for name in ("boards.jsonl", "boards.jsonl.gz"):
+            with self.subTest(name=name):
+                self.assertEqual(self.read_jsonl(self.export(name)),
+                                 [[{"name": obj.name} for obj in board] for board in self.boards])
+
+    def test_csv(self):
+        expected = [[str(number)] + [obj.name if obj.id is None else str(obj.id) for obj in board]
+                    for number, board in enumerate(self.boards, 40)]
+        for name in ("boards.csv", "boards.csv.gz"):
+            with self.subTest(name=name):
+                self.assertEqual(self.read_csv(self.export(name, start=40)), expected)
+
+    def test_boards_js(self):
+        expected = [(number, [obj.as_dict() for obj in board]) for number, board in enumerate(self.boards, 40)]
+        for name in ("boards.js", "boards.js.gz"):
+            with self.subTest(name=name):
+                self.assertEqual(self.read_js(self.export(name, start=40)), expected)
+
+    def test_generated_objectives_keep_their_names(self):
+        generated = [obj.name for board in self.boards for obj in board if obj.id is None]
+        self.assertTrue(generated)
+        cells = {cell for row in self.read_csv(self.export("boards.csv")) for cell in row[1:]}
+        self.assertTrue(set(generated) <= cells)
+
+    def test_compress_flag_and_reproducible_gzip(self):
+        # The header holds no timestamp, so the same boards give the same bytes
+        path = self.export("boards.out", "jsonl", compress=True)
+        with open(path, 'rb') as f:
+            compressed = f.read()
+        with open(self.export("boards.out", "jsonl", compress=True), 'rb') as f:
+            self.assertEqual(f.read(), compressed)
+        with open(self.export("plain.jsonl"), 'rb') as f:
+            self.assertEqual(gzip.decompress(compressed), f.read())
+
+    def test_infer_format(self):
+        self.assertEqual(bingo_export.infer_format("out.csv.gz"), "csv")
+        self.assertEqual(bingo_export.infer_format("out.js"), "boards-js")
+        self.assertEqual(bingo_export.infer_format("out.txt"), "jsonl")
+        self.assertEqual(bingo_export.infer_format("-"), "jsonl")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+"""Boards from the backtracking solver must be valid and meet the tag limits without rerolls."""
+import unittest
+from collections import Counter
+
+import bingo_cache
+import bingo_generator
+
+MODES = {
+    "normal": {},
+    "race": {"race_mode": True},
+    "race-harder": {"race_mode": True, "remove_easy": True, "harder_board": True},
+    "bucket-normal": {"bucket_mode": True},
+    "bucket-hard": {"bucket_mode": True, "bucket_hard_mode": True},
+    "bucket-hard-djinn": {"bucket_mode": True, "bucket_hard_mode": True, "randomize_djinn": True},
+    "exclude-boss": {"bucket_mode": True, "exclude_boss_objectives": True}
+}
+
+
+class BacktrackingSolverTest(unittest.TestCase):
+    BOARDS = 40
+
+    @classmethod
+    def setUpClass(cls):
+        cls.bingo_list, cls.index = bingo_cache.load_pool(bingo_generator.DEFAULT_CSV)
+
+    def boards(self, config, n=BOARDS, seed=3):
+        config = dict(config, solver="backtrack", reroll="never")
+        return list(bingo_generator.generate_boards(n, config, seed, self.bingo_list, self.index))
+
+    def test_boards_are_valid(self):
+        index = self.index
+        for mode, config in MODES.items():
+            options = dict(bingo_generator.DEFAULT_CONFIG, **config)
+            for number, board in enumerate(self.boards(config)):
+                with self.subTest(mode=mode, board=number):
+                    self.assertEqual(len(board), 25)
+                    self.assertEqual(bingo_generator.check_tag_occurrences(board, options["tag_limits"]), {})
+                    names = [obj.name for obj in board]
+                    self.assertEqual(len(set(names)), len(names))
+                    ids = [i for i in map(index.lookup, board) if i is not None]
+                    for objective_id in ids:
+                        # Some objectives list their own id among their restrictions
+                        for other_id in index.restrictions[objective_id]:
+                            if other_id != objective_id:
+                                self.assertNotIn(other_id, ids)
+                    classifications = Counter(index.classifications[i] for i in ids)
+                    if options["race_mode"]:
+                        self.assertLessEqual(max(classifications.values()), 2)
+                    if options["bucket_mode"]:
+                        limits = (bingo_generator.BUCKET_LIMITS_HARD if options["bucket_hard_mode"]
+                                  else bingo_generator.BUCKET_LIMITS_NORMAL)
+                        for bucket, count in Counter(index.buckets[i] for i in ids).items():
+                            self.assertLessEqual(count, limits[bucket], f"bucket {bucket}")
+                    if options["exclude_boss_objectives"]:
+                        self.assertFalse(any("Boss" in index.tags[i] for i in ids))
+
+    def test_tight_tag_limits(self):
+        tag_limits = dict(bingo_generator.DEFAULT_TAG_LIMITS, Whirlwind="1", Pound="1", Lash="1")
+        for board in self.boards({"tag_limits": tag_limits}):
+            self.assertEqual(bingo_generator.check_tag_occurrences(board, tag_limits), {})
+
+    def test_infeasible_limits_raise(self):
+        tag_limits = {tag: "0" for tag in bingo_generator.DEFAULT_TAG_LIMITS}
+        with self.assertRaises(ValueError):
+            self.boards({"tag_limits": tag_limits}, n=1)
+
+    def test_failed_boards_fall_back_to_greedy(self):
+        tag_limits = {tag: "0" for tag in bingo_generator.DEFAULT_TAG_LIMITS}
+        config = {"tag_limits": tag_limits, "solver": "backtrack", "reroll": "never"}
+        failed = []
+        boards = list(bingo_generator.generate_boards(3, config, 3, self.bingo_list, self.index, start=5,
+                                                      on_solver_error=lambda board, error: failed.append(board)))
+        self.assertEqual(failed, [5, 6, 7])
+        greedy = list(bingo_generator.generate_boards(3, dict(config, solver="greedy"), 3, self.bingo_list,
+                                                      self.index, start=5))
+        self.assertEqual([[obj.name for obj in board] for board in boards],
+                         [[obj.name for obj in board] for board in greedy])
+
+    def test_solver_is_built_once_per_limits(self):
+        budget = bingo_generator.TagBudget(bingo_generator.DEFAULT_TAG_LIMITS)
+        solver = self.index.solver(budget)
+        self.assertIs(self.index.solver(bingo_generator.TagBudget(bingo_generator.DEFAULT_TAG_LIMITS)), solver)
+        self.assertIsNot(self.index.solver(budget, 2), solver)
+        self.assertIsNot(self.index.solver(bingo_generator.TagBudget(dict(bingo_generator.DEFAULT_TAG_LIMITS,
+                                                                          Lash="1"))), solver)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+"""Tournament sets must keep the usage and overlap limits across their boards."""
+import unittest
+from collections import Counter
+
+import bingo_cache
+import bingo_generator
+import bingo_tournament
+import bingo_validator
+
+
+class TournamentLimitsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.bingo_list, cls.index = bingo_cache.load_pool(bingo_generator.DEFAULT_CSV)
+
+    def tournament(self, k, config, max_uses=None, max_overlap=None, seed=4):
+        return bingo_tournament.generate_tournament(k, config, seed, self.bingo_list, self.index,
+                                                    max_uses=max_uses, max_overlap=max_overlap)
+
+    def assert_limits(self, tournament, config, max_uses, max_overlap):
+        # Counted from the boards themselves rather than the set's own counters
+        boards = [{i for i in map(self.index.lookup, board) if i is not None} for board in tournament.boards]
+        if max_uses is not None:
+            uses = Counter(i for board in boards for i in board)
+            self.assertLessEqual(max(uses.values()), max_uses)
+        if max_overlap is not None:
+            for first, board in enumerate(boards):
+                for second in range(first + 1, len(boards)):
+                    self.assertLessEqual(len(board & boards[second]), max_overlap, f"boards {first} and {second}")
+        # Greedy boards keep a tag violation their rerolls couldn't fix, as generate does;
+        # only the backtracking solver guarantees the tag limits
+        validator = bingo_validator.BoardValidator(self.index, config)
+        for number, board in enumerate(tournament.boards):
+            violations = validator.validate(board)
+            if config.get("solver") != "backtrack":
+                violations = [violation for violation in violations if violation[0] != "tag_limit"]
+            self.assertEqual(violations, [], f"board {number}")
+
+    def test_limits_hold(self):
+        cases = [
+            ({}, 2, 6, 12),
+            ({"bucket_mode": True, "bucket_hard_mode": True}, 3, 8, 12),
+            ({"race_mode": True}, None, 3, 8),
+            ({"solver": "backtrack"}, 3, 6, 12),
+            ({"bucket_mode": True, "solver": "backtrack"}, 3, 8, 12)
+        ]
+        for config, max_uses, max_overlap, k in cases:
+            with self.subTest(config=config):
+                tournament = self.tournament(k, config, max_uses, max_overlap)
+                self.assertEqual(len(tournament), k)
+                self.assert_limits(tournament, config, max_uses, max_overlap)
+
+    def test_repairs_keep_the_limits(self):
+        # Tight enough that boards need swaps to fit
+        config = {"race_mode": True}
+        tournament = self.tournament(8, config, max_overlap=3)
+        self.assertGreater(tournament.swaps, 0)
+        self.assert_limits(tournament, config, None, 3)
+
+    def test_same_seed_same_set(self):
+        first = self.tournament(6, {}, 2, 6)
+        second = self.tournament(6, {}, 2, 6)
+        self.assertEqual([[obj.name for obj in board] for board in first.boards],
+                         [[obj.name for obj in board] for board in second.boards])
+
+    def test_impossible_limits(self):
+        with self.assertRaisesRegex(ValueError, "within the limits"):
+            self.tournament(40, {}, max_uses=1)
+
+
+if __name__ == "__main__":
+    unittest.main()
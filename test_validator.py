@@ -0,0 +1,121 @@
+"""The validator must pass generated boards and report each kind of bad board."""
+import gzip
+import json
+import os
+import tempfile
+import unittest
+
+import bingo_cache
+import bingo_generator
+import bingo_validator
+
+HARD = {"bucket_mode": True, "bucket_hard_mode": True}
+
+
+class BoardValidatorTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.bingo_list, cls.index = bingo_cache.load_pool(bingo_generator.DEFAULT_CSV)
+
+    def board(self, config=None, seed=5):
+        board, = bingo_generator.generate_boards(1, config, seed, self.bingo_list, self.index)
+        return [obj.as_dict() for obj in board]
+
+    def violations(self, board, config=None, strict=False):
+        return bingo_validator.BoardValidator(self.index, config, strict).validate(board)
+
+    def compatible(self, objective_ids, count):
+        """The first count ids that no earlier one conflicts with."""
+        chosen = []
+        for objective_id in objective_ids:
+            if not any(self.index.conflicts[objective_id] & self.index.bits[other] for other in chosen):
+                chosen.append(objective_id)
+                if len(chosen) == count:
+                    return chosen
+        self.fail("not enough compatible objectives")
+
+    def test_generated_boards_pass(self):
+        for config in ({}, {"race_mode": True}, {"bucket_mode": True}, HARD):
+            with self.subTest(config=config):
+                self.assertEqual(self.violations(self.board(config), config), [])
+
+    def test_duplicate(self):
+        board = self.board()
+        board[1] = board[0]
+        self.assertIn(("duplicate", board[0]["name"]), self.violations(board))
+
+    def test_exclusion(self):
+        index = self.index
+        first, second = next((i, j) for i, restrictions in enumerate(index.restrictions)
+                             for j in restrictions if j != i and index.objectives[i].name != index.objectives[j].name)
+        names = {index.objectives[first].name, index.objectives[second].name}
+        board = [square for square in self.board() if square["name"] not in names][:23]
+        board += [index.objectives[first].as_dict(), index.objectives[second].as_dict()]
+        kinds = [kind for kind, _ in self.violations(board)]
+        self.assertIn("exclusion", kinds)
+
+    def test_tag_limit(self):
+        lash = [i for i, tags in enumerate(self.index.tags) if tags.count("Lash") == 1]
+        board = [self.index.objectives[i].as_dict() for i in self.compatible(lash, 3)]
+        self.assertIn(("tag_limit", "Lash: 3 (limit 2)"), self.violations(board))
+
+    def test_classification_cap(self):
+        classification = next(c for c, ids in self.index.by_classification.items() if len(ids) >= 6)
+        ids = self.compatible(self.index.by_classification[classification], 3)
+        board = [self.index.objectives[i].as_dict() for i in ids]
+        self.assertIn(("classification_cap", f"classification {classification}: 3"),
+                      self.violations(board, {"race_mode": True}))
+        self.assertNotIn("classification_cap", [kind for kind, _ in self.violations(board)])
+
+    def test_bucket_quota(self):
+        board = self.board(HARD)
+        on_board = {square["name"] for square in board}
+        # Generated objectives have no id, so they are left alone
+        ids = [self.index.ids.get(square.get("id")) for square in board]
+        position = next(p for p, objective_id in enumerate(ids)
+                        if objective_id is not None and self.index.buckets[objective_id] == "B")
+        replacement = next(i for i in self.index.by_bucket["D"] if self.index.objectives[i].name not in on_board
+                           and not any(self.index.conflicts[i] & self.index.bits[objective_id]
+                                       for objective_id in ids if objective_id is not None))
+        board[position] = self.index.objectives[replacement].as_dict()
+        self.assertIn(("bucket_quota", "bucket D: 8 of 7"), self.violations(board, HARD))
+
+    def test_size_and_malformed(self):
+        self.assertIn(("size", "24 objectives"), self.violations(self.board()[:24]))
+        self.assertEqual(self.violations({"name": "not a board"}), [("malformed", "not a list of objectives")])
+
+    def test_unmatched_only_when_strict(self):
+        board = self.board()
+        board[0] = {"name": "Not an objective of the sheet"}
+        self.assertEqual(self.violations(board), [])
+        self.assertIn(("unmatched", "Not an objective of the sheet"), self.violations(board, strict=True))
+
+
+class ValidateFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_gzipped_jsonl(self):
+        boards = [[{"name": obj.name} for obj in board]
+                  for board in bingo_generator.generate_boards(4, HARD, seed=2)]
+        boards[2][1] = boards[2][0]
+        path = os.path.join(self.directory.name, "boards.jsonl.gz")
+        with gzip.open(path, 'wt', encoding='utf-8') as f:
+            for board in boards:
+                f.write(json.dumps(board) + "\n")
+            f.write("{not json\n")
+        report = bingo_validator.validate_files([path], HARD, workers=1)
+        self.assertEqual(report["boards"], 5)
+        self.assertEqual(report["invalid_boards"], 2)
+        self.assertEqual(report["violations"]["malformed"], 1)
+        self.assertEqual([example["board"] for example in report["examples"]["duplicate"]], [3])
+
+    def test_missing_file(self):
+        path = os.path.join(self.directory.name, "missing.jsonl")
+        with self.assertRaisesRegex(ValueError, "was not found"):
+            bingo_validator.validate_files([path], workers=1)
+
+
+if __name__ == "__main__":
+    unittest.main()